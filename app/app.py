@@ -1,118 +1,554 @@
-from flask import Flask, render_template, send_from_directory
-import pandas as pd
+from flask import Flask, render_template, send_from_directory, request, Response, abort, jsonify
+from jinja2 import FileSystemBytecodeCache
 import os
-import glob # For finding chart images
+import io
+import sys
 import re # Import regex module
+import json
+import queue
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 
 # Get the base directory of the project (one level up from 'app')
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper.store import open_store, STORE_FILE, DATA_DIR
+from scraper.stats import ROLLUP_RESOLUTIONS
+from scraper import metrics, tracing
+from visuals.plotter import render_price_chart, load_chart_series, chart_slugs, CHART_WIDTH
 
-DATA_FILE = os.path.join(PROJECT_ROOT, "data", "prices.csv")
 CHARTS_DIR_ABSOLUTE = os.path.join(PROJECT_ROOT, "visuals")
 
-print(f"DEBUG: PROJECT_ROOT is: {PROJECT_ROOT}")
-print(f"DEBUG: DATA_FILE path is: {DATA_FILE}")
-print(f"DEBUG: CHARTS_DIR_ABSOLUTE path is: {CHARTS_DIR_ABSOLUTE}")
+# Compiled templates are cached here, so a restarted dashboard doesn't recompile
+# them for its first request (Jinja recompiles any template whose source changed)
+TEMPLATE_CACHE_DIR = os.path.join(DATA_DIR, "template_cache")
+try:
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)}
+except OSError as e:
+    print(f"Template cache disabled ({TEMPLATE_CACHE_DIR}): {e}")
+
+# On-demand charts: default range, number of rendered charts kept in memory,
+# and how long browsers/proxies may reuse a chart before revalidating it
+DEFAULT_CHART_RANGE = "90d"
+CHART_CACHE_SIZE = 256
+CHART_MAX_AGE_SECONDS = 300
+CHART_MIMETYPES = {"png": "image/png", "svg": "image/svg+xml"}
+# Bounds of the chart width (pixels) a client may request with ?width=
+CHART_MIN_WIDTH = 200
+CHART_MAX_WIDTH = 4000
+
+# History API: default and maximum page size / number of downsampled points
+HISTORY_DEFAULT_LIMIT = 1000
+HISTORY_MAX_LIMIT = 10000
+
+# Live updates (/api/stream): how often the broadcaster checks the store for writes
+# by other processes, how many recent events are kept for reconnecting clients,
+# how many undelivered events a slow client may have before it is disconnected,
+# and how often an idle stream sends a keep-alive comment
+STREAM_POLL_SECONDS = 1.0
+STREAM_BACKLOG = 256
+STREAM_CLIENT_QUEUE = 100
+STREAM_HEARTBEAT_SECONDS = 15.0
+
+def _build_product_data(store):
+    """
+    Builds the dashboard rows (latest price per product plus its chart URL)
+    from the price store.
+    """
+    product_data = []
+    latest_prices = {}
+    stats_by_url = {}
+
+    try:
+        # The store keeps the latest row per product, so no history scan is needed.
+        # Rows without a valid price fall back to the product's last priced row.
+        latest_entries = store.latest_per_product(require_price=True)
+        tracing.trace("Latest entries found: %d", len(latest_entries))
+
+        # Keyed by url: two products may share a name
+        for row in latest_entries:
+            latest_prices[row["url"]] = {
+                "name": row["product_name"],
+                "price": f"${row['price']:.2f}" if row['price'] is not None else "N/A",
+                "availability": row["availability"],
+                "url": row["url"],
+                "timestamp": datetime.fromisoformat(row["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+                "last_updated": row["timestamp"]
+            }
+        tracing.trace("latest_prices dictionary: %r", latest_prices)
+        # Summary stats are maintained by the store on every insert: one table read, no history scan
+        stats_by_url = {stats["url"]: stats for stats in store.summary_stats()}
+        if not latest_prices:
+            tracing.trace("Warning: %s has no rows with a valid price. No product data to display.", STORE_FILE)
 
-def _get_safe_filename_base(product_name):
+    except Exception as e:
+        print(f"ERROR: Error loading or processing data from {STORE_FILE}: {e}")
+        # Continue with empty data if there's an error
+
+    # Combine data for rendering. Charts are rendered on demand by the /chart route,
+    # so every product gets a chart URL whether or not plotter.py has run.
+    slugs = chart_slugs(latest_prices)
+    for url, details in latest_prices.items():
+        slug = slugs[url]
+        product_data.append({
+            "name": details["name"],
+            "slug": slug,
+            "latest_price": details["price"],
+            "availability": details["availability"],
+            "url": details["url"],
+            "timestamp": details["timestamp"],
+            "last_updated": details["last_updated"],
+            "chart_image": f"/chart/{slug}.png?range={DEFAULT_CHART_RANGE}",
+            "stats": stats_by_url.get(details["url"]),
+        })
+
+    # Sort product_data by product name for consistent display
+    product_data.sort(key=lambda x: x['name'])
+    return product_data
+
+
+class LatestSnapshot:
     """
-    Generates a filesystem-safe and consistent base name for a product chart file.
-    It removes non-alphanumeric/non-space characters, then replaces spaces with underscores.
-    This function should be identical to the one in plotter.py for consistency.
+    Process-level cache of the dashboard rows. Rebuilt only when the store
+    changes (file version token or an in-process insert notification);
+    otherwise a page hit is a lookup.
     """
-    # Replace any character that is NOT a word character (alphanumeric + underscore) or a space
-    # with an empty string. This removes characters like commas, hyphens etc.
-    temp_name = re.sub(r'[^\w\s]', '', product_name)
-    # Replace one or more whitespace characters with a single underscore, then strip leading/trailing underscores
-    safe_name = re.sub(r'\s+', '_', temp_name).strip('_')
-    return safe_name
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._store = None
+        self._version = None
+        self._product_data = []
+        self._by_slug = {}
+        self._dirty = True
+
+    def _mark_dirty(self, rows=None):
+        self._dirty = True
+
+    def _current_version(self):
+        return self._store.version()
+
+    def get(self):
+        """Returns the current dashboard rows, rebuilding them if the data changed."""
+        with self._lock:
+            if self._store is None:
+                self._store = open_store()
+                self._store.add_listener(self._mark_dirty)
+            version = self._current_version()
+            if self._dirty or version != self._version:
+                self._dirty = False
+                self._product_data = _build_product_data(self._store)
+                self._by_slug = {product["slug"]: product for product in self._product_data}
+                # Take the version after the rebuild's own reads (opening the store can touch the files)
+                self._version = self._current_version()
+            return self._product_data
+
+    def find(self, slug):
+        """Returns the dashboard row for a product slug (chart file base name), or None."""
+        self.get()
+        return self._by_slug.get(slug)
+
+
+_snapshot = LatestSnapshot()
+
+# Dashboard row fields pushed to live-update clients
+LIVE_FIELDS = ("slug", "name", "latest_price", "availability", "timestamp", "last_updated", "chart_image")
+# Fields whose change is broadcast: every scrape moves the timestamps, even in
+# change-only mode where an unchanged observation only extends its run
+CHANGE_FIELDS = ("name", "latest_price", "availability")
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=STREAM_CLIENT_QUEUE)
+        self.dropped = False
+
+
+class ChangeBroadcaster:
+    """
+    Pushes dashboard rows whose price, availability or name changed
+    (CHANGE_FIELDS) to live-update subscribers. A single thread
+    per process watches the snapshot, woken by in-process inserts and otherwise
+    polling the store's version token. Each change is serialised once and put
+    on every subscriber's queue, so open dashboards cost one broadcast per
+    change instead of one rebuild per viewer.
+    """
+
+    def __init__(self, snapshot, poll_interval=STREAM_POLL_SECONDS):
+        self.snapshot = snapshot
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._backlog = deque(maxlen=STREAM_BACKLOG)
+        self._sequence = 0
+        self._last = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._listening = False
+
+    def mark(self, product_data):
+        """
+        Records the rows a page was rendered from (the baseline for the first
+        diff) and returns the event id the page should stream from.
+        """
+        with self._lock:
+            if self._last is None:
+                self._last = {row["slug"]: _live_row(row) for row in product_data}
+            return self._sequence
+
+    def subscribe(self, since=None):
+        """Adds a subscriber, replaying backlog events after `since`, and starts the broadcaster thread."""
+        subscriber = _Subscriber()
+        with self._lock:
+            if since is not None:
+                for event_id, message in self._backlog:
+                    if event_id > since:
+                        subscriber.queue.put_nowait(message)
+            self._subscribers.add(subscriber)
+            if not self._listening:
+                open_store().add_listener(self._notify)
+                self._listening = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="change-broadcaster", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _notify(self, rows=None):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.check()
+            except Exception as e:
+                print(f"ERROR: Live update check failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def check(self):
+        """Diffs the current snapshot against the last one and broadcasts changed rows. Returns their number."""
+        current = {row["slug"]: _live_row(row) for row in self.snapshot.get()}
+        with self._lock:
+            previous, self._last = self._last, current
+            if previous is None:
+                return 0
+            changed = [row for slug, row in current.items() if _changed(previous.get(slug), row)]
+            for row in changed:
+                self._sequence += 1
+                message = f"id: {self._sequence}\nevent: product\ndata: {json.dumps(row)}\n\n"
+                self._backlog.append((self._sequence, message))
+                for subscriber in list(self._subscribers):
+                    try:
+                        subscriber.queue.put_nowait(message)
+                    except queue.Full:
+                        # Too far behind: disconnect it; the browser reconnects with
+                        # Last-Event-ID and catches up from the backlog
+                        subscriber.dropped = True
+                        self._subscribers.discard(subscriber)
+        return len(changed)
+
+
+def _live_row(row):
+    return {field: row[field] for field in LIVE_FIELDS}
+
+
+def _changed(previous, row):
+    return previous is None or any(previous[field] != row[field] for field in CHANGE_FIELDS)
+
+
+_broadcaster = ChangeBroadcaster(_snapshot)
 
 @app.route('/')
 def index():
     """
     Displays the latest product prices and historical charts.
+    The page then follows /api/stream to patch changed rows in place.
     """
-    product_data = []
-    latest_prices = {}
+    product_data = _snapshot.get()
+    stream_since = _broadcaster.mark(product_data)
+    return render_template('index.html', product_data=product_data, stream_since=stream_since,
+                           tracing_enabled=tracing.ENABLED)
+
+@app.route('/api/stream')
+def stream():
+    """
+    Server-Sent Events stream of dashboard changes: one "product" event (JSON
+    with slug, name, latest_price, availability, timestamp, last_updated,
+    chart_image) per changed product. Clients resume after the event id in the
+    Last-Event-ID header or the `since` query parameter.
+    """
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", type=int)
+    subscriber = _broadcaster.subscribe(since)
 
-    print(f"DEBUG: Checking if DATA_FILE exists at: {DATA_FILE}")
-    if os.path.exists(DATA_FILE):
-        print(f"DEBUG: DATA_FILE found.")
+    def events():
         try:
-            df = pd.read_csv(DATA_FILE)
-            print(f"DEBUG: DataFrame loaded. Initial rows:\n{df.head()}")
-
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            print(f"DEBUG: Timestamp column converted.")
-
-            # Ensure 'price' column is numeric
-            df["price"] = pd.to_numeric(df["price"], errors='coerce')
-            print(f"DEBUG: Price column converted to numeric. Rows with NaN prices (before dropna):\n{df[df['price'].isna()].head()}")
-            
-            df.dropna(subset=['price'], inplace=True) # Drop rows where price is NaN after conversion
-            print(f"DEBUG: After dropna, DataFrame rows remaining: {len(df)}")
-
-            if not df.empty:
-                print(f"DEBUG: DataFrame is not empty. Processing latest entries.")
-                # Get the latest entry for each product
-                # Sort by timestamp descending and keep the first unique product entry
-                latest_entries = df.sort_values(by="timestamp", ascending=False).drop_duplicates(subset=["product_name"])
-                print(f"DEBUG: Latest entries found:\n{latest_entries}")
-
-                for index, row in latest_entries.iterrows():
-                    latest_prices[row["product_name"]] = {
-                        "price": f"${row['price']:.2f}" if pd.notna(row['price']) else "N/A",
-                        "availability": row["availability"],
-                        "url": row["url"],
-                        "timestamp": row["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                print(f"DEBUG: latest_prices dictionary:\n{latest_prices}")
-            else:
-                print(f"DEBUG: Warning: {DATA_FILE} is empty after dropping non-numeric prices. No product data to display.")
-
-        except Exception as e:
-            print(f"ERROR: Error loading or processing data from {DATA_FILE}: {e}")
-            # Continue with empty data if there's an error
+            yield "retry: 5000\n\n"
+            while not subscriber.dropped:
+                try:
+                    yield subscriber.queue.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            _broadcaster.unsubscribe(subscriber)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _parse_range(range_arg):
+    """Parses a chart range like '12h', '30d', '8w', '6m', '1y' (or 'all') into a timedelta."""
+    if not range_arg or range_arg == "all":
+        return None
+    match = re.fullmatch(r'(\d+)([hdwmy])', range_arg)
+    if not match:
+        raise ValueError(f"invalid range '{range_arg}'")
+    count, unit = int(match.group(1)), match.group(2)
+    days_per_unit = {"h": 1 / 24, "d": 1, "w": 7, "m": 30, "y": 365}
+    return timedelta(days=count * days_per_unit[unit])
+
+
+class ChartCache:
+    """
+    Bounded LRU cache of rendered chart bytes. Keys include the product's newest
+    data timestamp, so new data naturally produces a new key (and ETag).
+    """
+
+    def __init__(self, max_entries=CHART_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_chart_cache = ChartCache()
+
+@app.route('/chart/<slug>.<fmt>')
+def chart(slug, fmt):
+    """
+    Renders a product's price chart on demand from the price store.
+    The range query parameter (e.g. ?range=30d) is counted back from the product's
+    newest data point; width (pixels) sizes the chart, and long ranges are drawn
+    from the coarsest rollup that fills it. Responses carry an ETag, so unchanged
+    charts revalidate with a 304.
+    """
+    if fmt not in CHART_MIMETYPES:
+        abort(404)
+    product = _snapshot.find(slug)
+    if product is None:
+        abort(404)
+    range_arg = request.args.get("range", DEFAULT_CHART_RANGE)
+    try:
+        window = _parse_range(range_arg)
+    except ValueError as e:
+        abort(400, str(e))
+    width = _int_arg("width", CHART_WIDTH, minimum=CHART_MIN_WIDTH, maximum=CHART_MAX_WIDTH)
+
+    key = (product["url"], product["name"], range_arg, fmt, width, product["last_updated"])
+    etag = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        print(f"ERROR: Data file not found at {DATA_FILE}. No price data available.")
-
-
-    # Combine data for rendering - REVISED LOGIC
-    for product_name_key, details in latest_prices.items():
-        # Generate the expected chart filename base for this product using the consistent helper function
-        expected_filename_base = _get_safe_filename_base(product_name_key)
-        chart_filename = f"{expected_filename_base}_price_chart.png"
-        chart_url = f"/visuals/{chart_filename}"
-
-        # Check if the generated chart file actually exists on disk
-        full_chart_path = os.path.join(CHARTS_DIR_ABSOLUTE, chart_filename)
-        if os.path.exists(full_chart_path):
-            product_data.append({
-                "name": product_name_key,
-                "latest_price": details["price"],
-                "availability": details["availability"],
-                "url": details["url"],
-                "timestamp": details["timestamp"],
-                "chart_image": chart_url # Use the dynamically generated URL
-            })
+        body = _chart_cache.get(key)
+        if body is None:
+            start = None
+            if window is not None:
+                start = (datetime.fromisoformat(product["last_updated"]) - window).isoformat()
+            series = load_chart_series(open_store(), product["name"], product["url"], start=start, width=width)
+            buffer = io.BytesIO()
+            with metrics.timed("chart_render", format=fmt, resolution=series["resolution"] or "raw"):
+                render_price_chart(series["timestamps"], series["prices"], product["name"], buffer, format=fmt,
+                                   low=series["low"], high=series["high"], width=width)
+            body = buffer.getvalue()
+            _chart_cache.put(key, body)
+        response = Response(body, mimetype=CHART_MIMETYPES[fmt])
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={CHART_MAX_AGE_SECONDS}"
+    return response
+
+def _int_arg(name, default, minimum=0, maximum=None):
+    """Reads an integer query parameter, aborting with 400 if it is malformed or out of range."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        abort(400, f"'{name}' must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        abort(400, f"'{name}' must be between {minimum} and {maximum}")
+    return value
+
+def _step_series(product, start=None, end=None):
+    """A product's priced step series between start and end, as (datetime64 timestamps, prices) arrays."""
+    import numpy as np
+
+    series = open_store().read_series(url=product["url"], start=start, end=end).get(url=product["url"])
+    if series is None:
+        return np.array([], dtype="datetime64[us]"), np.array([], dtype=np.float64)
+    return series.steps(start=start)
+
+def _series_points(timestamps, prices):
+    """JSON points for a step series, with timestamps in the store's ISO format."""
+    return [
+        {"timestamp": timestamp.isoformat(), "price": price}
+        for timestamp, price in zip(timestamps.astype(object), prices.tolist())
+    ]
+
+@app.route('/api/products/<slug>/history')
+def product_history(slug):
+    """
+    Returns a product's price history as JSON.
+    Query parameters:
+      start, end   ISO timestamps bounding the series (inclusive, optional)
+      limit, offset  page through the stored rows (limit defaults to HISTORY_DEFAULT_LIMIT);
+                   each row is a run of identical observations from timestamp to last_seen
+      downsample   'lttb' or 'minmax': return at most `points` representative points
+                   for the whole range instead of a page of raw rows
+      points       maximum number of downsampled points (defaults to limit)
+      resolution   '1h', '1d' or '1w': return OHLC rollup buckets instead of rows;
+                   'auto' picks the coarsest one that fills `width` pixels, or
+                   returns the raw points when the range is too short for any
+      width        chart width in pixels for resolution=auto (default CHART_WIDTH)
+    """
+    product = _snapshot.find(slug)
+    if product is None:
+        abort(404)
+    start = request.args.get("start")
+    end = request.args.get("end")
+    method = request.args.get("downsample")
+    resolution = request.args.get("resolution")
+    limit = _int_arg("limit", HISTORY_DEFAULT_LIMIT, minimum=1, maximum=HISTORY_MAX_LIMIT)
+    result = {"product": product["name"], "url": product["url"], "start": start, "end": end}
+
+    if resolution:
+        store = open_store()
+        if resolution == "auto":
+            width = _int_arg("width", CHART_WIDTH, minimum=CHART_MIN_WIDTH, maximum=CHART_MAX_WIDTH)
+            resolution = store.chart_resolution(product["url"], width, start=start, end=end)
+        elif resolution not in ROLLUP_RESOLUTIONS:
+            abort(400, f"'resolution' must be 'auto' or one of {', '.join(ROLLUP_RESOLUTIONS)}")
+        if resolution is None:
+            points = _series_points(*_step_series(product, start, end))
         else:
-            print(f"DEBUG: Chart file not found for '{product_name_key}' at expected path: {full_chart_path}")
-            product_data.append({
-                "name": product_name_key,
-                "latest_price": details["price"],
-                "availability": details["availability"],
-                "url": details["url"],
-                "timestamp": details["timestamp"],
-                "chart_image": "" # No chart image if file doesn't exist
-            })
+            points = store.read_rollups(product["url"], resolution, start=start, end=end)
+        result.update({"resolution": resolution, "points": points})
+    elif method:
+        # numpy is only imported by the routes that need it, to keep startup fast
+        import numpy as np
+        from visuals.downsample import downsample, METHODS as DOWNSAMPLE_METHODS
 
-    # Sort product_data by product name for consistent display
-    product_data.sort(key=lambda x: x['name'])
+        if method not in DOWNSAMPLE_METHODS:
+            abort(400, f"'downsample' must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+        points = _int_arg("points", limit, minimum=3, maximum=HISTORY_MAX_LIMIT)
+        # Stored rows are run-length compressed; downsample the expanded step series
+        timestamps, prices = _step_series(product, start, end)
+        # LTTB only needs a monotonic numeric x axis
+        keep = downsample(timestamps.astype(np.int64) / 1e6, prices, points, method=method)
+        result.update({
+            "downsample": method,
+            "total": len(timestamps),
+            "points": _series_points(timestamps[keep], prices[keep]),
+        })
+    else:
+        offset = _int_arg("offset", 0)
+        # Fetch one extra row to know whether there is a next page
+        rows = open_store().get_range(url=product["url"], start=start, end=end, limit=limit + 1, offset=offset)
+        has_more = len(rows) > limit
+        result.update({
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if has_more else None,
+            "points": [
+                {
+                    "timestamp": row["timestamp"],
+                    "last_seen": row["last_seen"],
+                    "observations": row["observations"],
+                    "price": row["price"],
+                    "availability": row["availability"],
+                    "source": row["source"],
+                }
+                for row in rows[:limit]
+            ],
+        })
+    return jsonify(result)
 
-    print(f"DEBUG: Final product_data for rendering: {product_data}")
-    return render_template('index.html', product_data=product_data)
+@app.route('/api/products/<slug>/stats')
+def product_stats(slug):
+    """
+    Returns a product's summary statistics as JSON: observation count, all-time
+    min/max (with when they were seen), the last price change, and min/max/average
+    and % change over the rolling windows ending at its latest observation.
+    """
+    product = _snapshot.find(slug)
+    if product is None:
+        abort(404)
+    stats = open_store().summary_stats(product["url"])
+    if stats is None:
+        abort(404)
+    return jsonify({"product": product["name"], **stats})
+
+def _traced_products():
+    """Trace buffers for the ?product=<slug> query parameter (all products if absent)."""
+    slug = request.args.get("product")
+    url = None
+    if slug:
+        product = _snapshot.find(slug)
+        if product is None:
+            abort(404)
+        url = product["url"]
+    limit = _int_arg("limit", tracing.TRACE_BUFFER, minimum=1, maximum=tracing.TRACE_BUFFER)
+    return tracing.collect(url=url, limit=limit)
+
+@app.route('/traces')
+def traces():
+    """
+    Shows the latest debug traces per product, from this process and from the
+    snapshots saved by scraper processes (see scraper/tracing.py).
+    """
+    return render_template('traces.html', products=_traced_products(), tracing_enabled=tracing.ENABLED,
+                           trace_dir=tracing.TRACE_DIR)
+
+@app.route('/api/traces')
+def traces_api():
+    """The traces shown by /traces, as JSON."""
+    return jsonify(_traced_products())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Exposes the pipeline metrics in the Prometheus text format: this process's
+    (chart rendering) summed with the snapshots saved by the scraping processes.
+    """
+    return Response(metrics.render_prometheus(merge_saved=True), mimetype="text/plain; version=0.0.4")
 
 # NEW ROUTE: Explicitly serve static files from the 'visuals' directory
 @app.route('/visuals/<path:filename>')
@@ -120,7 +556,7 @@ def serve_visuals(filename):
     """
     Serves static files (charts) from the visuals directory.
     """
-    print(f"DEBUG: Request for static file: {filename} in directory: {CHARTS_DIR_ABSOLUTE}")
+    tracing.trace("Request for static file: %s in directory: %s", filename, CHARTS_DIR_ABSOLUTE)
     return send_from_directory(CHARTS_DIR_ABSOLUTE, filename)
 
 if __name__ == '__main__':
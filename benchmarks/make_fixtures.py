@@ -0,0 +1,111 @@
+"""
+Writes the synthetic product pages used by the benchmark suite to benchmarks/fixtures/.
+The pages mimic the structure the scraper relies on (Amazon selectors, BestBuy's
+Apollo SSR script, JSON-LD / meta tag structured data) at realistic sizes. Output is deterministic, so the committed
+fixtures can be regenerated at any time:
+
+    python benchmarks/make_fixtures.py
+
+To benchmark against real pages instead, save them over these files (same names).
+"""
+import os
+import json
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+AMAZON_FIXTURE = os.path.join(FIXTURES_DIR, "amazon_product.html")
+BESTBUY_FIXTURE = os.path.join(FIXTURES_DIR, "bestbuy_product.html")
+STRUCTURED_FIXTURE = os.path.join(FIXTURES_DIR, "structured_product.html")
+
+
+def _filler_html(rng, blocks):
+    """Navigation/recommendation-style markup that the parsers have to skip over."""
+    parts = []
+    for i in range(blocks):
+        words = " ".join(rng.choice(["deal", "prime", "audio", "vacuum", "cordless", "wireless", "save"]) for _ in range(8))
+        parts.append(
+            f'<div class="a-section s-result-item" data-index="{i}"><a class="a-link-normal" href="/dp/B0{i:08d}">'
+            f'<span class="a-size-base">{words}</span></a><ul><li>{i}</li><li>{words}</li></ul></div>'
+        )
+    return "\n".join(parts)
+
+
+def make_amazon_page(rng):
+    head_scripts = "".join(f"<script>var x{i} = {json.dumps({'k': 'v' * 200, 'i': i})};</script>" for i in range(100))
+    return (
+        f"<!DOCTYPE html><html><head><title>Amazon.com: Dyson Gen5detect</title>{head_scripts}</head><body>"
+        f'<div id="nav-belt">{_filler_html(rng, 700)}</div>'
+        '<div id="centerCol"><h1 id="title"><span id="productTitle" class="a-size-large">'
+        "        Dyson Gen5detect Cordless Vacuum Cleaner, Purple        </span></h1>"
+        '<div id="corePrice_feature_div"><span class="a-price"><span class="a-price-whole">749<span class="a-price-decimal">.</span></span>'
+        '<span class="a-price-fraction">99</span></span></div>'
+        '<div id="availability" class="a-section"><span class="a-size-medium a-color-success">  In Stock  </span></div></div>'
+        f'<div id="recommendations">{_filler_html(rng, 700)}</div>'
+        "</body></html>"
+    )
+
+
+def make_bestbuy_page(rng):
+    rehydrate = {}
+    for i in range(1000):
+        rehydrate[f"query{i}"] = {"data": {"shop": {"id": i, "items": [{"sku": f"{i:07d}", "label": "x" * 40, "flag": "UNDEF"}] * 3}}}
+    rehydrate["partialProduct"] = {"data": {"productBySkuId": {"name": {"short": "Apple - AirPods Pro 2"}, "skuId": "6447382"}}}
+    rehydrate["fullProduct"] = {"data": {"productBySkuId": {
+        "skuId": "6447382",
+        "name": {"short": "Apple - AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature - White"},
+        "buyingOptions": [
+            {"type": "Refurbished", "product": {"price": {"customerPrice": 169.99}}},
+            {"type": "New", "product": {"price": {"customerPrice": 249.99}}},
+        ],
+        "fulfillmentOptions": {
+            "ispuDetails": [{"ispuAvailability": [{"instoreInventoryAvailable": True}]}],
+            "shippingDetails": [{"shippingAvailability": [{"shippingEligible": True}]}],
+        },
+        "openBox": "UNDEF",
+    }}}
+    blob = json.dumps({"rehydrate": rehydrate}, separators=(",", ":")).replace('"UNDEF"', "undefined")
+    return (
+        "<!DOCTYPE html><html><head><title>Apple AirPods Pro 2 - Best Buy</title></head><body>"
+        f'<div class="shop-header">{_filler_html(rng, 500)}</div>'
+        '<h1 class="heading-3">Apple - AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature - White</h1>'
+        f'<div class="footer">{_filler_html(rng, 500)}</div>'
+        f'<script>(window[Symbol.for("ApolloSSRDataTransport")] ??= []).push({blob});</script>'
+        "</body></html>"
+    )
+
+
+def make_structured_page(rng):
+    """The Amazon page with the product also described by JSON-LD and og:/product: meta tags."""
+    json_ld = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": "Dyson Gen5detect Cordless Vacuum Cleaner, Purple",
+        "sku": "B0C2JD5H7D",
+        "offers": {"@type": "Offer", "price": "749.99", "priceCurrency": "USD", "availability": "https://schema.org/InStock"},
+    }
+    structured = (
+        '<meta property="og:title" content="Dyson Gen5detect Cordless Vacuum Cleaner, Purple">'
+        '<meta property="product:price:amount" content="749.99">'
+        '<meta property="product:price:currency" content="USD">'
+        f'<script type="application/ld+json">{json.dumps(json_ld)}</script>'
+    )
+    return make_amazon_page(rng).replace("</title>", "</title>" + structured, 1)
+
+
+def write_fixtures():
+    """(Re)generates the fixture files and returns their paths."""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    fixtures = (
+        (AMAZON_FIXTURE, make_amazon_page),
+        (BESTBUY_FIXTURE, make_bestbuy_page),
+        (STRUCTURED_FIXTURE, make_structured_page),
+    )
+    for path, make_page in fixtures:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_page(random.Random(0)))
+        print(f"Wrote {path} ({os.path.getsize(path) // 1024} KB)")
+    return tuple(path for path, _ in fixtures)
+
+
+if __name__ == "__main__":
+    write_fixtures()
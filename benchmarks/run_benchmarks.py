@@ -0,0 +1,465 @@
+"""
+Offline benchmark suite for the price tracker's hot paths:
+
+  - parse_amazon / parse_bestbuy on the saved HTML fixtures (read through
+    get_page_content's local_html_path mechanism, so no network is used), and
+    the structured-data tier against the DOM parser on a page that has both,
+    with the peak memory each parse allocates (tracemalloc)
+  - appending a scrape batch to the price store, and the legacy CSV
+    read-concat-rewrite that scraper.main used to do
+  - loading the full history as compact per-product series, against a
+    DataFrame filtered once per product
+  - plotter.generate_price_charts
+  - the Flask index route through the test client
+  - price-alert evaluation against a synthetic set of rules (1M by default),
+    compared with scanning every rule of a product
+  - cold start: a fresh interpreter importing the dashboard and answering its
+    first request (target: under STARTUP_TARGET_SECONDS), against importing
+    Flask alone, and importing the scraper, chart and scheduler entry points
+
+Store, CSV and chart benchmarks run against synthetic price histories of the
+requested sizes, built in a temporary directory. Results are written as JSON
+(one file per commit by default) so runs can be compared across commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 10k,1M,10M] [--products 50] [--rules 1M] [--repeat 5] [--output PATH]
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BENCH_DIR, os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.make_fixtures import AMAZON_FIXTURE, BESTBUY_FIXTURE, STRUCTURED_FIXTURE, write_fixtures
+from scraper import store as store_module
+from scraper import scraper, tracing
+from scraper.parsing import make_document, make_soup, backend_available, BACKENDS
+from scraper.catalog import DEFAULT_PRODUCTS, SITE_SELECTORS
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+# Products the synthetic alert rules are spread over
+ALERT_PRODUCTS = 1000
+# The dashboard should answer its first request within this long of being started.
+# Importing Flask alone takes most of it (180-260 ms on the reference machine, where
+# the dashboard measures 200-350 ms), so the target leaves headroom for that noise.
+STARTUP_TARGET_SECONDS = 0.5
+# Programs timed in a fresh interpreter by the startup benchmark; import_flask is
+# the floor the dashboard's own imports and first request are measured against
+STARTUP_PROGRAMS = {
+    "import_flask": "import flask",
+    "dashboard_first_request": (
+        "import sys; sys.path.insert(0, 'app'); import app; "
+        "assert app.app.test_client().get('/').status_code == 200"
+    ),
+    "import_scraper": "import scraper.scraper",
+    "import_plotter": "import visuals.plotter",
+    "import_main": "import main",
+}
+# Synthetic histories end here (in the past, so incremental chart runs can skip up-to-date charts)
+HISTORY_END = datetime(2025, 1, 1)
+
+
+def measure(fn, repeat):
+    """Runs fn `repeat` times (stdout suppressed) and returns timing statistics in seconds."""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+    }
+
+
+def peak_memory(fn):
+    """Runs fn once (stdout suppressed) under tracemalloc and returns the peak bytes it allocated."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            fn()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def measure_with_memory(fn, repeat):
+    """measure(), plus the peak memory of one more run (timed separately: tracing slows it down)."""
+    return {**measure(fn, repeat), "peak_bytes": peak_memory(fn)}
+
+
+def _record(results, name, stats, **params):
+    results.append({"name": name, **params, **stats})
+    label = " ".join(f"{key}={value}" for key, value in params.items())
+    peak = f", peak {stats['peak_bytes'] / 1024:.0f} KiB" if "peak_bytes" in stats else ""
+    print(f"  {name:<32} {label:<24} median {stats['median'] * 1000:10.2f} ms  (min {stats['min'] * 1000:.2f} ms, n={stats['repeat']}{peak})")
+
+
+def bench_parsers(results, repeat):
+    """Times the site parsers on the fixtures, for every available backend, with their peak memory."""
+    if not all(os.path.exists(path) for path in (AMAZON_FIXTURE, BESTBUY_FIXTURE, STRUCTURED_FIXTURE)):
+        write_fixtures()
+    amazon_product, bestbuy_product = DEFAULT_PRODUCTS[0], DEFAULT_PRODUCTS[1]
+    with contextlib.redirect_stdout(io.StringIO()):
+        amazon_html = scraper.get_page_content(amazon_product["url"], local_html_path=os.path.relpath(AMAZON_FIXTURE, PROJECT_ROOT))
+        bestbuy_html = scraper.get_page_content(bestbuy_product["url"], local_html_path=os.path.relpath(BESTBUY_FIXTURE, PROJECT_ROOT))
+        structured_html = scraper.get_page_content(amazon_product["url"], local_html_path=os.path.relpath(STRUCTURED_FIXTURE, PROJECT_ROOT))
+
+    selectors = SITE_SELECTORS["amazon"]
+    for backend in BACKENDS:
+        if not backend_available(backend):
+            continue
+        stats = measure_with_memory(lambda: scraper.parse_amazon(make_document(amazon_html, backend), selectors), repeat)
+        _record(results, "parse_amazon", stats, backend=backend, mode="full")
+        if backend != "selectolax":
+            stats = measure_with_memory(lambda: scraper.parse_amazon(make_document(amazon_html, backend, selectors), selectors), repeat)
+            _record(results, "parse_amazon", stats, backend=backend, mode="partial")
+
+    stats = measure_with_memory(lambda: scraper.parse_bestbuy_fast(bestbuy_html), repeat)
+    _record(results, "parse_bestbuy", stats, mode="fast")
+    stats = measure_with_memory(lambda: scraper.parse_bestbuy(make_soup(bestbuy_html), SITE_SELECTORS["bestbuy"]), repeat)
+    _record(results, "parse_bestbuy", stats, mode="full")
+    # The same parse with tracing on (buffered, not printed), for the cost of its traces
+    tracing.enable()
+    try:
+        stats = measure_with_memory(lambda: scraper.parse_bestbuy(make_soup(bestbuy_html), SITE_SELECTORS["bestbuy"]), repeat)
+        _record(results, "parse_bestbuy", stats, mode="full_traced")
+    finally:
+        tracing.disable()
+        tracing.BUFFER.clear()
+
+    stats = measure_with_memory(lambda: scraper.parse_page(structured_html, "amazon", selectors), repeat)
+    _record(results, "parse_page", stats, tier="structured")
+    scraper.STRUCTURED_DATA = False
+    try:
+        stats = measure_with_memory(lambda: scraper.parse_page(structured_html, "amazon", selectors), repeat)
+        _record(results, "parse_page", stats, tier="dom")
+    finally:
+        scraper.STRUCTURED_DATA = True
+
+
+def _synthetic_rows(rows, products, seed=0):
+    """Yields a random-walk price history: `products` products sampled round-robin every hour."""
+    rng = random.Random(seed)
+    history_start = HISTORY_END - timedelta(hours=rows // products + 1)
+    prices = [rng.uniform(20, 1500) for _ in range(products)]
+    for i in range(rows):
+        product = i % products
+        if rng.random() < 0.05:
+            prices[product] = max(1.0, prices[product] * rng.uniform(0.9, 1.1))
+        yield {
+            "timestamp": (history_start + timedelta(hours=i // products)).isoformat(),
+            "product_name": f"Synthetic Product {product:05d}",
+            "price": round(prices[product], 2),
+            "availability": "In Stock" if rng.random() < 0.9 else "Out of Stock",
+            "url": f"https://www.example.com/dp/{product:08d}",
+        }
+
+
+def build_history(data_dir, rows, products):
+    """
+    Creates a price store (and the equivalent legacy CSV) holding `rows` synthetic
+    rows, one stored row per scrape (as the legacy CSV and append-only store did).
+    Summary stats are built once at the end, as a bulk import would.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    store_module.STORE_FILE = os.path.join(data_dir, "prices.db")
+    store_module.LEGACY_CSV_FILE = os.path.join(data_dir, "legacy_prices.csv")
+    store = store_module.PriceStore(store_module.STORE_FILE, change_only=False, maintain_stats=False)
+    batch = []
+    for row in _synthetic_rows(rows, products):
+        batch.append(row)
+        if len(batch) >= 100_000:
+            store.insert_batch(batch)
+            batch = []
+    store.insert_batch(batch)
+    store.recompute_stats()
+    store.maintain_stats = True
+    store.export_csv(store_module.LEGACY_CSV_FILE)
+    # The CSV is only the legacy-append baseline: keep open_store() from importing it again
+    with contextlib.closing(store.connect()) as conn:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES ('csv_migrated', ?)",
+                         (store_module.LEGACY_CSV_FILE,))
+    return store
+
+
+def _scrape_batch(products, when):
+    return [
+        {
+            "timestamp": when.isoformat(),
+            "product_name": f"Synthetic Product {product:05d}",
+            "price": 99.99,
+            "availability": "In Stock",
+            "url": f"https://www.example.com/dp/{product:08d}",
+        }
+        for product in range(products)
+    ]
+
+
+def bench_store_append(results, store, size_label, rows, products, repeat):
+    """Compares appending one scrape batch to the store with the legacy CSV rewrite."""
+    import pandas as pd
+
+    csv_path = store_module.LEGACY_CSV_FILE
+    when = [HISTORY_END]
+
+    def store_append():
+        when[0] += timedelta(hours=1)
+        store.insert_batch(_scrape_batch(products, when[0]))
+
+    def store_change_only():
+        store.change_only = True
+        try:
+            store_append()
+        finally:
+            store.change_only = False
+
+    def legacy_csv_append():
+        when[0] += timedelta(hours=1)
+        existing_df = pd.read_csv(csv_path)
+        new_df = pd.DataFrame(_scrape_batch(products, when[0]))
+        pd.concat([existing_df, new_df], ignore_index=True).to_csv(csv_path, index=False)
+
+    _record(results, "store_insert_batch", measure(store_append, repeat), size=size_label, products=products)
+    _record(results, "store_insert_batch_change_only", measure(store_change_only, repeat), size=size_label, products=products)
+    # The legacy path rewrites the whole history; one run is plenty at large sizes
+    _record(results, "legacy_csv_append", measure(legacy_csv_append, 1 if rows > 100_000 else repeat),
+            size=size_label, products=products)
+
+
+def bench_stats(results, store, size_label):
+    """Times the full vectorized rebuild of the summary stats and rollups."""
+    _record(results, "recompute_stats", measure(store.recompute_stats, 1), size=size_label)
+    _record(results, "summary_stats", measure(store.summary_stats, 5), size=size_label)
+
+
+def bench_series(results, store, size_label, rows):
+    """
+    Times loading the whole history as a SeriesSet plus a lookup of every
+    product, against a DataFrame filtered once per product, and reports the
+    memory each takes per observation.
+    """
+    series = store.read_series()
+    observations = int(series.observations.sum())
+
+    def series_per_product():
+        loaded = store.read_series()
+        for url in loaded.urls.values:
+            loaded.get(url=url).steps()
+
+    _record(results, "read_series", measure(series_per_product, 1), size=size_label,
+            bytes_per_observation=round(series.nbytes / observations, 1))
+    del series
+    # The DataFrame holds a Python string per cell; skip it where it would not fit comfortably in memory
+    if rows > 1_000_000:
+        return
+    frame = store.read_frame(expand=False)
+
+    def frame_per_product():
+        df = store.read_frame(expand=False)
+        for name in df["product_name"].unique():
+            df[df["product_name"] == name]
+
+    _record(results, "read_frame", measure(frame_per_product, 1), size=size_label,
+            bytes_per_observation=round(frame.memory_usage(deep=True).sum() / observations, 1))
+
+
+def bench_plotter(results, data_dir, size_label):
+    from visuals import plotter
+
+    plotter.CHARTS_DIR = os.path.join(data_dir, "charts")
+    _record(results, "generate_price_charts", measure(lambda: plotter.generate_price_charts(force=True), 1),
+            size=size_label, mode="full")
+    _record(results, "generate_price_charts", measure(lambda: plotter.generate_price_charts(), 1),
+            size=size_label, mode="incremental")
+
+
+def bench_index(results, size_label, repeat):
+    with contextlib.redirect_stdout(io.StringIO()):
+        sys.path.insert(1, os.path.join(PROJECT_ROOT, "app"))
+        import app as app_module
+    app_module._snapshot = app_module.LatestSnapshot()
+    client = app_module.app.test_client()
+    _record(results, "index_route", measure(lambda: client.get("/"), 1), size=size_label, mode="cold")
+    _record(results, "index_route", measure(lambda: client.get("/"), repeat), size=size_label, mode="warm")
+
+
+def bench_startup(results, work_dir, products, repeat):
+    """
+    Times each STARTUP_PROGRAMS entry as a whole process (interpreter start
+    included), the way a user or process manager sees it, against a small
+    synthetic history so the dashboard has products to render.
+    """
+    data_dir = os.path.join(work_dir, "startup")
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_history(data_dir, SIZES["10k"], products)
+    env = dict(os.environ, PRICE_TRACKER_DATA_DIR=data_dir)
+    for name, program in STARTUP_PROGRAMS.items():
+        def run():
+            subprocess.run([sys.executable, "-c", program], cwd=PROJECT_ROOT, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        stats = measure(run, repeat)
+        _record(results, name, stats, size="10k")
+    medians = {result["name"]: result["median"] for result in results if "median" in result}
+    dashboard = medians["dashboard_first_request"]
+    met = "met" if dashboard < STARTUP_TARGET_SECONDS else "NOT met"
+    print(f"  first-request target of {STARTUP_TARGET_SECONDS * 1000:.0f} ms {met} "
+          f"({(dashboard - medians['import_flask']) * 1000:.0f} ms above importing Flask)")
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _alert_rules(rules, products, seed=0):
+    """Yields random alert rules: 80% price targets within 30% of the product's base price, 20% in-stock."""
+    rng = random.Random(seed)
+    for i in range(rules):
+        product = i % products
+        if rng.random() < 0.8:
+            yield {"url": f"https://www.example.com/dp/{product:08d}", "kind": "below",
+                   "target": round(100 + product % 400 * rng.uniform(0.7, 1.0), 2)}
+        else:
+            yield {"url": f"https://www.example.com/dp/{product:08d}", "kind": "in_stock"}
+
+
+def bench_alerts(results, work_dir, rule_label, repeat):
+    """
+    Times bulk rule import and evaluating scrape batches against the rules
+    (the bisect index plus the SQLite state), and the matching step alone
+    against a scan over every rule of the product.
+    """
+    from scraper.alerts import AlertEngine, MemorySink
+
+    rules = SIZES[rule_label]
+    sink = MemorySink()
+    engine = AlertEngine(os.path.join(work_dir, f"alerts_{rule_label}.db"), sink=sink)
+    _record(results, "alerts_add_rules", measure(lambda: engine.add_rules(_alert_rules(rules, ALERT_PRODUCTS), batch_size=100_000), 1),
+            rules=rule_label, products=ALERT_PRODUCTS)
+
+    rng = random.Random(1)
+    prices = [100 + product % 400 * 1.5 for product in range(ALERT_PRODUCTS)]
+    when = [HISTORY_END]
+
+    def observe():
+        # Random walk around the targets, so batches cross some rules
+        when[0] += timedelta(hours=1)
+        batch = _scrape_batch(ALERT_PRODUCTS, when[0])
+        for product, row in enumerate(batch):
+            base = 100 + product % 400
+            prices[product] = min(max(prices[product] * rng.uniform(0.9, 1.1), base * 0.6), base * 1.5)
+            row["price"] = round(prices[product], 2)
+            row["availability"] = "In Stock" if rng.random() < 0.9 else "Out of Stock"
+        engine.evaluate(batch)
+        sink.notifications.clear()
+
+    # The first observation of each product settles its new rules (prices start above every target)
+    _record(results, "alerts_evaluate", measure(observe, 1), rules=rule_label, products=ALERT_PRODUCTS, mode="settle")
+    _record(results, "alerts_evaluate", measure(observe, 1), rules=rule_label, products=ALERT_PRODUCTS, mode="cold")
+    _record(results, "alerts_evaluate", measure(observe, repeat), rules=rule_label, products=ALERT_PRODUCTS, mode="warm")
+
+    from bisect import bisect_left
+
+    index = [engine._index[f"https://www.example.com/dp/{product:08d}"] for product in range(ALERT_PRODUCTS)]
+    moves = [(rng.uniform(60, 600), rng.uniform(60, 600)) for _ in range(ALERT_PRODUCTS)]
+
+    def match_bisect():
+        for (targets, ids, _), (price, previous) in zip(index, moves):
+            ids[bisect_left(targets, price):bisect_left(targets, previous)]
+
+    def match_scan():
+        for (targets, ids, _), (price, previous) in zip(index, moves):
+            [rule_id for target, rule_id in zip(targets, ids) if price <= target < previous]
+
+    _record(results, "alerts_match", measure(match_bisect, repeat), rules=rule_label, products=ALERT_PRODUCTS, mode="bisect")
+    _record(results, "alerts_match", measure(match_scan, 1), rules=rule_label, products=ALERT_PRODUCTS, mode="scan")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--sizes", default="10k,1M,10M", help=f"comma-separated history sizes ({', '.join(SIZES)})")
+    parser.add_argument("--products", type=int, default=50, help="number of products in the synthetic histories")
+    parser.add_argument("--rules", default="1M", help=f"number of alert rules for the alerts benchmark ({', '.join(SIZES)})")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions for the fast benchmarks")
+    parser.add_argument("--skip", default="", help="comma-separated groups to skip (parse,startup,store,plot,index,alerts)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    skip = set(filter(None, args.skip.split(",")))
+    commit = _git_commit()
+    results = []
+
+    if "parse" not in skip:
+        print("Parsers:")
+        bench_parsers(results, args.repeat)
+
+    work_dir = tempfile.mkdtemp(prefix="price_tracker_bench_")
+    try:
+        if "startup" not in skip:
+            print(f"Cold start ({args.products} products):")
+            bench_startup(results, work_dir, args.products, args.repeat)
+        if "alerts" not in skip:
+            print(f"Alerts ({args.rules} rules over {ALERT_PRODUCTS} products):")
+            bench_alerts(results, work_dir, args.rules, args.repeat)
+        for size_label in filter(None, args.sizes.split(",")):
+            rows = SIZES[size_label]
+            print(f"History of {size_label} rows ({args.products} products):")
+            data_dir = os.path.join(work_dir, size_label)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                store = build_history(data_dir, rows, args.products)
+            print(f"  (built synthetic history in {time.perf_counter() - start:.1f} s)")
+            if "store" not in skip:
+                bench_store_append(results, store, size_label, rows, args.products, args.repeat)
+                bench_stats(results, store, size_label)
+                bench_series(results, store, size_label, rows)
+            if "plot" not in skip:
+                bench_plotter(results, data_dir, size_label)
+            if "index" not in skip:
+                bench_index(results, size_label, args.repeat)
+            shutil.rmtree(data_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
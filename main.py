@@ -1,10 +1,10 @@
 import json
-import time
-import schedule
 import logging
-from src.scraper import Scraper
-from src.database import Database
-from src.plotter import Plotter
+from scraper.scraper import scrape_product
+from scraper.scheduler import AdaptiveScheduler
+from scraper.store import open_store
+from scraper.catalog import open_catalog, normalize_product
+from scraper.alerts import open_alerts
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,74 +12,138 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def load_config():
-    print("Loading config.json...")
+HOUR = 3600
+
+CONFIG_FILE = 'config.json'
+
+# Numeric settings and their defaults; None means "derived from scrape_interval_hours"
+CONFIG_DEFAULTS = {
+    'scrape_interval_hours': 24,
+    'min_interval_hours': None,
+    'max_interval_hours': None,
+    'max_workers': 4,
+    'initial_spread_minutes': 5,
+}
+
+# Optional: schedule only one site, or one host-based shard of 'shards' (like scraper.py --shard/--shards)
+SHARD_SETTINGS = ('site', 'shard', 'shards')
+
+def validate_config(config):
+    """
+    Checks a parsed config.json and returns it with defaults filled in.
+    Raises ValueError naming every problem found, so a bad config fails at
+    startup instead of in the middle of a scrape cycle.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("config.json must contain a JSON object")
+    problems = []
+    products = config.get('products') or []
+    if not isinstance(products, list):
+        problems.append("'products' must be a list")
+        products = []
+    for index, record in enumerate(products):
+        try:
+            normalize_product(record)
+        except (ValueError, TypeError, AttributeError) as e:
+            problems.append(f"products[{index}]: {e}")
+    settings = dict(CONFIG_DEFAULTS)
+    for key in CONFIG_DEFAULTS:
+        value = config.get(key)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            problems.append(f"'{key}' must be a number, got {value!r}")
+        elif value < 0 or (value == 0 and key != 'initial_spread_minutes'):
+            problems.append(f"'{key}' must be positive, got {value!r}")
+        else:
+            settings[key] = value
+    if isinstance(settings['max_workers'], float) and not settings['max_workers'].is_integer():
+        problems.append(f"'max_workers' must be a whole number, got {settings['max_workers']!r}")
+    site, shard, shards = (config.get(key) for key in SHARD_SETTINGS)
+    if site is not None and not isinstance(site, str):
+        problems.append(f"'site' must be a string, got {site!r}")
+    if shards is not None and (isinstance(shards, bool) or not isinstance(shards, int) or shards < 1):
+        problems.append(f"'shards' must be a positive whole number, got {shards!r}")
+    elif shard is not None and (isinstance(shard, bool) or not isinstance(shard, int)
+                                or shard < 0 or (shards is not None and shard >= shards)):
+        problems.append(f"'shard' must be a whole number from 0 to shards - 1, got {shard!r}")
+    if problems:
+        raise ValueError("Invalid config.json: " + "; ".join(problems))
+
+    base_hours = settings['scrape_interval_hours']
+    if settings['min_interval_hours'] is None:
+        settings['min_interval_hours'] = base_hours / 8
+    if settings['max_interval_hours'] is None:
+        settings['max_interval_hours'] = base_hours * 4
+    if settings['min_interval_hours'] > settings['max_interval_hours']:
+        raise ValueError("Invalid config.json: 'min_interval_hours' is larger than 'max_interval_hours'")
+    settings['max_workers'] = int(settings['max_workers'])
+    return {**config, **settings, 'products': products}
+
+def load_config(path=CONFIG_FILE):
+    """Reads and validates the config once; main() passes the result around instead of re-reading it."""
+    print(f"Loading {path}...")
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
+        with open(path, 'r', encoding='utf-8') as f:
             content = f.read()
-            print(f"Config content: {content}")
-            if not content.strip():
-                raise ValueError("config.json is empty")
-            return json.loads(content)
+        if not content.strip():
+            raise ValueError(f"{path} is empty")
+        config = validate_config(json.loads(content))
     except Exception as e:
-        logging.error(f"Failed to load config.json: {e}")
-        print(f"Error loading config.json: {e}")
+        logging.error(f"Failed to load {path}: {e}")
+        print(f"Error loading {path}: {e}")
         raise
+    print(f"Loaded {len(config['products'])} products from {path}.")
+    return config
 
-def scrape_and_update():
-    print("Starting scrape_and_update...")
-    config = load_config()
-    scraper = Scraper()
-    db = Database()
-    plotter = Plotter()
-
-    for product in config['products']:
-        print(f"Scraping {product['name']} ({product['url']})...")
-        try:
-            data = scraper.scrape_product(product)
-            print(f"Scraped data: {data}")
-            db.insert_data(data)
-            print(f"Inserted data for {product['name']} into database")
-            df = db.get_data(product['url'])
-            print(f"DataFrame for {product['name']}: {df}")
-            if not df.empty:
-                db.export_to_csv(product['url'])
-                print(f"Exported CSV for {product['name']}")
-                chart_path = f'data/exports/price_chart_{product["name"].replace(" ", "_")}.png'
-                plotter.plot_price_history(df, product['name'], chart_path)
-                print(f"Generated chart for {product['name']} at {chart_path}")
-            else:
-                print(f"No data to plot for {product['name']}")
-            logging.info(f"Scraped {product['name']} successfully")
-        except Exception as e:
-            logging.error(f"Error processing {product['name']}: {e}")
-            print(f"Error processing {product['name']}: {e}")
+def scrape_and_store(product):
+    """Scrapes one product and appends the result to the price store."""
+    data = scrape_product(product)
+    if data:
+        open_store().insert_batch([data])
+        logging.info(f"Scraped {product['name']} successfully: {data['price']} / {data['availability']}")
+    else:
+        logging.error(f"Could not scrape {product['name']}")
+    return data
 
 def main():
     print("Starting main function...")
     config = load_config()
-    scrape_interval_hours = config.get('scrape_interval_hours', 24)
+    catalog = open_catalog()
+    # Products listed in config.json are added to (or updated in) the catalog
+    if config.get('products'):
+        catalog.import_products(config['products'])
+    # The scheduler keeps every product it is given (and its interval) in memory for as
+    # long as it runs; limit a large catalog to one site or shard per instance, or use
+    # the job queue (scraper/jobqueue.py)
+    filters = {key: config.get(key) for key in SHARD_SETTINGS}
+    filters['shard'] = (filters['shard'] or 0) if filters['shards'] else None
+    product_count = catalog.count(**filters)
+    products = catalog.iter_products(**filters)
+    # Every scrape saved to the store is checked against the price alerts
+    open_alerts().watch(open_store())
+    base_hours = config['scrape_interval_hours']
 
-    schedule.every(scrape_interval_hours).hours.do(scrape_and_update)
-    print(f"Scheduled scraping every {scrape_interval_hours} hours")
+    # Each product gets its own interval: re-checked sooner when its price moves,
+    # backed off while it is stable, with jittered start times.
+    scheduler = AdaptiveScheduler(
+        products,
+        scrape_and_store,
+        base_interval=base_hours * HOUR,
+        min_interval=config['min_interval_hours'] * HOUR,
+        max_interval=config['max_interval_hours'] * HOUR,
+        max_workers=config['max_workers'],
+        initial_spread=config['initial_spread_minutes'] * 60,
+    )
 
-    scrape_and_update()
-
-    logging.info(f"Starting price tracker with {scrape_interval_hours}-hour interval")
-    print(f"Entering scheduler loop. Press Ctrl+C to stop.")
-    while True:
-        try:
-            schedule.run_pending()
-            print("Checked for pending tasks...")
-            time.sleep(60)
-        except KeyboardInterrupt:
-            logging.info("Price tracker stopped by user")
-            print("Stopped by user")
-            break
-        except Exception as e:
-            logging.error(f"Error in scheduler: {e}")
-            print(f"Error in scheduler: {e}")
-            time.sleep(60)
+    logging.info(f"Starting price tracker for {product_count} products with a {base_hours}-hour base interval")
+    print(f"Tracking {product_count} products (base interval {base_hours} hours). Press Ctrl+C to stop.")
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        logging.info("Price tracker stopped by user")
+        print("Stopped by user")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
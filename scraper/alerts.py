@@ -0,0 +1,464 @@
+import os
+import sys
+import csv
+import json
+import sqlite3
+import argparse
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import closing
+from datetime import datetime
+
+# Make the project root importable when this file is run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper import metrics
+from scraper.store import DATA_DIR, _clean_price
+
+# --- Configuration ---
+# Alert rules database (override with PRICE_TRACKER_ALERTS_DB)
+ALERTS_FILE = os.environ.get("PRICE_TRACKER_ALERTS_DB", os.path.join(DATA_DIR, "alerts.db"))
+# Notifications are POSTed to this URL if set, otherwise appended to ALERTS_LOG_FILE as JSON lines
+ALERT_WEBHOOK_URL = os.environ.get("PRICE_TRACKER_ALERT_WEBHOOK")
+ALERTS_LOG_FILE = os.path.join(DATA_DIR, "alerts.jsonl")
+WEBHOOK_TIMEOUT = 10
+# A rule that fired is not fired again for this long (in observation time), so a
+# price flapping around the target doesn't send a notification per scrape
+DEBOUNCE_SECONDS = 6 * 3600
+
+# Rule kinds: price at or below `target`, and availability changing to in stock
+KIND_BELOW = "below"
+KIND_IN_STOCK = "in_stock"
+RULE_KINDS = (KIND_BELOW, KIND_IN_STOCK)
+
+# Matched rules are looked up in chunks of this many ids (SQLite caps query parameters)
+RULE_LOOKUP_BATCH = 500
+
+# Availability texts (lower-cased) that count as in stock
+IN_STOCK_PREFIXES = ("in stock", "available")
+IN_STOCK_MARKERS = ("left in stock",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    target REAL,
+    owner TEXT,
+    created_at TEXT NOT NULL,
+    last_fired_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alert_rules_url ON alert_rules (url, kind, target);
+-- Rules that have not seen an observation of their product yet
+CREATE TABLE IF NOT EXISTS alert_pending (
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    rule_id INTEGER NOT NULL,
+    target REAL,
+    PRIMARY KEY (url, kind, rule_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS alert_products (
+    url TEXT PRIMARY KEY,
+    price REAL,
+    in_stock INTEGER,
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alert_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def is_in_stock(availability):
+    """True/False for an availability text, or None if it says nothing (missing or "N/A")."""
+    if not availability or availability == "N/A":
+        return None
+    text = availability.strip().lower()
+    return text.startswith(IN_STOCK_PREFIXES) or any(marker in text for marker in IN_STOCK_MARKERS)
+
+
+def normalize_rule(record):
+    """
+    Turns an imported record (dict, CSV row or JSONL object) into a rule.
+    `below` rules need a numeric target; raises ValueError for invalid records.
+    """
+    url = (record.get("url") or "").strip()
+    kind = (record.get("kind") or "").strip().lower()
+    if not url or kind not in RULE_KINDS:
+        raise ValueError(f"rule needs a url and a kind ({', '.join(RULE_KINDS)}): {record}")
+    target = None
+    if kind == KIND_BELOW:
+        target = _clean_price(record.get("target"))
+        if target is None:
+            raise ValueError(f"'below' rule needs a numeric target: {record}")
+    return {"url": url, "kind": kind, "target": target, "owner": record.get("owner") or None}
+
+
+# --- Notification sinks: send(notifications) delivers a list of notification dicts ---
+
+class FileSink:
+    """Appends notifications to a file as JSON lines."""
+
+    def __init__(self, path=None):
+        self.path = path or ALERTS_LOG_FILE
+        self._lock = threading.Lock()
+
+    def send(self, notifications):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for notification in notifications:
+                f.write(json.dumps(notification) + "\n")
+
+
+class WebhookSink:
+    """POSTs each batch of notifications to a URL as a JSON list."""
+
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT, session=None):
+        import requests
+
+        self.url = url
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    def send(self, notifications):
+        response = self.session.post(self.url, json=notifications, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class MemorySink:
+    """Keeps notifications in a list (a stand-in for a webhook in tests and benchmarks)."""
+
+    def __init__(self):
+        self.notifications = []
+
+    def send(self, notifications):
+        self.notifications.extend(notifications)
+
+
+def default_sink():
+    return WebhookSink(ALERT_WEBHOOK_URL) if ALERT_WEBHOOK_URL else FileSink()
+
+
+class AlertEngine:
+    """
+    Price-alert rules, evaluated on every observation written to the price store.
+    Rules live in SQLite; for evaluation, each product's `below` targets are
+    loaded once into a sorted array, so an observation is matched by bisecting
+    for the targets its price crossed: O(log n + matches) however many rules
+    a product has. Rules fire on crossings only (a price that stays under the
+    target doesn't fire again until it has gone back above it) and are
+    debounced per rule. The last observation per product is kept in the
+    database, so duplicate or out-of-order rows are ignored and several
+    processes can evaluate the same products.
+    A new rule fires on its product's next observation if its condition
+    already holds.
+    """
+
+    def __init__(self, path=None, sink=None, debounce=DEBOUNCE_SECONDS):
+        self.path = path or ALERTS_FILE
+        self.sink = sink or default_sink()
+        self.debounce = debounce
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._lock = threading.Lock()
+        # url -> (sorted below targets, their rule ids, in-stock rule ids), for settled rules
+        self._index = {}
+        self._version = None
+
+    def connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(SCHEMA)
+                    self._initialized = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute(
+            "INSERT INTO alert_meta (key, value) VALUES ('rules_version', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    def add_rules(self, records, batch_size=5000):
+        """
+        Adds rules from an iterable of records (url, kind, target, owner), in
+        batches. Invalid records are reported and skipped. Returns the number added.
+        """
+        added = 0
+        batch = []
+        created_at = datetime.now().isoformat()
+
+        def flush():
+            # Sorted batches keep index inserts local
+            batch.sort(key=lambda rule: (rule[0], rule[1], rule[2] or 0.0))
+            with closing(self.connect()) as conn:
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM alert_rules").fetchone()[0]
+                    conn.executemany(
+                        "INSERT INTO alert_rules (url, kind, target, owner, created_at) VALUES (?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                    conn.execute(
+                        "INSERT INTO alert_pending (url, kind, rule_id, target) "
+                        "SELECT url, kind, id, target FROM alert_rules WHERE id > ?",
+                        (last_id,),
+                    )
+                    self._bump_version(conn)
+
+        for record in records:
+            try:
+                rule = normalize_rule(record)
+            except ValueError as e:
+                print(f"Skipping alert rule: {e}")
+                continue
+            batch.append((rule["url"], rule["kind"], rule["target"], rule["owner"], created_at))
+            added += 1
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+        if batch:
+            flush()
+        return added
+
+    def import_file(self, path, batch_size=5000):
+        """Bulk-imports rules from a .csv (header url,kind,target,owner) or .jsonl file."""
+        with open(path, newline="", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                records = (json.loads(line) for line in f if line.strip())
+            else:
+                records = csv.DictReader(f)
+            added = self.add_rules(records, batch_size=batch_size)
+        print(f"Imported {added} alert rules from {path} into {self.path}")
+        return added
+
+    def remove_rule(self, rule_id):
+        """Deletes a rule. Returns True if it existed."""
+        with closing(self.connect()) as conn:
+            with conn:
+                rule = conn.execute("SELECT url, kind FROM alert_rules WHERE id = ?", (rule_id,)).fetchone()
+                if rule:
+                    conn.execute("DELETE FROM alert_rules WHERE id = ?", (rule_id,))
+                    conn.execute(
+                        "DELETE FROM alert_pending WHERE url = ? AND kind = ? AND rule_id = ?", (rule["url"], rule["kind"], rule_id)
+                    )
+                    self._bump_version(conn)
+        return rule is not None
+
+    def rules(self, url=None):
+        """Returns the rules (of one product, or all) as a list of dicts."""
+        where, params = ("WHERE url = ?", (url,)) if url else ("", ())
+        with closing(self.connect()) as conn:
+            return [dict(row) for row in conn.execute(f"SELECT * FROM alert_rules {where} ORDER BY id", params)]
+
+    def stats(self):
+        """Returns {kind: rule count} and the number of products with rules."""
+        with closing(self.connect()) as conn:
+            kinds = dict(conn.execute("SELECT kind, COUNT(*) FROM alert_rules GROUP BY kind ORDER BY kind").fetchall())
+            products = conn.execute("SELECT COUNT(DISTINCT url) FROM alert_rules").fetchone()[0]
+        return {"rules": kinds, "products": products}
+
+    def _rules_for(self, conn, url):
+        rules = self._index.get(url)
+        if rules is None:
+            targets, ids, in_stock_ids = array("d"), array("q"), array("q")
+            # The (url, kind, target) index returns the targets already sorted
+            for rule_id, kind, target in conn.execute(
+                "SELECT id, kind, target FROM alert_rules WHERE url = ? "
+                "AND id NOT IN (SELECT rule_id FROM alert_pending WHERE url = ?) ORDER BY kind, target",
+                (url, url),
+            ):
+                if kind == KIND_BELOW:
+                    targets.append(target)
+                    ids.append(rule_id)
+                elif kind == KIND_IN_STOCK:
+                    in_stock_ids.append(rule_id)
+            rules = (targets, ids, in_stock_ids)
+            self._index[url] = rules
+        return rules
+
+    def _match(self, conn, url, price, in_stock, state):
+        """
+        Returns the ids of the rules of `url` that an observation triggers, and
+        whether the product has any rules at all.
+        """
+        previous_price = state["price"] if state else None
+        previous_in_stock = state["in_stock"] if state else None
+        targets, ids, in_stock_ids = self._rules_for(conn, url)
+        matched = []
+        if price is not None and targets:
+            # price <= target now, and price > target before: targets in [price, previous_price)
+            low = bisect_left(targets, price)
+            high = len(targets) if previous_price is None else bisect_left(targets, previous_price)
+            matched.extend(ids[low:high])
+        if in_stock and in_stock_ids and not previous_in_stock:
+            matched.extend(in_stock_ids)
+
+        # Rules added since the product's last observation fire if their condition holds now
+        pending = conn.execute("SELECT rule_id, kind, target FROM alert_pending WHERE url = ?", (url,)).fetchall()
+        settled = set()
+        for rule_id, kind, target in pending:
+            if kind == KIND_BELOW and price is not None:
+                settled.add(kind)
+                if price <= target:
+                    matched.append(rule_id)
+            elif kind == KIND_IN_STOCK and in_stock is not None:
+                settled.add(kind)
+                if in_stock:
+                    matched.append(rule_id)
+        if settled:
+            conn.executemany("DELETE FROM alert_pending WHERE url = ? AND kind = ?", [(url, kind) for kind in settled])
+            self._bump_version(conn)
+            self._version += 1
+            self._index.pop(url, None)
+        return matched, bool(len(targets) or len(in_stock_ids) or pending)
+
+    def _fire(self, conn, rule_ids, row, price, previous_price):
+        """Builds notifications for the matched rules that are not debounced, and records them as fired."""
+        notifications = []
+        fired_at = datetime.fromisoformat(row["timestamp"])
+        rules = []
+        for start in range(0, len(rule_ids), RULE_LOOKUP_BATCH):
+            chunk = list(rule_ids[start:start + RULE_LOOKUP_BATCH])
+            placeholders = ", ".join("?" * len(chunk))
+            rules.extend(conn.execute(f"SELECT * FROM alert_rules WHERE id IN ({placeholders}) ORDER BY id", chunk))
+        for rule in rules:
+            if rule["last_fired_at"] and (fired_at - datetime.fromisoformat(rule["last_fired_at"])).total_seconds() < self.debounce:
+                metrics.ALERTS.inc(kind=rule["kind"], result="debounced")
+                continue
+            conn.execute("UPDATE alert_rules SET last_fired_at = ? WHERE id = ?", (row["timestamp"], rule["id"]))
+            notifications.append({
+                "rule_id": rule["id"],
+                "kind": rule["kind"],
+                "owner": rule["owner"],
+                "url": row["url"],
+                "product_name": row.get("product_name"),
+                "target": rule["target"],
+                "price": price,
+                "previous_price": previous_price,
+                "availability": row.get("availability"),
+                "timestamp": row["timestamp"],
+            })
+        return notifications
+
+    def evaluate(self, rows):
+        """
+        Evaluates newly recorded observations (price store rows) against the rules,
+        sends the resulting notifications to the sink and returns them.
+        Can be registered directly as a price store listener (see watch).
+        """
+        rows = sorted(rows, key=lambda row: row["timestamp"])
+        notifications = []
+        with self._lock, closing(self.connect()) as conn:
+            if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM alert_rules)").fetchone()[0]:
+                return []
+            with conn:
+                # Take the write lock up front so processes evaluating the same product serialise
+                conn.execute("BEGIN IMMEDIATE")
+                version = conn.execute("SELECT value FROM alert_meta WHERE key = 'rules_version'").fetchone()
+                version = version[0] if version else 0
+                if version != self._version:
+                    # Rules were added, removed or settled elsewhere: reload lazily
+                    self._index.clear()
+                    self._version = version
+                for row in rows:
+                    url = row["url"]
+                    state = conn.execute("SELECT price, in_stock, timestamp FROM alert_products WHERE url = ?", (url,)).fetchone()
+                    if state and row["timestamp"] <= state["timestamp"]:
+                        continue  # already evaluated (or older than what was)
+                    price = _clean_price(row.get("price"))
+                    in_stock = is_in_stock(row.get("availability"))
+                    matched, has_rules = self._match(conn, url, price, in_stock, state)
+                    if not has_rules:
+                        continue  # nothing to keep track of for products without rules
+                    previous_price = state["price"] if state else None
+                    if matched:
+                        notifications.extend(self._fire(conn, matched, row, price, previous_price))
+                    conn.execute(
+                        """
+                        INSERT INTO alert_products (url, price, in_stock, timestamp) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(url) DO UPDATE SET
+                            price = COALESCE(excluded.price, price),
+                            in_stock = COALESCE(excluded.in_stock, in_stock),
+                            timestamp = excluded.timestamp
+                        """,
+                        (url, price, None if in_stock is None else int(in_stock), row["timestamp"]),
+                    )
+        if notifications:
+            self._send(notifications)
+        return notifications
+
+    def _send(self, notifications):
+        try:
+            self.sink.send(notifications)
+        except Exception as e:
+            print(f"Error sending {len(notifications)} alert notification(s): {e}")
+            for notification in notifications:
+                metrics.ALERTS.inc(kind=notification["kind"], result="failed")
+            return
+        for notification in notifications:
+            metrics.ALERTS.inc(kind=notification["kind"], result="sent")
+
+    def watch(self, store):
+        """Evaluates every batch inserted into `store` (a PriceStore) by this process from now on."""
+        store.add_listener(self.evaluate)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def open_alerts(path=None):
+    """Returns the shared AlertEngine for a database file (ALERTS_FILE by default)."""
+    path = path or ALERTS_FILE
+    with _engines_lock:
+        engine = _engines.get(path)
+        if engine is None:
+            engine = AlertEngine(path)
+            _engines[path] = engine
+        return engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage price alert rules.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="add a rule for a product URL")
+    add_parser.add_argument("url")
+    condition = add_parser.add_mutually_exclusive_group(required=True)
+    condition.add_argument("--below", type=float, metavar="PRICE", help="alert when the price drops to PRICE or below")
+    condition.add_argument("--in-stock", action="store_true", help="alert when the product comes back in stock")
+    add_parser.add_argument("--owner", help="who the notification is for (passed through to the sink)")
+    import_parser = commands.add_parser("import", help="bulk-import rules from CSV or JSONL files")
+    import_parser.add_argument("files", nargs="+")
+    list_parser = commands.add_parser("list", help="print rules as JSON lines")
+    list_parser.add_argument("--url")
+    remove_parser = commands.add_parser("remove", help="delete a rule")
+    remove_parser.add_argument("rule_id", type=int)
+    commands.add_parser("stats", help="show the number of rules per kind")
+    args = parser.parse_args()
+
+    engine = open_alerts()
+    if args.command == "add":
+        kind = KIND_BELOW if args.below is not None else KIND_IN_STOCK
+        engine.add_rules([{"url": args.url, "kind": kind, "target": args.below, "owner": args.owner}])
+        print(f"Added {kind} alert for {args.url}")
+    elif args.command == "import":
+        for path in args.files:
+            engine.import_file(path)
+    elif args.command == "list":
+        for rule in engine.rules(url=args.url):
+            print(json.dumps(rule))
+    elif args.command == "remove":
+        print("Removed" if engine.remove_rule(args.rule_id) else f"No rule {args.rule_id}")
+    else:
+        print(json.dumps(engine.stats(), indent=2))
@@ -0,0 +1,299 @@
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+
+# Make the project root importable when this file is run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper.store import DATA_DIR, STORE_FILE, PriceStore
+
+try:
+    import zstandard
+except ImportError:  # optional: pages are gzip-compressed without it
+    zstandard = None
+
+# Directory of the raw-page archive: compressed page bodies named by their SHA-256,
+# plus an index database of which product was fetched when
+ARCHIVE_DIR = os.path.join(DATA_DIR, "page_archive")
+# gzip level for archived pages (zstd uses its default level)
+GZIP_LEVEL = 6
+# Bump when the parsers' output changes, so archived parse results are recomputed
+PARSER_VERSION = 2
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fetched_at TEXT NOT NULL,
+    url TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    site TEXT NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fetches_fetched_at ON fetches (fetched_at);
+CREATE TABLE IF NOT EXISTS parses (
+    content_hash TEXT NOT NULL,
+    parser_key TEXT NOT NULL,
+    title TEXT,
+    price REAL,
+    availability TEXT,
+    source TEXT,
+    PRIMARY KEY (content_hash, parser_key)
+);
+"""
+
+
+def _upgrade_schema(conn):
+    """Adds columns introduced after an index database was created."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(parses)")}
+    if "source" not in existing:
+        conn.execute("ALTER TABLE parses ADD COLUMN source TEXT")
+
+
+def content_hash(html):
+    """SHA-256 of a page body; identical pages share one archive entry."""
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def parser_key(site, selectors):
+    """
+    Identifies the parser configuration a page was parsed with, so cached parse
+    results are only reused while a site's selectors (and PARSER_VERSION) stay the same.
+    """
+    fingerprint = hashlib.sha1(json.dumps(selectors, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{site}:v{PARSER_VERSION}:{fingerprint}"
+
+
+class PageArchive:
+    """
+    Content-addressed archive of fetched pages. Bodies are compressed once per
+    distinct page (zstd if installed, gzip otherwise); every fetch is recorded
+    in the index, and parse results are kept per page so identical pages are
+    parsed only once.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or ARCHIVE_DIR
+        self.index_path = os.path.join(self.directory, "index.db")
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    os.makedirs(self.directory, exist_ok=True)
+                    with closing(sqlite3.connect(self.index_path, timeout=30)) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(INDEX_SCHEMA)
+                        _upgrade_schema(conn)
+                    self._initialized = True
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _blob_path(self, digest, extension):
+        return os.path.join(self.directory, digest[:2], f"{digest}.html.{extension}")
+
+    def put(self, html):
+        """Archives a page body (if not already present) and returns its content hash."""
+        digest = content_hash(html)
+        if self.exists(digest):
+            return digest
+        if zstandard is not None:
+            path, data = self._blob_path(digest, "zst"), zstandard.ZstdCompressor().compress(html.encode("utf-8"))
+        else:
+            path, data = self._blob_path(digest, "gz"), gzip.compress(html.encode("utf-8"), compresslevel=GZIP_LEVEL)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial blob
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest
+
+    def exists(self, digest):
+        return any(os.path.exists(self._blob_path(digest, extension)) for extension in ("zst", "gz"))
+
+    def get(self, digest):
+        """Returns the archived page body for a content hash, or None."""
+        path = self._blob_path(digest, "zst")
+        if os.path.exists(path):
+            if zstandard is None:
+                raise RuntimeError(f"{path} is zstd-compressed; install 'zstandard' to read it")
+            with open(path, "rb") as f:
+                return zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+        path = self._blob_path(digest, "gz")
+        if os.path.exists(path):
+            with gzip.open(path, "rb") as f:
+                return f.read().decode("utf-8")
+        return None
+
+    def record(self, product, digest, fetched_at):
+        """Adds a fetch of `product` (name, url, site) that returned page `digest` to the index."""
+        with closing(self.connect()) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT INTO fetches (fetched_at, url, product_name, site, content_hash) VALUES (?, ?, ?, ?, ?)",
+                    (fetched_at, product["url"], product["name"], product["site"], digest),
+                )
+
+    def fetches(self, since=None, until=None, site=None):
+        """Returns the recorded fetches (dicts), oldest first, optionally filtered."""
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("fetched_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("fetched_at <= ?")
+            params.append(until)
+        if site is not None:
+            clauses.append("site = ?")
+            params.append(site)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                f"SELECT fetched_at, url, product_name, site, content_hash FROM fetches {where} ORDER BY fetched_at, id",
+                params,
+            )
+            return [dict(row) for row in cursor]
+
+    def load_parsed(self, digest, key):
+        """Returns the cached (title, price, availability, source) of a page for a parser configuration, or None."""
+        with closing(self.connect()) as conn:
+            row = conn.execute(
+                "SELECT title, price, availability, source FROM parses WHERE content_hash = ? AND parser_key = ?",
+                (digest, key),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def store_parsed(self, results):
+        """Caches parse results: an iterable of (content_hash, parser_key, (title, price, availability, source))."""
+        records = [(digest, key, *parsed) for digest, key, parsed in results]
+        with closing(self.connect()) as conn:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO parses (content_hash, parser_key, title, price, availability, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    records,
+                )
+
+
+def _selectors_for(url, site):
+    """Current selectors for an archived product: its catalog entry's, else its site's."""
+    from scraper.catalog import open_catalog, selectors_for
+
+    return selectors_for(open_catalog().find_by_url(url) or {"site": site})
+
+
+def _parse_archived(task):
+    """Process-pool worker: re-parses one archived page with the current parsers."""
+    from scraper.scraper import parse_page
+
+    directory, digest, site, selectors = task
+    html = PageArchive(directory).get(digest)
+    if html is None:
+        return None
+    return parse_page(html, site, selectors)
+
+
+def _remove_store_files(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def replay(archive=None, output=None, since=None, until=None, site=None, workers=1, force=False):
+    """
+    Rebuilds price history from the archive without touching the network:
+    every distinct (page, site, selectors) is re-parsed once with the current
+    parsers (in a process pool when workers > 1), then one row per recorded
+    fetch is written to a fresh price store at `output`. Returns the number of rows written.
+    Raises ValueError if `output` is the live price store, or already exists and
+    force is not set; an existing output is only replaced once the new one is complete,
+    and is left alone when no archived page could be parsed.
+    """
+    archive = archive or PageArchive()
+    output = output or os.path.join(DATA_DIR, "prices_replay.db")
+    if os.path.realpath(output) == os.path.realpath(STORE_FILE):
+        raise ValueError(f"{output} is the live price store; replay into another file")
+    if os.path.exists(output) and not force:
+        raise ValueError(f"{output} already exists; pass --force to replace it")
+    fetches = archive.fetches(since=since, until=until, site=site)
+    if not fetches:
+        print("No archived pages to replay.")
+        return 0
+
+    tasks = {}
+    for fetch in fetches:
+        selectors = _selectors_for(fetch["url"], fetch["site"])
+        fetch["parser_key"] = parser_key(fetch["site"], selectors)
+        tasks.setdefault((fetch["content_hash"], fetch["parser_key"]), (archive.directory, fetch["content_hash"], fetch["site"], selectors))
+
+    start = time.perf_counter()
+    keys = list(tasks)
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(_parse_archived, [tasks[key] for key in keys],
+                                       chunksize=max(1, len(keys) // (workers * 4))))
+    else:
+        parsed = [_parse_archived(tasks[key]) for key in keys]
+    results = dict(zip(keys, parsed))
+    archive.store_parsed((digest, key, result) for (digest, key), result in results.items() if result)
+    print(f"Parsed {len(keys)} distinct pages ({len(fetches)} fetches) in {time.perf_counter() - start:.2f} seconds")
+
+    rows = []
+    for fetch in fetches:
+        result = results[(fetch["content_hash"], fetch["parser_key"])]
+        if result is None:
+            continue
+        _, price, availability, source = result
+        rows.append({
+            "timestamp": fetch["fetched_at"],
+            "product_name": fetch["product_name"],
+            "price": price,
+            "availability": availability,
+            "url": fetch["url"],
+            "source": source,
+        })
+
+    if not rows:
+        print(f"No archived pages could be parsed; {output} left unchanged.")
+        return 0
+
+    # Build the new store next to the output and swap it in at the end, so a
+    # failed replay leaves the previous output untouched
+    temp_output = output + ".tmp"
+    _remove_store_files(temp_output)
+    written = PriceStore(temp_output).insert_batch(rows)
+    if not os.path.exists(temp_output):
+        raise RuntimeError(f"Replay did not create {temp_output}; {output} left unchanged")
+    _remove_store_files(output)
+    os.replace(temp_output, output)
+    print(f"Wrote {written} replayed rows to {output}")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-parse archived pages to rebuild the price history offline.")
+    parser.add_argument("--output", help="price store to create (default: data/prices_replay.db; never the live store)")
+    parser.add_argument("--force", action="store_true", help="replace --output if it already exists")
+    parser.add_argument("--since", help="only replay fetches at or after this ISO timestamp")
+    parser.add_argument("--until", help="only replay fetches at or before this ISO timestamp")
+    parser.add_argument("--site", help="only replay pages from this site")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of parse processes")
+    args = parser.parse_args()
+    try:
+        replay(output=args.output, since=args.since, until=args.until, site=args.site, workers=args.workers,
+               force=args.force)
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,319 @@
+import os
+import sys
+import csv
+import json
+import zlib
+import sqlite3
+import argparse
+import hashlib
+import threading
+from contextlib import closing
+
+# Make the project root importable when this file is run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper.fetcher import get_host
+from scraper.store import DATA_DIR
+
+# --- Configuration ---
+# IMPORTANT: Adjust these CSS selectors if a retailer changes its markup.
+# You will need to inspect the HTML of the product pages to find the correct
+# selectors for title, price, and availability. Selectors are shared by every
+# product of a site; a product may override individual ones in its "selectors" field.
+SITE_SELECTORS = {
+    "amazon": {
+        "title": "#productTitle",
+        "price": ".a-price-whole", # Amazon example, might need refinement
+        "availability": "#availability span" # Amazon example
+    },
+    "bestbuy": {
+        # These selectors are no longer primarily used for BestBuy due to JSON parsing
+        "title": "h1.heading-3",
+        "price": ".priceView-hero-price.priceView-customer-price span[aria-hidden='true']",
+        "availability": ".fulfillment-fulfillment-summary"
+    },
+    # "newegg": {"title": "", "price": "", "availability": ""},
+}
+
+# Products the catalog is seeded with when it is first created. Bulk-import more
+# with `python scraper/catalog.py import products.csv` (or .jsonl).
+DEFAULT_PRODUCTS = [
+    {
+        "name": "Dyson Gen5detect Cordless Vacuum Cleaner",
+        "url": "https://www.amazon.com/Dyson-Gen5detect-Cordless-Vacuum-Cleaner/dp/B0C2JD5H7D/ref=sr_1_1?crid=301ALWVE6VNJ6&dib=eyJ2IjoiMSJ9.f03GhTUdsx1FcQ6-ZSQrbZPO6QknBRWdSCRsxRngewW8y-x823uzriTKhSVcGekV8qH1LrLppkh6meYkUIGqOiXdA0bfsULpfz5VE1PKPywt-c6TV-S8IlT-Ro8h3TpulLd-id3VSAB0-xv-AfpmyHYkBnWNqHfeAl5UaywXyRMvJcaUqmXrI2Ybe_x_z8kXrzkDS9GIELXqFIRiiSiC-_ovj6b4tiBZUU.MC0AyiZwUwaceqXFHvjbvRZfA6pKWDyPokzsajBGpVY&dib_tag=se&keywords=dyson%2Bcordless%2Bvacuum%2Bgen5&qid=1750100998&sprefix=dyson%2Bcordless%2Bvacuum%2Bge%2Caps%2C101&sr=8-1&th=1",
+        "site": "amazon"
+    },
+    {
+        "name": "Apple - AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature - White",
+        "url": "https://www.bestbuy.com/site/apple-airpods-pro-2-wireless-active-noise-cancelling-earbuds-with-hearing-aid-feature-white/6447382.p?skuId=6447382",
+        "site": "bestbuy",
+        # Read from a saved copy of the page in the project root instead of fetching it
+        "local_html_path": "Apple AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature White MTJV3LL_A_MTJV3AM_A - Best Buy.html"
+    },
+]
+
+# Catalog database (override with PRICE_TRACKER_CATALOG_DB)
+CATALOG_FILE = os.environ.get("PRICE_TRACKER_CATALOG_DB", os.path.join(DATA_DIR, "catalog.db"))
+
+PRODUCT_FIELDS = ["id", "name", "url", "site", "local_html_path", "selectors"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL UNIQUE,
+    site TEXT NOT NULL,
+    host TEXT NOT NULL,
+    shard_key INTEGER NOT NULL,
+    local_html_path TEXT,
+    selectors TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_site ON products (site, id);
+CREATE INDEX IF NOT EXISTS idx_products_host ON products (host, id);
+"""
+
+
+def product_id(url):
+    """Stable id for products imported without one."""
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_product(record):
+    """
+    Turns an imported record (dict from code, config.json, CSV or JSONL) into a
+    catalog product: 'store' is accepted as an alias of 'site', a missing id is
+    derived from the URL, and selector overrides may be a dict or a JSON string.
+    Raises ValueError if name, url or site is missing or any field has the wrong type.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"product must be an object, got {record!r}")
+    for field in ("site", "store", "url", "name", "local_html_path"):
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise ValueError(f"product '{field}' must be a string: {record}")
+    record_id = record.get("id")
+    if record_id is not None and (isinstance(record_id, bool) or not isinstance(record_id, (str, int))):
+        raise ValueError(f"product 'id' must be a string or an integer: {record}")
+    site = (record.get("site") or record.get("store") or "").strip().lower()
+    url = (record.get("url") or "").strip()
+    name = (record.get("name") or "").strip()
+    if not (site and url and name):
+        raise ValueError(f"product needs a name, url and site: {record}")
+    selectors = record.get("selectors") or None
+    if isinstance(selectors, str):
+        selectors = json.loads(selectors)
+    if selectors is not None and not isinstance(selectors, dict):
+        raise ValueError(f"product 'selectors' must be an object: {record}")
+    return {
+        "id": str(record_id or product_id(url)),
+        "name": name,
+        "url": url,
+        "site": site,
+        "local_html_path": record.get("local_html_path") or None,
+        "selectors": selectors,
+    }
+
+
+def selectors_for(product):
+    """Resolves a product's selectors: its site's SITE_SELECTORS plus any per-product overrides."""
+    return {**SITE_SELECTORS.get(product.get("site"), {}), **(product.get("selectors") or {})}
+
+
+def _row_to_product(row):
+    product = {"id": row["id"], "name": row["name"], "url": row["url"], "site": row["site"]}
+    if row["local_html_path"]:
+        product["local_html_path"] = row["local_html_path"]
+    if row["selectors"]:
+        product["selectors"] = json.loads(row["selectors"])
+    return product
+
+
+class Catalog:
+    """
+    Tracked products, kept in SQLite and indexed by id, site, URL and host.
+    Nothing is loaded up front: lookups hit the indexes and iteration pages
+    through the table in batches, optionally restricted to a site or to one
+    host-based shard, so a worker only reads the products it will scrape.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CATALOG_FILE
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(SCHEMA)
+                    self._initialized = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def import_products(self, records, batch_size=5000):
+        """
+        Adds or updates (matched by URL) products from an iterable of records,
+        in batches. Invalid records, and records whose id already belongs to a
+        product with another URL, are reported and skipped. Returns the number imported.
+        """
+        imported = 0
+        batch = []
+
+        def flush():
+            with closing(self.connect()) as conn:
+                with conn:
+                    ids = list({row[0] for row in batch})
+                    owners = {}
+                    for i in range(0, len(ids), 500):
+                        part = ids[i:i + 500]
+                        owners.update(conn.execute(
+                            f"SELECT id, url FROM products WHERE id IN ({', '.join('?' * len(part))})", part
+                        ).fetchall())
+                    rows = []
+                    for row in batch:
+                        owner = owners.setdefault(row[0], row[2])
+                        if owner != row[2]:
+                            print(f"Skipping catalog record: id {row[0]!r} of {row[2]} is already used by {owner}")
+                            continue
+                        rows.append(row)
+                    conn.executemany(
+                        """
+                        INSERT INTO products (id, name, url, site, host, shard_key, local_html_path, selectors)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(url) DO UPDATE SET
+                            name = excluded.name,
+                            site = excluded.site,
+                            local_html_path = excluded.local_html_path,
+                            selectors = excluded.selectors
+                        """,
+                        rows,
+                    )
+            return len(rows)
+
+        for record in records:
+            try:
+                product = normalize_product(record)
+            except ValueError as e:
+                print(f"Skipping catalog record: {e}")
+                continue
+            host = get_host(product["url"])
+            batch.append((
+                product["id"], product["name"], product["url"], product["site"], host,
+                zlib.crc32(host.encode("utf-8")), product["local_html_path"],
+                json.dumps(product["selectors"]) if product["selectors"] else None,
+            ))
+            if len(batch) >= batch_size:
+                imported += flush()
+                batch = []
+        if batch:
+            imported += flush()
+        return imported
+
+    def import_file(self, path, batch_size=5000):
+        """Bulk-imports products from a .csv (header row) or .jsonl (one object per line) file."""
+        with open(path, newline="", encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                records = (json.loads(line) for line in f if line.strip())
+            else:
+                records = csv.DictReader(f)
+            imported = self.import_products(records, batch_size=batch_size)
+        print(f"Imported {imported} products from {path} into {self.path}")
+        return imported
+
+    def get(self, product_id):
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT * FROM products WHERE id = ?", (product_id,)).fetchone()
+        return _row_to_product(row) if row else None
+
+    def find_by_url(self, url):
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT * FROM products WHERE url = ?", (url,)).fetchone()
+        return _row_to_product(row) if row else None
+
+    def _filters(self, site=None, shard=None, shards=None):
+        clauses, params = [], []
+        if site is not None:
+            clauses.append("site = ?")
+            params.append(site)
+        if shards:
+            # Shards split by host, so each shard owns whole retailers
+            clauses.append("shard_key % ? = ?")
+            params.extend([shards, shard])
+        return clauses, params
+
+    def count(self, site=None, shard=None, shards=None):
+        clauses, params = self._filters(site, shard, shards)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self.connect()) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM products {where}", params).fetchone()[0]
+
+    def iter_batches(self, site=None, shard=None, shards=None, batch_size=1000):
+        """Yields lists of up to batch_size products (ordered by id), optionally one site or shard of N."""
+        clauses, params = self._filters(site, shard, shards)
+        last_id = ""
+        while True:
+            where = " AND ".join(clauses + ["id > ?"])
+            with closing(self.connect()) as conn:
+                rows = conn.execute(
+                    f"SELECT * FROM products WHERE {where} ORDER BY id LIMIT ?", params + [last_id, batch_size]
+                ).fetchall()
+            if not rows:
+                return
+            yield [_row_to_product(row) for row in rows]
+            last_id = rows[-1]["id"]
+
+    def iter_products(self, **filters):
+        """Yields products one at a time (see iter_batches for the filters)."""
+        for batch in self.iter_batches(**filters):
+            yield from batch
+
+    def sites(self):
+        """Returns {site: product count}."""
+        with closing(self.connect()) as conn:
+            return dict(conn.execute("SELECT site, COUNT(*) FROM products GROUP BY site ORDER BY site").fetchall())
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def open_catalog(path=None):
+    """
+    Returns the shared Catalog for a database file (CATALOG_FILE by default),
+    seeding it with DEFAULT_PRODUCTS when it is empty.
+    """
+    path = path or CATALOG_FILE
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None:
+            catalog = Catalog(path)
+            if catalog.count() == 0:
+                catalog.import_products(DEFAULT_PRODUCTS)
+            _catalogs[path] = catalog
+        return catalog
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the product catalog.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="bulk-import products from CSV or JSONL files")
+    import_parser.add_argument("files", nargs="+")
+    list_parser = commands.add_parser("list", help="print products as JSON lines")
+    list_parser.add_argument("--site")
+    commands.add_parser("stats", help="show the number of products per site")
+    args = parser.parse_args()
+
+    catalog = open_catalog()
+    if args.command == "import":
+        for path in args.files:
+            catalog.import_file(path)
+    elif args.command == "list":
+        for product in catalog.iter_products(site=args.site):
+            print(json.dumps(product))
+    else:
+        print(json.dumps(catalog.sites(), indent=2))
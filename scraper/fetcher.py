@@ -0,0 +1,377 @@
+import threading
+import time
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# --- Configuration ---
+# Per-host request budgets. Requests to different hosts run in parallel, but each
+# host is never hit by more than `max_concurrency` requests at once, and requests
+# are spaced so that the host sees at most `requests_per_minute`. A little random
+# jitter is added to each slot so the traffic doesn't look machine-timed.
+DEFAULT_HOST_LIMITS = {"max_concurrency": 1, "requests_per_minute": 15, "jitter": 1.0}
+HOST_LIMITS = {
+    "www.amazon.com": {"max_concurrency": 1, "requests_per_minute": 12, "jitter": 2.0},
+    "www.bestbuy.com": {"max_concurrency": 1, "requests_per_minute": 15, "jitter": 2.0},
+}
+
+# Per-host circuit breaker. A host whose recent requests mostly fail (error_rate over
+# the last `window` requests, or `consecutive_failures` in a row), or that serves a
+# captcha/block page, is opened: its requests fail fast with HostUnavailable for
+# `cooldown` seconds (or the server's Retry-After), doubling up to `max_cooldown`
+# while the host stays unhealthy. After the cooldown, `half_open_probes` requests
+# at a time are let through as probes; a successful probe closes the circuit.
+DEFAULT_BREAKER_SETTINGS = {
+    "window": 20,
+    "min_requests": 5,
+    "error_rate": 0.5,
+    "consecutive_failures": 3,
+    "cooldown": 60.0,
+    "max_cooldown": 900.0,
+    "half_open_probes": 1,
+}
+HOST_BREAKER_SETTINGS = {}
+# Responses that count against a host's health (other 4xx, e.g. a 404 for a
+# delisted product, say nothing about the host)
+HOST_FAILURE_STATUSES = {403, 429, 500, 502, 503, 504}
+# Captcha / bot-check pages. They are small, so only bodies up to
+# BLOCK_PAGE_MAX_CHARS are searched (case-insensitively) for these markers.
+BLOCK_PAGE_MARKERS = (
+    "/errors/validatecaptcha",
+    "enter the characters you see below",
+    "sorry, we just need to make sure you're not a robot",
+    "px-captcha",
+    "/cdn-cgi/challenge-platform",
+    "g-recaptcha",
+)
+BLOCK_PAGE_MAX_CHARS = 100_000
+
+# Upper bound on worker threads used by the fetch engine
+MAX_WORKERS = 8
+# How long FetchEngine.map waits, in total, for tripped hosts to recover before it
+# gives up on their deferred items
+MAX_DEFER_SECONDS = 300
+
+
+def get_host(url):
+    """Returns the lower-cased host name of a URL (used as the rate limiting key)."""
+    return (urlparse(url).hostname or "").lower()
+
+
+class HostRateLimiter:
+    """
+    Enforces a concurrency cap and a request-rate budget for a single host.
+    Use as a context manager around each request to that host.
+    """
+
+    def __init__(self, max_concurrency=1, requests_per_minute=15, jitter=0.0):
+        self.max_concurrency = max_concurrency
+        self.min_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.jitter = jitter
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        """Blocks until a concurrency slot is free and the rate budget allows a request."""
+        self._semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval + random.uniform(0, self.jitter)
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def release(self):
+        self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_host(host, **limits):
+    """
+    Overrides the budget for a host (e.g. configure_host("www.amazon.com", requests_per_minute=6)).
+    Takes effect for limiters created after the call.
+    """
+    host = host.lower()
+    HOST_LIMITS[host] = {**HOST_LIMITS.get(host, DEFAULT_HOST_LIMITS), **limits}
+    with _limiters_lock:
+        _limiters.pop(host, None)
+
+
+def get_host_limiter(url):
+    """Returns the shared HostRateLimiter for the host of the given URL."""
+    host = get_host(url)
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limits = {**DEFAULT_HOST_LIMITS, **HOST_LIMITS.get(host, {})}
+            limiter = HostRateLimiter(**limits)
+            _limiters[host] = limiter
+        return limiter
+
+
+def looks_blocked(html):
+    """True if a response body is a captcha or bot-check page rather than the requested page."""
+    if not html or len(html) > BLOCK_PAGE_MAX_CHARS:
+        return False
+    text = html.lower()
+    return any(marker in text for marker in BLOCK_PAGE_MARKERS)
+
+
+def retry_after_seconds(response):
+    """The delay a 429/503 response asks for in its Retry-After header (seconds form only), or None."""
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.strip().isdigit() else None
+
+
+class HostUnavailable(Exception):
+    """Raised instead of fetching while a host's circuit is open; retry_after is in seconds."""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"{host} is unavailable (circuit open), retry in {retry_after:.0f} s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class HostHealth:
+    """
+    Health of one host (recent error rate, consecutive failures, latency) and
+    the circuit breaker built on it: closed (requests flow), open (requests
+    fail fast) or half-open (a few probe requests decide whether to close).
+    Call before_request() before each request and record_success() or
+    record_failure() after it (or release_probe() if it ended without an outcome).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, host, window=20, min_requests=5, error_rate=0.5, consecutive_failures=3,
+                 cooldown=60.0, max_cooldown=900.0, half_open_probes=1):
+        self.host = host
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate
+        self.consecutive_failures_threshold = consecutive_failures
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.latency = None  # exponentially weighted moving average, seconds
+        self.last_error = None
+        self.trips = 0
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._probes = 0
+
+    def error_rate(self):
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def before_request(self):
+        """
+        Admits a request, or raises HostUnavailable. Once an open circuit's cooldown
+        has elapsed it turns half-open and admits up to half_open_probes requests at a time.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self._open_until - time.monotonic()
+                if remaining > 0:
+                    raise HostUnavailable(self.host, remaining)
+                self.state = self.HALF_OPEN
+                self._probes = 0
+                print(f"Circuit for {self.host} is half-open: probing")
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    # Wait for the probe in flight to decide
+                    raise HostUnavailable(self.host, max(1.0, self.latency or 0.0))
+                self._probes += 1
+
+    def release_probe(self):
+        """
+        Gives back a half-open probe slot admitted by before_request() when the
+        request ended without recording an outcome (e.g. an unexpected error
+        while reading the response); otherwise the circuit would wait forever for
+        the probe to report.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self, latency=None):
+        with self._lock:
+            self._outcomes.append(True)
+            self.consecutive_failures = 0
+            if latency is not None:
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.state == self.HALF_OPEN:
+                # Recovered: start over with a clean window and the base cooldown
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                self._cooldown = self.base_cooldown
+                print(f"Circuit for {self.host} closed: host recovered")
+
+    def record_failure(self, reason, retry_after=None, blocked=False):
+        """Counts a failed request; trips the circuit on a block page or once the failure thresholds are hit."""
+        with self._lock:
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            self.last_error = reason
+            if self.state == self.HALF_OPEN:
+                # The probe failed: back off for longer
+                self._trip(reason, min(self._cooldown * 2, self.max_cooldown), retry_after)
+            elif self.state == self.CLOSED and (
+                blocked
+                or self.consecutive_failures >= self.consecutive_failures_threshold
+                or (len(self._outcomes) >= self.min_requests and self.error_rate() >= self.error_rate_threshold)
+            ):
+                self._trip(reason, self.base_cooldown, retry_after)
+
+    def _trip(self, reason, cooldown, retry_after):
+        self._cooldown = max(cooldown, retry_after or 0.0)
+        self._open_until = time.monotonic() + self._cooldown
+        self.state = self.OPEN
+        self.trips += 1
+        print(f"Circuit for {self.host} opened ({reason}): failing fast for {self._cooldown:.0f} s")
+
+    def snapshot(self):
+        """Returns the host's health as a dict (for status output)."""
+        with self._lock:
+            return {
+                "host": self.host,
+                "state": self.state,
+                "error_rate": round(self.error_rate(), 3),
+                "requests": len(self._outcomes),
+                "consecutive_failures": self.consecutive_failures,
+                "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+                "retry_in": round(max(0.0, self._open_until - time.monotonic()), 1) if self.state == self.OPEN else 0.0,
+                "trips": self.trips,
+                "last_error": self.last_error,
+            }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_host_health(url):
+    """Returns the shared HostHealth (circuit breaker) for the host of the given URL."""
+    host = get_host(url)
+    with _health_lock:
+        health = _health.get(host)
+        if health is None:
+            health = HostHealth(host, **{**DEFAULT_BREAKER_SETTINGS, **HOST_BREAKER_SETTINGS.get(host, {})})
+            _health[host] = health
+        return health
+
+
+def host_health():
+    """Returns the health snapshot of every host contacted so far in this process."""
+    with _health_lock:
+        hosts = list(_health.values())
+    return [health.snapshot() for health in sorted(hosts, key=lambda health: health.host)]
+
+
+def _interleave_by_host(items, key):
+    """
+    Orders (index, item) pairs round-robin across hosts so that worker threads
+    are spread over retailers instead of queueing up behind a single host.
+    """
+    buckets = {}
+    for index, item in enumerate(items):
+        buckets.setdefault(get_host(key(item)), []).append((index, item))
+    ordered = []
+    queues = list(buckets.values())
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def host_concurrency(host):
+    """The number of concurrent requests a host's budget allows."""
+    return {**DEFAULT_HOST_LIMITS, **HOST_LIMITS.get(host, {})}["max_concurrency"]
+
+
+class FetchEngine:
+    """
+    Runs a job (e.g. scrape_product) over many items in a thread pool.
+    Without an explicit max_workers, each batch gets one thread per request its
+    hosts may have in flight (the sum of their max_concurrency), up to MAX_WORKERS.
+    Jobs for different hosts run in parallel; the per-host limits are enforced
+    by the HostRateLimiter that get_page_content acquires for every request.
+    Items whose host's circuit is open are deferred until the rest are done,
+    then retried as the host recovers.
+    """
+
+    def __init__(self, max_workers=None, max_defer=MAX_DEFER_SECONDS):
+        self.max_workers = max_workers
+        self.max_defer = max_defer
+
+    def _workers_for(self, pairs, url_key):
+        """Thread count for a batch of (index, item) pairs."""
+        if self.max_workers is not None:
+            limit = self.max_workers
+        else:
+            hosts = {get_host(url_key(item)) for _, item in pairs}
+            limit = min(MAX_WORKERS, sum(host_concurrency(host) for host in hosts))
+        return max(1, min(limit, len(pairs)))
+
+    def map(self, job, items, url_key=lambda item: item["url"]):
+        """
+        Runs job(item) for every item and returns the results in input order.
+        A job that raises yields None for its item. A job that raises
+        HostUnavailable is retried once its host's cooldown has passed, for up
+        to max_defer seconds in total; after that it also yields None.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        if not items:
+            return results
+        deferred = []
+
+        def run(indexed_item):
+            index, item = indexed_item
+            try:
+                results[index] = job(item)
+            except HostUnavailable as e:
+                deferred.append((time.monotonic() + e.retry_after, index, item))
+            except Exception as e:
+                print(f"Error in fetch job for {url_key(item)}: {e}")
+
+        pending = list(enumerate(items))
+        deadline = time.monotonic() + self.max_defer
+        while pending:
+            deferred.clear()
+            # _interleave_by_host pairs each element with its position in `pending`;
+            # the elements are already (index, item)
+            ordered = [pair for _, pair in _interleave_by_host(pending, lambda pair: url_key(pair[1]))]
+            workers = self._workers_for(ordered, url_key)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(run, ordered))
+            if not deferred:
+                break
+            retry_at = min(retry_at for retry_at, _, _ in deferred)
+            if retry_at > deadline:
+                print(f"Giving up on {len(deferred)} item(s) for hosts that are still unavailable")
+                break
+            print(f"Deferred {len(deferred)} item(s) for unavailable hosts; retrying in {max(0.0, retry_at - time.monotonic()):.0f} s")
+            time.sleep(max(0.0, retry_at - time.monotonic()))
+            pending = sorted((index, item) for _, index, item in deferred)
+        return results
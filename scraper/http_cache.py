@@ -0,0 +1,135 @@
+import os
+import json
+import hashlib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+from scraper.fetcher import get_host, HOST_LIMITS, DEFAULT_HOST_LIMITS
+from scraper.store import DATA_DIR
+
+# Directory for the on-disk response cache (one body + one metadata file per URL),
+# next to the price store so it survives runs from another working directory
+HTTP_CACHE_DIR = os.path.join(DATA_DIR, "http_cache")
+
+
+class SessionPool:
+    """
+    Keeps one requests.Session per host so TCP/TLS connections are reused
+    across products and runs of the fetch engine.
+    """
+
+    def __init__(self, headers):
+        self.headers = headers
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """Returns the pooled session for the host of the given URL."""
+        host = get_host(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                limits = {**DEFAULT_HOST_LIMITS, **HOST_LIMITS.get(host, {})}
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=limits["max_concurrency"])
+                session = requests.Session()
+                session.headers.update(self.headers)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class ResponseCache:
+    """
+    On-disk cache of page bodies keyed by URL. Stores the validators
+    (ETag / Last-Modified) needed for conditional GETs, plus the last parse
+    result and the parser key that produced it, so an unchanged page (HTTP 304)
+    doesn't need to be parsed again by the same parsers and selectors.
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + ".json", base + ".html"
+
+    def _write(self, path, content):
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def load_meta(self, url):
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load_body(self, url):
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def conditional_headers(self, url):
+        """Returns If-None-Match / If-Modified-Since headers for a cached URL, if any."""
+        meta = self.load_meta(url)
+        if not meta or not os.path.exists(self._paths(url)[1]):
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def store(self, url, response):
+        """Caches a 200 response body together with its validators."""
+        if not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "parsed": None,
+        }
+        with self._lock:
+            self._write(body_path, response.text)
+            self._write(meta_path, json.dumps(meta))
+
+    def store_parsed(self, url, key, parsed):
+        """Remembers the parse result (a dict) for a cached page, under its parser key."""
+        with self._lock:
+            meta = self.load_meta(url)
+            if meta is None:
+                return
+            meta["parsed"] = {**parsed, "parser_key": key}
+            self._write(self._paths(url)[0], json.dumps(meta))
+
+    def load_parsed(self, url, key):
+        """
+        Returns the remembered parse result for a cached page, or None if there is
+        none or it was made by another parser configuration (see archive.parser_key).
+        """
+        meta = self.load_meta(url)
+        parsed = meta.get("parsed") if meta else None
+        if not parsed or parsed.get("parser_key") != key:
+            return None
+        return parsed
@@ -0,0 +1,332 @@
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from contextlib import closing
+
+# Make the project root importable when this file is run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper.fetcher import HostUnavailable, get_host
+from scraper.store import DATA_DIR
+
+# Queue database; point every worker (on this box or others sharing the file) at the same path
+QUEUE_FILE = os.environ.get("PRICE_TRACKER_QUEUE_DB", os.path.join(DATA_DIR, "queue.db"))
+# A claimed job is invisible to other workers for this long; if it is neither
+# acknowledged nor failed by then (e.g. the worker crashed), it is re-queued
+VISIBILITY_TIMEOUT = 300
+# A host is worked by one worker at a time, so that worker's rate limiter sees all
+# of the host's traffic. The host is handed over if its worker goes quiet this long.
+HOST_LEASE_SECONDS = 120
+# Failed jobs are retried with exponential backoff, then given up on
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 60
+# How long an idle worker thread waits before looking for work again
+POLL_INTERVAL = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_key TEXT NOT NULL,
+    host TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state_available ON jobs (state, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_product_key ON jobs (product_key, state);
+CREATE TABLE IF NOT EXISTS host_leases (
+    host TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class JobQueue:
+    """
+    Durable scrape-job queue in SQLite, shared by any number of worker processes.
+    Jobs are claimed under a lease (visibility timeout); expired leases are
+    re-queued on the next claim, so a crashed worker's jobs are picked up by
+    others. Work is sharded by host: a worker only claims jobs for hosts it
+    holds (or can take) the host lease for.
+    """
+
+    def __init__(self, path=None, visibility_timeout=VISIBILITY_TIMEOUT, host_lease_seconds=HOST_LEASE_SECONDS):
+        self.path = path or QUEUE_FILE
+        self.visibility_timeout = visibility_timeout
+        self.host_lease_seconds = host_lease_seconds
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connect(self):
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(SCHEMA)
+                    self._initialized = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, products, delay=0.0, key=lambda product: product["url"]):
+        """
+        Adds a scrape job per product, skipping products that already have a
+        queued or running job. Returns the number of jobs added.
+        """
+        available_at = time.time() + delay
+        added = 0
+        with closing(self.connect()) as conn:
+            with conn:
+                for product in products:
+                    cursor = conn.execute(
+                        """
+                        INSERT INTO jobs (product_key, host, payload, available_at)
+                        SELECT ?, ?, ?, ?
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM jobs WHERE product_key = ? AND state IN ('queued', 'leased')
+                        )
+                        """,
+                        (key(product), get_host(product["url"]), json.dumps(product), available_at, key(product)),
+                    )
+                    added += cursor.rowcount
+        return added
+
+    def claim(self, owner, max_hosts=None, max_attempts=MAX_ATTEMPTS):
+        """
+        Leases the next due job on a host this owner may work on, preferring
+        hosts it already holds. With max_hosts, an owner holding that many host
+        leases takes no new hosts, leaving them to other workers.
+        Jobs whose lease expired go back to the queue first, or are marked failed
+        once they have used max_attempts (a job that keeps killing its worker
+        must not be retried forever).
+        Returns (job_id, product) or None if nothing is available.
+        """
+        now = time.time()
+        with closing(self.connect()) as conn:
+            with conn:
+                # Take the write lock up front so two workers can't claim the same job or host
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    """
+                    UPDATE jobs SET
+                        state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                        lease_owner = NULL, lease_expires = NULL, last_error = 'lease expired'
+                    WHERE state = 'leased' AND lease_expires < ?
+                    """,
+                    (max_attempts, now),
+                )
+                own_hosts_only = False
+                if max_hosts is not None:
+                    held = conn.execute(
+                        "SELECT COUNT(*) FROM host_leases WHERE owner = ? AND expires_at >= ?", (owner, now)
+                    ).fetchone()[0]
+                    own_hosts_only = held >= max_hosts
+                job = conn.execute(
+                    """
+                    SELECT jobs.id, jobs.host, jobs.payload FROM jobs
+                    LEFT JOIN host_leases ON host_leases.host = jobs.host
+                    WHERE jobs.state = 'queued' AND jobs.available_at <= ?
+                      AND (host_leases.owner = ? OR (
+                          NOT ? AND (host_leases.host IS NULL OR host_leases.expires_at < ?)))
+                    ORDER BY host_leases.owner = ? DESC, jobs.available_at, jobs.id
+                    LIMIT 1
+                    """,
+                    (now, owner, own_hosts_only, now, owner),
+                ).fetchone()
+                if job is None:
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET state = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (owner, now + self.visibility_timeout, job["id"]),
+                )
+                conn.execute(
+                    """
+                    INSERT INTO host_leases (host, owner, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT(host) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                    """,
+                    (job["host"], owner, now + self.host_lease_seconds),
+                )
+        return job["id"], json.loads(job["payload"])
+
+    def ack(self, job_id, owner):
+        """Removes a finished job. Returns False if the lease had already expired and moved on."""
+        with closing(self.connect()) as conn:
+            with conn:
+                cursor = conn.execute("DELETE FROM jobs WHERE id = ? AND lease_owner = ?", (job_id, owner))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, owner, error=None, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        """Re-queues a failed job with exponential backoff, or marks it failed after max_attempts."""
+        with closing(self.connect()) as conn:
+            with conn:
+                cursor = conn.execute(
+                    """
+                    UPDATE jobs SET
+                        state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                        available_at = ? + ? * (1 << (attempts - 1)),
+                        lease_owner = NULL, lease_expires = NULL, last_error = ?
+                    WHERE id = ? AND lease_owner = ?
+                    """,
+                    (max_attempts, time.time(), retry_delay, error, job_id, owner),
+                )
+        return cursor.rowcount == 1
+
+    def defer(self, job_id, owner, delay):
+        """
+        Puts a job whose host is unavailable (circuit open) back in the queue
+        without counting the attempt, and holds back the host's other queued jobs
+        for `delay` seconds too, so workers spend that time on healthy hosts.
+        """
+        available_at = time.time() + delay
+        with closing(self.connect()) as conn:
+            with conn:
+                cursor = conn.execute(
+                    """
+                    UPDATE jobs SET state = 'queued', attempts = attempts - 1, available_at = ?,
+                        lease_owner = NULL, lease_expires = NULL
+                    WHERE id = ? AND lease_owner = ?
+                    """,
+                    (available_at, job_id, owner),
+                )
+                conn.execute(
+                    "UPDATE jobs SET available_at = MAX(available_at, ?) "
+                    "WHERE state = 'queued' AND host = (SELECT host FROM jobs WHERE id = ?)",
+                    (available_at, job_id),
+                )
+        return cursor.rowcount == 1
+
+    def release_hosts(self, owner):
+        """Gives up the owner's host leases (on clean shutdown) so other workers can take over at once."""
+        with closing(self.connect()) as conn:
+            with conn:
+                conn.execute("DELETE FROM host_leases WHERE owner = ?", (owner,))
+
+    def stats(self):
+        """Returns {state: job count} plus the current host leases, for the status command."""
+        with closing(self.connect()) as conn:
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            leases = [dict(row) for row in conn.execute("SELECT host, owner, expires_at FROM host_leases ORDER BY host")]
+        return {"jobs": counts, "host_leases": leases}
+
+
+def scrape_and_store(product):
+    """
+    Default worker job: scrapes one product and appends the row to the price
+    store, where it is checked against the price alerts.
+    """
+    from scraper.scraper import scrape_product
+    from scraper.store import open_store
+    from scraper.alerts import open_alerts
+
+    row = scrape_product(product)
+    if row:
+        store = open_store()
+        open_alerts().watch(store)
+        store.insert_batch([row])
+    return row
+
+
+def work(queue, owner, job=scrape_and_store, threads=2, stop_when_empty=False, poll_interval=POLL_INTERVAL):
+    """
+    Runs `threads` worker threads that claim, run and acknowledge jobs until
+    interrupted (or, with stop_when_empty, until nothing is claimable).
+    job(product) returns a row on success and None on failure; if it raises
+    HostUnavailable, the host's jobs are deferred until its circuit may close.
+    A worker takes at most one host per thread, so hosts spread across worker processes.
+    """
+    stop = threading.Event()
+
+    def loop(thread_owner):
+        while not stop.is_set():
+            claimed = queue.claim(owner, max_hosts=threads)
+            if claimed is None:
+                if stop_when_empty:
+                    return
+                stop.wait(poll_interval)
+                continue
+            job_id, product = claimed
+            try:
+                row = job(product)
+            except HostUnavailable as e:
+                print(f"[{thread_owner}] Deferring jobs for {e.host} by {e.retry_after:.0f} s: circuit open")
+                queue.defer(job_id, owner, e.retry_after)
+                continue
+            except Exception as e:
+                print(f"[{thread_owner}] Error in queued job for {product.get('url')}: {e}")
+                queue.fail(job_id, owner, str(e))
+                continue
+            if row:
+                queue.ack(job_id, owner)
+            else:
+                queue.fail(job_id, owner, "no data scraped")
+
+    workers = [threading.Thread(target=loop, args=(f"{owner}/{i}",), daemon=True) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=1.0)
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        queue.release_hosts(owner)
+
+
+def _worker_process(path, index, threads, stop_when_empty):
+    owner = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    print(f"Worker {owner} started")
+    work(JobQueue(path), owner, threads=threads, stop_when_empty=stop_when_empty)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape-job queue: enqueue products and run queue workers.")
+    parser.add_argument("--queue", help="queue database (default: data/queue.db or PRICE_TRACKER_QUEUE_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enqueue_parser = commands.add_parser("enqueue", help="enqueue a scrape job for every product in the catalog")
+    enqueue_parser.add_argument("--site", help="only enqueue products of this site")
+    worker_parser = commands.add_parser("work", help="run worker processes")
+    worker_parser.add_argument("--processes", type=int, default=2, help="number of worker processes")
+    worker_parser.add_argument("--threads", type=int, default=2, help="worker threads per process")
+    worker_parser.add_argument("--until-empty", action="store_true", help="exit once no job can be claimed")
+    commands.add_parser("status", help="show job counts and host leases")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == "enqueue":
+        from scraper.catalog import open_catalog
+
+        added = sum(queue.enqueue(batch) for batch in open_catalog().iter_batches(site=args.site))
+        print(f"Enqueued {added} jobs into {queue.path}")
+    elif args.command == "work":
+        queue.connect().close()
+        processes = [
+            multiprocessing.Process(target=_worker_process, args=(queue.path, i, args.threads, args.until_empty))
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
+    else:
+        print(json.dumps(queue.stats(), indent=2))
@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import glob
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+from scraper.store import DATA_DIR
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Metrics are recorded in the process doing the work (scraper, main.py, queue
+# workers), so each of those saves a snapshot here (at most every
+# METRICS_SAVE_SECONDS, and at exit) for the dashboard's /metrics to show.
+# Snapshots not updated for METRICS_FILE_MAX_AGE are deleted.
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+METRICS_SAVE_SECONDS = 10.0
+METRICS_FILE_MAX_AGE = 7 * 24 * 3600
+PROCESS_NAME = os.path.splitext(os.path.basename(sys.argv[0] or ""))[0].lstrip("-") or "python"
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _with_process(label_key, process, pid):
+    """Adds the process and pid labels that keep each process's series apart."""
+    return tuple(sorted(dict(label_key, process=str(process), pid=str(pid)).items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels (e.g. bytes downloaded per host)."""
+
+    type_name = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, samples=None):
+        lines = []
+        for key, value in sorted((self.samples() if samples is None else samples).items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in the Prometheus sense."""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0, "max": 0.0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["count"] += 1
+            series["sum"] += value
+            series["max"] = max(series["max"], value)
+
+    def samples(self):
+        with self._lock:
+            return {key: {**series, "buckets": list(series["buckets"])} for key, series in self._series.items()}
+
+    def render(self, samples=None):
+        lines = []
+        for key, series in sorted((self.samples() if samples is None else samples).items()):
+            for bound, count in zip(self.buckets, series["buckets"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', repr(bound))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Holds the process's metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args)
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def snapshot(self):
+        """The samples of every metric as JSON-serialisable data (see save())."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {
+                "type": metric.type_name,
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [[list(map(list, key)), value] for key, value in metric.samples().items()],
+            }
+            for metric in metrics
+        }
+
+    def render_prometheus(self, snapshots=()):
+        """
+        Renders this process's metrics. With snapshots (other processes' saved
+        files, see save()), every process's series are rendered side by side,
+        labelled with its process name and pid. They are not summed: a sum would
+        go backwards whenever an old process's snapshot is dropped.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            samples = metric.samples()
+            if snapshots:
+                samples = {_with_process(key, PROCESS_NAME, os.getpid()): value for key, value in samples.items()}
+            for snapshot in snapshots:
+                other = snapshot.get("metrics", {}).get(metric.name)
+                if not other or other.get("type") != metric.type_name:
+                    continue
+                if other.get("buckets", []) != list(getattr(metric, "buckets", ())):
+                    continue
+                for key, value in other["samples"]:
+                    samples[_with_process(map(tuple, key), snapshot.get("process", "?"), snapshot.get("pid", "?"))] = value
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render(samples))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Pipeline metrics: per-stage timings (fetch, parse, store_write, chart_render, ...)
+# labelled by host/site where it applies, and bytes downloaded per host
+STAGE_SECONDS = REGISTRY.histogram("price_tracker_stage_seconds", "Time spent in each pipeline stage.")
+DOWNLOADED_BYTES = REGISTRY.counter("price_tracker_downloaded_bytes_total", "Response bytes downloaded.")
+# Pages parsed, by site and by the extraction tier that produced the row (json_ld, meta, dom, ...)
+EXTRACTIONS = REGISTRY.counter("price_tracker_extractions_total", "Pages parsed, by extraction tier.")
+# Failed fetches by host and reason (HTTP status, exception, block_page, circuit_open)
+FETCH_FAILURES = REGISTRY.counter("price_tracker_fetch_failures_total", "Failed or short-circuited fetches.")
+# Price-alert notifications by rule kind and result (sent, failed, debounced)
+ALERTS = REGISTRY.counter("price_tracker_alerts_total", "Price-alert notifications.")
+
+
+def observe_stage(stage, seconds, **labels):
+    """Records the duration of one pipeline stage run."""
+    STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+
+
+@contextmanager
+def timed(stage, **labels):
+    """Context manager that records the duration of the enclosed block as a stage timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, **labels)
+
+
+_save_lock = threading.Lock()
+_saved_at = None
+
+
+def _save_path():
+    return os.path.join(METRICS_DIR, f"{PROCESS_NAME}-{os.getpid()}.json")
+
+
+def save(force=False):
+    """
+    Writes this process's metrics to METRICS_DIR for the dashboard's /metrics.
+    Without force, at most once every METRICS_SAVE_SECONDS, so it can be called
+    after every scrape; the first call also arranges a final save at exit.
+    """
+    global _saved_at
+    with _save_lock:
+        if _saved_at is None:
+            atexit.register(save, force=True)
+        elif not force and time.monotonic() - _saved_at < METRICS_SAVE_SECONDS:
+            return False
+        _saved_at = time.monotonic()
+        snapshot = REGISTRY.snapshot()
+        if not any(metric["samples"] for metric in snapshot.values()):
+            return False
+        path = _save_path()
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"process": PROCESS_NAME, "pid": os.getpid(), "metrics": snapshot}, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Could not save metrics to {path}: {e}")
+            return False
+    return True
+
+
+def saved_snapshots():
+    """
+    The snapshots ({"process", "pid", "metrics"}) saved by other processes;
+    those not updated within METRICS_FILE_MAX_AGE are deleted instead.
+    """
+    own_path = _save_path()
+    now = time.time()
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        if path == own_path:
+            continue
+        try:
+            if now - os.path.getmtime(path) > METRICS_FILE_MAX_AGE:
+                os.remove(path)
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def render_prometheus(merge_saved=False):
+    """
+    This process's metrics in the Prometheus text format; with merge_saved, along
+    with the snapshots saved by other processes (e.g. the scraper's fetch timings),
+    each labelled with its process and pid.
+    """
+    return REGISTRY.render_prometheus(saved_snapshots() if merge_saved else ())
+
+
+def summary():
+    """Returns a human-readable per-stage summary of this process's timings and downloads."""
+    lines = [f"{'stage':<16} {'labels':<40} {'count':>6} {'total s':>9} {'mean s':>8} {'max s':>8}"]
+    for key, series in sorted(STAGE_SECONDS.samples().items()):
+        labels = dict(key)
+        stage = labels.pop("stage", "")
+        label_text = ",".join(f"{name}={value}" for name, value in labels.items())
+        mean = series["sum"] / series["count"] if series["count"] else 0.0
+        lines.append(f"{stage:<16} {label_text:<40} {series['count']:>6} {series['sum']:>9.2f} {mean:>8.3f} {series['max']:>8.3f}")
+    for key, value in sorted(DOWNLOADED_BYTES.samples().items()):
+        label_text = ",".join(f"{name}={label}" for name, label in key)
+        lines.append(f"{'downloaded':<16} {label_text:<40} {value:>6} bytes")
+    for key, value in sorted(EXTRACTIONS.samples().items()):
+        label_text = ",".join(f"{name}={label}" for name, label in key)
+        lines.append(f"{'extracted':<16} {label_text:<40} {value:>6}")
+    for key, value in sorted(FETCH_FAILURES.samples().items()):
+        label_text = ",".join(f"{name}={label}" for name, label in key)
+        lines.append(f"{'fetch failed':<16} {label_text:<40} {value:>6}")
+    for key, value in sorted(ALERTS.samples().items()):
+        label_text = ",".join(f"{name}={label}" for name, label in key)
+        lines.append(f"{'alerts':<16} {label_text:<40} {value:>6}")
+    return "\n".join(lines)
@@ -0,0 +1,139 @@
+import re
+import importlib.util
+
+# Supported parser backends; html.parser ships with Python, the others are optional installs
+BACKENDS = ("html.parser", "lxml", "selectolax")
+
+# First simple selector of a CSS selector: optional tag, then #id / .class parts
+# (e.g. "h1.heading-3", "#availability" from "#availability span")
+_COMPOUND_RE = re.compile(r'^([a-zA-Z][\w-]*)?((?:[#.][\w-]+)*)')
+_PART_RE = re.compile(r'([#.])([\w-]+)')
+
+_warned_backends = set()
+
+
+def backend_available(backend):
+    """Returns True if the given parser backend can be used in this environment."""
+    if backend == "html.parser":
+        return True
+    if backend == "lxml":
+        return importlib.util.find_spec("lxml") is not None
+    if backend == "selectolax":
+        return importlib.util.find_spec("selectolax") is not None
+    return False
+
+
+def resolve_backend(backend):
+    """Returns the backend to use, falling back to html.parser if the requested one is missing."""
+    if backend_available(backend):
+        return backend
+    if backend not in _warned_backends:
+        _warned_backends.add(backend)
+        print(f"Parser backend '{backend}' is not available, using 'html.parser' instead.")
+    return "html.parser"
+
+
+def _selector_matcher(selector):
+    """
+    Turns the first simple selector of a CSS selector into a (tag, id, classes)
+    tuple, or None if it can't be expressed that way (e.g. attribute-only selectors).
+    Anything after the tag/#id/.class parts (attributes, pseudo-classes) is ignored,
+    which can only make the match broader, never miss an element.
+    """
+    first_part = selector.strip().split()[0] if selector.strip() else ""
+    match = _COMPOUND_RE.match(first_part)
+    if not match or not match.group(0):
+        return None
+    tag = match.group(1).lower() if match.group(1) else None
+    element_id, classes = None, set()
+    for kind, value in _PART_RE.findall(match.group(2)):
+        if kind == "#":
+            element_id = value
+        else:
+            classes.add(value)
+    return tag, element_id, frozenset(classes)
+
+
+def build_strainer(selectors):
+    """
+    Builds a SoupStrainer that keeps only the subtrees the given selectors can
+    match (the elements matching the first simple selector of each, with all
+    their descendants). Returns None if any selector can't be reduced this way,
+    in which case the whole document must be parsed.
+    """
+    from bs4 import SoupStrainer
+
+    matchers = []
+    for selector in selectors.values():
+        matcher = _selector_matcher(selector)
+        if matcher is None:
+            return None
+        matchers.append(matcher)
+
+    def keep(name, attrs):
+        element_id = attrs.get("id")
+        class_attr = attrs.get("class") or ()
+        element_classes = set(class_attr.split() if isinstance(class_attr, str) else class_attr)
+        for tag, wanted_id, wanted_classes in matchers:
+            if tag and tag != name:
+                continue
+            if wanted_id and wanted_id != element_id:
+                continue
+            if wanted_classes and not wanted_classes <= element_classes:
+                continue
+            return True
+        return False
+
+    return SoupStrainer(keep)
+
+
+class _SelectolaxElement:
+    """Minimal BeautifulSoup-like wrapper around a selectolax node."""
+
+    def __init__(self, node):
+        self._node = node
+
+    def get_text(self, strip=False):
+        return self._node.text(deep=True, separator="", strip=strip)
+
+
+class _SelectolaxDocument:
+    """Minimal BeautifulSoup-like wrapper exposing select_one() over a selectolax tree."""
+
+    def __init__(self, html_content):
+        from selectolax.parser import HTMLParser
+
+        self._tree = HTMLParser(html_content)
+
+    def select_one(self, selector):
+        node = self._tree.css_first(selector)
+        return _SelectolaxElement(node) if node is not None else None
+
+
+def make_soup(html_content, backend="html.parser"):
+    """
+    Builds a full BeautifulSoup tree (for parsers that need more than select_one,
+    e.g. parse_bestbuy's script search). selectolax isn't a BeautifulSoup
+    builder, so it maps to the fastest available one.
+    """
+    from bs4 import BeautifulSoup
+
+    if backend == "selectolax":
+        backend = "lxml"
+    return BeautifulSoup(html_content, resolve_backend(backend))
+
+
+def make_document(html_content, backend="html.parser", selectors=None):
+    """
+    Parses HTML into a document that supports select_one(css).get_text(strip=True),
+    which is all the selector-based parsers (e.g. parse_amazon) need.
+    If selectors are given, only the subtrees they target are built (partial parse;
+    not used by selectolax, whose full parse is already cheaper than a strained soup).
+    """
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        return _SelectolaxDocument(html_content)
+    from bs4 import BeautifulSoup
+
+    parse_only = build_strainer(selectors) if selectors else None
+    return BeautifulSoup(html_content, backend, parse_only=parse_only)
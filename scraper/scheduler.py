@@ -0,0 +1,144 @@
+import time
+import heapq
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from scraper.fetcher import HostUnavailable
+
+# Interval multipliers: re-check sooner after a change, back off while a product is stable
+SPEEDUP_ON_CHANGE = 0.5
+BACKOFF_WHEN_STABLE = 1.5
+# Random +/- fraction applied to every interval so products drift apart over time
+DEFAULT_JITTER = 0.1
+
+
+def _observation(row):
+    """The part of a scraped row that decides whether a product 'moved'."""
+    return (row.get("price"), row.get("availability")) if row else None
+
+
+class ProductState:
+    """Scheduling state for one product."""
+
+    def __init__(self, product, interval):
+        self.product = product
+        self.interval = interval
+        self.last_observation = None
+        self.failures = 0
+
+
+class AdaptiveScheduler:
+    """
+    Priority-queue scheduler with a per-product interval.
+    Products whose price or availability changed are re-checked sooner (down to
+    min_interval), stable ones are backed off (up to max_interval), and failures
+    back off exponentially. A job that raises HostUnavailable (its host's circuit
+    is open) is re-run once the host may take requests again, without counting a
+    failure or changing the product's interval. First runs are spread over `initial_spread` seconds and
+    every interval is jittered, so load doesn't spike. Due jobs are drained by a
+    bounded thread pool; job(product) must return the scraped row or None.
+    Every product (with its interval) is held in memory for the scheduler's lifetime.
+    """
+
+    def __init__(self, products, job, base_interval, min_interval=None, max_interval=None,
+                 max_workers=4, jitter=DEFAULT_JITTER, initial_spread=None, on_result=None,
+                 key=lambda product: product["url"]):
+        self.job = job
+        self.on_result = on_result
+        self.key = key
+        self.base_interval = base_interval
+        self.min_interval = min_interval if min_interval is not None else base_interval / 8
+        self.max_interval = max_interval if max_interval is not None else base_interval * 4
+        self.jitter = jitter
+        self.max_workers = max_workers
+        self._states = {}
+        self._queue = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._stopped = False
+
+        spread = base_interval if initial_spread is None else initial_spread
+        now = time.monotonic()
+        for product in products:
+            state = ProductState(product, base_interval)
+            self._states[key(product)] = state
+            self._push(now + random.uniform(0, spread), key(product))
+
+    def _push(self, due, product_key):
+        self._sequence += 1
+        heapq.heappush(self._queue, (due, self._sequence, product_key))
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def next_interval(self, state, row):
+        """Updates and returns the product's interval after a run that returned `row`."""
+        if row is None:
+            state.failures += 1
+            return min(self.max_interval, state.interval * (2 ** min(state.failures, 5)))
+        state.failures = 0
+        observation = _observation(row)
+        if state.last_observation is not None and observation != state.last_observation:
+            state.interval = max(self.min_interval, state.interval * SPEEDUP_ON_CHANGE)
+        elif state.last_observation is not None:
+            state.interval = min(self.max_interval, state.interval * BACKOFF_WHEN_STABLE)
+        state.last_observation = observation
+        return state.interval
+
+    def _run_job(self, product_key):
+        state = self._states[product_key]
+        row = None
+        deferred_for = None
+        try:
+            row = self.job(state.product)
+            if self.on_result is not None:
+                self.on_result(state.product, row)
+        except HostUnavailable as e:
+            # Not the product's fault: retry when the host's cooldown ends (jittered
+            # upwards, so a host's products don't all probe it at the same moment)
+            deferred_for = e.retry_after * random.uniform(1, 1 + self.jitter)
+        except Exception as e:
+            print(f"Error in scheduled job for {product_key}: {e}")
+        finally:
+            with self._condition:
+                if deferred_for is not None:
+                    delay = deferred_for
+                else:
+                    delay = self._jittered(self.next_interval(state, row))
+                self._push(time.monotonic() + delay, product_key)
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def run(self, max_runs=None):
+        """
+        Drains due jobs until stop() is called (or max_runs jobs have been started).
+        Sleeps until the next job is due or a worker frees up, never polling.
+        """
+        started = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            with self._condition:
+                while not self._stopped and (max_runs is None or started < max_runs):
+                    if not self._queue or self._in_flight >= self.max_workers:
+                        self._condition.wait()
+                        continue
+                    due, _, product_key = self._queue[0]
+                    wait = due - time.monotonic()
+                    if wait > 0:
+                        self._condition.wait(timeout=wait)
+                        continue
+                    heapq.heappop(self._queue)
+                    self._in_flight += 1
+                    started += 1
+                    executor.submit(self._run_job, product_key)
+
+    def intervals(self):
+        """Returns {product key: current interval in seconds} (for logging/inspection)."""
+        with self._condition:
+            return {product_key: state.interval for product_key, state in self._states.items()}
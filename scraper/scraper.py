@@ -1,48 +1,56 @@
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 from datetime import datetime
 import time
 import os
 import json
 import re
-import random
-import pprint # Make sure this is imported
+import sys
+import logging
+
+# Make the project root importable when this file is run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper.fetcher import (
+    FetchEngine, HostUnavailable, HOST_FAILURE_STATUSES, get_host, get_host_health, get_host_limiter,
+    host_health, looks_blocked, retry_after_seconds,
+)
+from scraper import metrics, tracing
+from scraper.http_cache import SessionPool, ResponseCache
+from scraper.archive import PageArchive, parser_key
+from scraper.store import open_store, STORE_FILE
+from scraper.parsing import make_document, make_soup
+from scraper.catalog import open_catalog, selectors_for
+from scraper.structured import extract_structured
+from scraper.alerts import open_alerts
 
 # --- Configuration ---
-# IMPORTANT: Replace with actual product URLs and adjust CSS selectors.
-# You will need to inspect the HTML of the specific product pages to find
-# the correct selectors for title, price, and availability.
-PRODUCTS_TO_TRACK = [
-    {
-        "name": "Dyson Gen5detect Cordless Vacuum Cleaner",
-        "url": "https://www.amazon.com/Dyson-Gen5detect-Cordless-Vacuum-Cleaner/dp/B0C2JD5H7D/ref=sr_1_1?crid=301ALWVE6VNJ6&dib=eyJ2IjoiMSJ9.f03GhTUdsx1FcQ6-ZSQrbZPO6QknBRWdSCRsxRngewW8y-x823uzriTKhSVcGekV8qH1LrLppkh6meYkUIGqOiXdA0bfsULpfz5VE1PKPywt-c6TV-S8IlT-Ro8h3TpulLd-id3VSAB0-xv-AfpmyHYkBnWNqHfeAl5UaywXyRMvJcaUqmXrI2Ybe_x_z8kXrzkDS9GIELXqFIRiiSiC-_ovj6b4tiBZUU.MC0AyiZwUwaceqXFHvjbvRZfA6pKWDyPokzsajBGpVY&dib_tag=se&keywords=dyson%2Bcordless%2Bvacuum%2Bgen5&qid=1750100998&sprefix=dyson%2Bcordless%2Bvacuum%2Bge%2Caps%2C101&sr=8-1&th=1",
-        "selectors": {
-            "title": "#productTitle",
-            "price": ".a-price-whole", # Amazon example, might need refinement
-            "availability": "#availability span" # Amazon example
-        },
-        "site": "amazon"
-    },
-    {
-        "name": "Apple - AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature - White",
-        "url": "https://www.bestbuy.com/site/apple-airpods-pro-2-wireless-active-noise-cancelling-earbuds-with-hearing-aid-feature-white/6447382.p?skuId=6447382",
-        "selectors": {
-           # These selectors are no longer primarily used for BestBuy due to JSON parsing
-           "title": "h1.heading-3",
-           "price": ".priceView-hero-price.priceView-customer-price span[aria-hidden='true']",
-           "availability": ".fulfillment-fulfillment-summary"
-        },
-        "site": "bestbuy"
-    },
-     # Add more products here.
-     # {"name": "Example GPU", "url": "https://www.newegg.com/...", "selectors": {"title": "", "price": "", "availability": ""}, "site": "newegg"}
-]
-
-# Path to store historical data
-DATA_FILE = os.path.join("data", "prices.csv")
+# Tracked products and per-site selectors live in the catalog (see scraper/catalog.py).
+# Historical data lives in the SQLite price store (STORE_FILE, see scraper/store.py).
+# The legacy CSV history is imported into it automatically on first run.
 # Path for BestBuy debug JSON output
 BESTBUY_DEBUG_JSON_FILE = "bestbuy_debug_data.json"
+# Debug mode: always run the full site parsers, save the decoded BestBuy JSON to
+# BESTBUY_DEBUG_JSON_FILE and print every trace (see scraper/tracing.py).
+# Off by default; set PRICE_TRACKER_DEBUG=1 to enable.
+DEBUG = os.environ.get("PRICE_TRACKER_DEBUG") == "1"
+if DEBUG and not tracing.ENABLED:
+    tracing.enable(echo=True)
+
+# HTML parser backend: "html.parser" (always available), "lxml" or "selectolax"
+# (used if installed, otherwise html.parser is used)
+PARSER_BACKEND = os.environ.get("PRICE_TRACKER_PARSER", "html.parser")
+# Partial parsing: only build the subtrees a product's selectors target
+PARTIAL_PARSE = True
+# Structured-data tier: read JSON-LD / og: and product: meta tags with a string scan
+# before building a DOM; the site parsers only run when a page has none
+STRUCTURED_DATA = True
+
+# Extraction tiers, recorded in the `source` column of every row (besides the
+# structured-data tiers "json_ld" and "meta")
+SOURCE_BESTBUY_JSON = "bestbuy_json"
+SOURCE_DOM = "dom"
 
 # Headers to mimic a browser request and avoid bot detection
 HEADERS = {
@@ -55,27 +63,29 @@ HEADERS = {
     "Upgrade-Insecure-Requests": "1" # Request secure connection
 }
 
-# --- Utility Functions ---
+# Pooled per-host sessions (connection reuse) and the on-disk response cache
+# used for conditional GETs (ETag / Last-Modified)
+SESSIONS = SessionPool(HEADERS)
+RESPONSE_CACHE = ResponseCache()
+
+# Raw-page archive: keep every fetched page (compressed, deduplicated by content hash)
+# so history can be rebuilt offline with `python scraper/archive.py`, and skip parsing
+# pages identical to one already parsed. Off by default; set PRICE_TRACKER_ARCHIVE=1.
+ARCHIVE = PageArchive() if os.environ.get("PRICE_TRACKER_ARCHIVE") == "1" else None
 
-def create_data_file_if_not_exists():
-    """Creates the CSV data file with headers if it doesn't exist."""
-    if not os.path.exists(DATA_FILE):
-        os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-        df = pd.DataFrame(columns=["timestamp", "product_name", "price", "availability", "url"])
-        df.to_csv(DATA_FILE, index=False)
-        print(f"Created new data file: {DATA_FILE}")
+# --- Utility Functions ---
 
 def get_page_content(url, retries=3, backoff_factor=0.5, local_html_path=None):
     """
     Fetches the content of a given URL with retries and backoff.
-    Handles basic bot protection by using custom headers.
+    Handles basic bot protection by using custom headers, and paces requests
+    through the per-host rate limiter so each retailer stays within its budget.
     If local_html_path is provided, reads from the local file instead.
     """
     if local_html_path:
         # Construct the absolute path to the local HTML file, assuming it's in the project root
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-        full_local_path = os.path.join(project_root, local_html_path)
-        print(f"DEBUG: Reading content from local file: {full_local_path}")
+        full_local_path = os.path.join(PROJECT_ROOT, local_html_path)
+        tracing.trace("Reading content from local file: %s", full_local_path)
         try:
             with open(full_local_path, 'r', encoding='utf-8') as f:
                 return f.read()
@@ -87,27 +97,94 @@ def get_page_content(url, retries=3, backoff_factor=0.5, local_html_path=None):
             return None
 
     # Original web fetching logic if local_html_path is not provided
+    page = fetch_page(url, retries=retries, backoff_factor=backoff_factor)
+    return page["content"] if page else None
+
+def fetch_page(url, retries=3, backoff_factor=0.5):
+    """
+    Fetches a URL through the pooled session for its host, sending conditional
+    headers when a cached copy exists. Returns a dict with the page "content"
+    and a "not_modified" flag (True when the server answered 304 and the
+    cached body was used), or None if the page could not be fetched.
+    Every attempt feeds the host's circuit breaker; raises HostUnavailable
+    while the breaker is open.
+    """
+    limiter = get_host_limiter(url)
+    health = get_host_health(url)
+    session = SESSIONS.get(url)
+    host = get_host(url)
+    conditional = True
     for i in range(retries):
+        # While the host's circuit is open this raises HostUnavailable instead of
+        # spending a rate-limit slot, so callers can move on to healthy hosts
+        try:
+            health.before_request()
+        except HostUnavailable:
+            metrics.FETCH_FAILURES.inc(host=host, reason="circuit_open")
+            raise
         try:
-            # Introduce a random delay before making the request
-            delay = random.uniform(2, 5) # Random delay between 2 and 5 seconds
-            print(f"DEBUG: Waiting for {delay:.2f} seconds before fetching {url} (Attempt {i + 1}/{retries})...")
-            time.sleep(delay)
-
-            print(f"Fetching: {url} (Attempt {i + 1}/{retries})")
-            # Increased timeout to 20 seconds
-            response = requests.get(url, headers=HEADERS, timeout=20) # Changed timeout from 15 to 20
-            response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
-            return response.text
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching {url}: {e}")
-            if i < retries - 1:
-                sleep_time = backoff_factor * (2 ** i)
-                print(f"Retrying in {sleep_time:.2f} seconds...")
-                time.sleep(sleep_time)
+            try:
+                conditional_headers = RESPONSE_CACHE.conditional_headers(url) if conditional else {}
+                # Every attempt (including retries) waits for a slot in the host's rate budget
+                with limiter:
+                    print(f"Fetching: {url} (Attempt {i + 1}/{retries})")
+                    # Increased timeout to 20 seconds
+                    with metrics.timed("fetch", host=host):
+                        request_start = time.perf_counter()
+                        response = session.get(url, headers=conditional_headers, timeout=20) # Changed timeout from 15 to 20
+                        latency = time.perf_counter() - request_start
+                    metrics.DOWNLOADED_BYTES.inc(len(response.content), host=host)
+            except requests.exceptions.RequestException as e:
+                health.record_failure(type(e).__name__)
+                metrics.FETCH_FAILURES.inc(host=host, reason=type(e).__name__)
+                error = e
             else:
-                print(f"Failed to fetch {url} after {retries} attempts.")
-                return None
+                tracing.trace("HTTP %s in %.3f s, %d bytes", response.status_code, latency, len(response.content))
+                if looks_blocked(response.text):
+                    # Retrying a captcha page only digs deeper; the circuit opens at once
+                    health.record_failure("block page", blocked=True)
+                    metrics.FETCH_FAILURES.inc(host=host, reason="block_page")
+                    print(f"{host} served a captcha/bot-check page for {url}")
+                    return None
+                if response.status_code in HOST_FAILURE_STATUSES:
+                    health.record_failure(f"HTTP {response.status_code}", retry_after=retry_after_seconds(response))
+                    metrics.FETCH_FAILURES.inc(host=host, reason=str(response.status_code))
+                else:
+                    health.record_success(latency)
+                if response.status_code == 304:
+                    content = RESPONSE_CACHE.load_body(url)
+                    if content is not None:
+                        print(f"Not modified since last fetch: {url}")
+                        return {"content": content, "not_modified": True}
+                    # The cached copy is gone (e.g. removed since the request was
+                    # sent): retry without the conditional headers to get the full page
+                    conditional = False
+                    error = "HTTP 304 but the cached copy is missing"
+                else:
+                    try:
+                        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+                    except requests.exceptions.HTTPError as e:
+                        error = e
+                    else:
+                        RESPONSE_CACHE.store(url, response)
+                        return {"content": response.text, "not_modified": False}
+        except BaseException:
+            # An error other than a recorded outcome (e.g. decoding the body) must
+            # give a half-open probe slot back, or the host would stay closed off
+            health.release_probe()
+            raise
+
+        print(f"Error fetching {url}: {error}")
+        if i < retries - 1:
+            if health.state == health.OPEN:
+                # Don't sleep on a retry the circuit breaker will refuse anyway
+                continue
+            sleep_time = backoff_factor * (2 ** i)
+            print(f"Retrying in {sleep_time:.2f} seconds...")
+            time.sleep(sleep_time)
+        else:
+            print(f"Failed to fetch {url} after {retries} attempts.")
+            return None
 
 def parse_amazon(soup, selectors):
     """Parses Amazon product page content."""
@@ -129,15 +206,15 @@ def parse_amazon(soup, selectors):
 def parse_bestbuy(soup, selectors):
     """Parses BestBuy product page content by extracting data from embedded JSON."""
     title, price, availability = "N/A", None, "N/A"
-    print("DEBUG: Starting BestBuy parsing...")
+    tracing.trace("Starting BestBuy parsing...")
 
     # Find the script tag that contains "ApolloSSRDataTransport" and typically has a 'push' method
     script_tag = soup.find('script', string=re.compile(r'window\[Symbol\.for\(\"ApolloSSRDataTransport\"\)\].*push'))
     
     if script_tag:
-        print("DEBUG: Found ApolloSSRDataTransport script tag.")
+        tracing.trace("Found ApolloSSRDataTransport script tag.")
         script_content = script_tag.string
-        print(f"DEBUG: Script content starts with (first 200 chars): {script_content[:200]}...")
+        tracing.trace("Script content starts with (first 200 chars): %.200s...", script_content)
 
         # Locate the start of the 'rehydrate' JSON within the push method's arguments
         json_start_indicator = '"rehydrate":'
@@ -168,62 +245,56 @@ def parse_bestbuy(soup, selectors):
                 
                 # --- CRITICAL FIX: Replace 'undefined' with 'null' for valid JSON parsing ---
                 json_str = json_str.replace(':undefined', ':null')
-                print(f"DEBUG: Replaced ':undefined' with ':null' in JSON string.")
+                tracing.trace("Replaced ':undefined' with ':null' in JSON string.")
                 
-                print(f"DEBUG: Extracted JSON string portion (first 500 chars): {json_str[:500]}...")
+                tracing.trace("Extracted JSON string portion (first 500 chars): %.500s...", json_str)
                 try:
                     data = json.loads(json_str)
-                    print(f"DEBUG: Successfully decoded BestBuy JSON.")
+                    tracing.trace("Successfully decoded BestBuy JSON.")
                     
-                    # --- Save the entire 'data' object to a file for detailed debugging ---
-                    try:
-                        with open(BESTBUY_DEBUG_JSON_FILE, 'w', encoding='utf-8') as f:
-                            json.dump(data, f, indent=4) # Use json.dump for cleaner JSON output
-                        print(f"DEBUG: Full decoded 'data' object saved to {BESTBUY_DEBUG_JSON_FILE}")
-                    except Exception as file_e:
-                        print(f"ERROR: Could not save debug JSON to file: {file_e}")
-                    
-                    # --- IMPORTANT: Print the entire 'data' object for deep debugging ---
-                    print("DEBUG: --- Full decoded 'data' object content (for analysis) ---")
-                    pprint.pprint(data)
-                    print("DEBUG: --- End decoded 'data' object content ---")
+                    if DEBUG:
+                        # --- Save the entire 'data' object to a file for detailed debugging ---
+                        try:
+                            with open(BESTBUY_DEBUG_JSON_FILE, 'w', encoding='utf-8') as f:
+                                json.dump(data, f, indent=4) # Use json.dump for cleaner JSON output
+                            tracing.trace("Full decoded 'data' object saved to %s", BESTBUY_DEBUG_JSON_FILE)
+                        except Exception as file_e:
+                            logging.error("Could not save debug JSON to %s: %s", BESTBUY_DEBUG_JSON_FILE, file_e)
 
                     product_data_node = None
                     # Search for 'productBySkuId' within the data that contains the relevant price and availability info
                     # We are looking for a node that has 'buyingOptions' and 'fulfillmentOptions'
                     for top_level_key, top_level_value in data.items():
-                        print(f"DEBUG: Evaluating top-level key: {top_level_key}")
+                        tracing.trace("Evaluating top-level key: %s", top_level_key)
                         if isinstance(top_level_value, dict) and 'data' in top_level_value and top_level_value['data'] is not None: # ADDED check for top_level_value['data']
                             if 'productBySkuId' in top_level_value['data'] and \
                                isinstance(top_level_value['data']['productBySkuId'], dict):
                                 
                                 candidate_node = top_level_value['data']['productBySkuId']
-                                print(f"DEBUG: Found candidate 'productBySkuId' node under {top_level_key}")
+                                tracing.trace("Found candidate 'productBySkuId' node under %s", top_level_key)
                                 
                                 # Check for the presence of both 'buyingOptions' and 'fulfillmentOptions'
                                 if 'buyingOptions' in candidate_node and 'fulfillmentOptions' in candidate_node:
                                     product_data_node = candidate_node
-                                    print(f"DEBUG: Selected primary 'productBySkuId' node with buyingOptions and fulfillmentOptions under: {top_level_key}")
-                                    print("DEBUG: --- Selected product_data_node content (for analysis) ---")
-                                    pprint.pprint(product_data_node)
-                                    print("DEBUG: --- End selected product_data_node content ---")
+                                    tracing.trace("Selected primary 'productBySkuId' node with buyingOptions and fulfillmentOptions under: %s", top_level_key)
+                                    tracing.trace("Selected product_data_node content: %r", product_data_node)
                                     break # Found the correct comprehensive node, stop searching
                                 else:
-                                    print(f"DEBUG: Candidate 'productBySkuId' node under {top_level_key} lacks 'buyingOptions' or 'fulfillmentOptions'. Skipping.")
+                                    tracing.trace("Candidate 'productBySkuId' node under %s lacks 'buyingOptions' or 'fulfillmentOptions'. Skipping.", top_level_key)
                             else:
-                                print(f"DEBUG: 'productBySkuId' not found or not a dictionary under 'data' for key {top_level_key}.")
+                                tracing.trace("'productBySkuId' not found or not a dictionary under 'data' for key %s.", top_level_key)
                         else:
-                            print(f"DEBUG: Top-level key {top_level_key} does not contain 'data' or is not a dictionary or 'data' is None.")
+                            tracing.trace("Top-level key %s does not contain 'data' or is not a dictionary or 'data' is None.", top_level_key)
 
                     if product_data_node:
-                        print("DEBUG: Final 'product_data_node' selected for parsing price/availability.")
+                        tracing.trace("Final 'product_data_node' selected for parsing price/availability.")
                         # Extract Title - This path appears correct
                         name_node = product_data_node.get('name')
                         if name_node and isinstance(name_node, dict) and 'short' in name_node:
                             title = name_node['short']
-                            print(f"DEBUG: Extracted title: {title}")
+                            tracing.trace("Extracted title: %s", title)
                         else:
-                            print("DEBUG: Title not found or not expected type in JSON path 'name.short' in final node.")
+                            tracing.trace("Title not found or not expected type in JSON path 'name.short' in final node.")
                         
                         # Extract Price from 'buyingOptions' - Adjusted path based on debug
                         price = None
@@ -238,21 +309,21 @@ def parse_bestbuy(soup, selectors):
                                             price = price_info['customerPrice']
                                             try:
                                                 price = float(price)
-                                                print(f"DEBUG: Extracted price from buyingOptions: {price}")
+                                                tracing.trace("Extracted price from buyingOptions: %s", price)
                                             except ValueError:
                                                 price = None
-                                                print(f"DEBUG: Could not convert extracted price '{price_info['customerPrice']}' to float from buyingOptions.")
+                                                tracing.trace("Could not convert extracted price '%s' to float from buyingOptions.", price_info['customerPrice'])
                                             break # Found new price, break the loop
                                         else:
-                                            print("DEBUG: 'customerPrice' not found in price_info for 'New' buying option.")
+                                            tracing.trace("'customerPrice' not found in price_info for 'New' buying option.")
                                     else:
-                                        print("DEBUG: 'product' not found or not a dict in 'New' buying option.")
+                                        tracing.trace("'product' not found or not a dict in 'New' buying option.")
                                 else:
-                                    print(f"DEBUG: Skipping buying option type: {option.get('type')}")
+                                    tracing.trace("Skipping buying option type: %s", option.get('type'))
                             if price is None:
-                                print("DEBUG: Price for 'New' condition not found or not parsable in 'buyingOptions'.")
+                                tracing.trace("Price for 'New' condition not found or not parsable in 'buyingOptions'.")
                         else:
-                            print("DEBUG: 'buyingOptions' not found or not a list in product_data_node.")
+                            tracing.trace("'buyingOptions' not found or not a list in product_data_node.")
                                     
                         # Extract Availability from 'fulfillmentOptions' - Adjusted logic
                         availability_parts = []
@@ -266,7 +337,7 @@ def parse_bestbuy(soup, selectors):
                                         for avail in detail['ispuAvailability']:
                                             if isinstance(avail, dict) and avail.get('instoreInventoryAvailable') == True:
                                                 availability_parts.append("In Stock (Pickup)")
-                                                print("DEBUG: Found In Stock (Pickup) via ispuDetails.")
+                                                tracing.trace("Found In Stock (Pickup) via ispuDetails.")
                                                 break # Found, move to next detail type
                                         if "In Stock (Pickup)" in availability_parts: break # Found for pickup, no need to loop further
                             
@@ -278,7 +349,7 @@ def parse_bestbuy(soup, selectors):
                                         for avail in detail['shippingAvailability']:
                                             if isinstance(avail, dict) and avail.get('shippingEligible') == True:
                                                 availability_parts.append("Available for Shipping")
-                                                print("DEBUG: Found Available for Shipping via shippingDetails.")
+                                                tracing.trace("Found Available for Shipping via shippingDetails.")
                                                 break # Found, move to next detail type
                                         if "Available for Shipping" in availability_parts: break # Found for shipping, no need to loop further
 
@@ -286,118 +357,296 @@ def parse_bestbuy(soup, selectors):
                                 availability = " and ".join(availability_parts)
                             else:
                                 availability = "Out of Stock or Check Store/Shipping"
-                                print("DEBUG: No specific availability found in fulfillmentOptions, defaulting to 'Out of Stock or Check Store/Shipping'.")
+                                tracing.trace("No specific availability found in fulfillmentOptions, defaulting to 'Out of Stock or Check Store/Shipping'.")
                         else:
                             availability = "Out of Stock or Check Store/Shipping (fulfillmentOptions not found or not a dict)"
-                            print("DEBUG: 'fulfillmentOptions' not found or not a dictionary in product_data_node.")
+                            tracing.trace("'fulfillmentOptions' not found or not a dictionary in product_data_node.")
                         
-                        print(f"DEBUG: Final Availability string after parsing: {availability}")
+                        tracing.trace("Final Availability string after parsing: %s", availability)
 
 
                     else: # product_data_node was not found or was not a dict
-                        print("DEBUG: Comprehensive 'productBySkuId' node not found within BestBuy JSON data after decoding, or did not contain 'buyingOptions' and 'fulfillmentOptions'.")
+                        tracing.trace("Comprehensive 'productBySkuId' node not found within BestBuy JSON data after decoding, or did not contain 'buyingOptions' and 'fulfillmentOptions'.")
                 except json.JSONDecodeError as e:
-                    print(f"ERROR: Could not decode JSON from BestBuy script tag: {e}")
-                    print(f"DEBUG: Raw JSON string that caused error (first 1000 chars): {json_str[:1000]}...") # Increased raw string print
-                except TypeError as e: # Catch TypeError specifically for more granular debugging
-                    print(f"ERROR: TypeError during BestBuy JSON parsing: {e}")
-                    import traceback
-                    traceback.print_exc() # Print full traceback to see exact line of NoneType error
+                    logging.error("Could not decode JSON from BestBuy script tag: %s", e)
+                    tracing.trace("Raw JSON string that caused error (first 1000 chars): %.1000s...", json_str)
                 except Exception as e:
-                    print(f"ERROR: An unexpected general error occurred during BestBuy JSON parsing: {e}")
+                    # The full traceback (e.g. the exact line of a NoneType error) goes to the log
+                    logging.exception("Unexpected error during BestBuy JSON parsing")
+                    tracing.trace("BestBuy JSON parsing failed: %r", e)
             else:
-                print("DEBUG: Could not find matching closing brace for 'rehydrate' JSON object.")
+                tracing.trace("Could not find matching closing brace for 'rehydrate' JSON object.")
         else:
-            print("DEBUG: 'rehydrate' JSON start indicator not found in script content.")
+            tracing.trace("'rehydrate' JSON start indicator not found in script content.")
     else:
-        print("DEBUG: ApolloSSRDataTransport script tag not found for BestBuy.")
+        tracing.trace("ApolloSSRDataTransport script tag not found for BestBuy.")
 
     # Fallback to direct CSS selectors for title if JSON extraction fails
     if title == "N/A":
         title_element = soup.select_one(selectors["title"])
         if title_element:
             title = title_element.get_text(strip=True)
-            print(f"DEBUG: Fallback title extracted: {title}")
+            tracing.trace("Fallback title extracted: %s", title)
         else:
-            print("DEBUG: Fallback title selector also failed to find title.")
+            tracing.trace("Fallback title selector also failed to find title.")
     
-    print(f"DEBUG: parse_bestbuy returning -> Title: {title}, Price: {price}, Availability: {availability}")
+    tracing.trace("parse_bestbuy returning -> Title: %s, Price: %s, Availability: %s", title, price, availability)
     return title, price, availability
 
+# Markers used by the BestBuy fast path to locate the product node in the raw HTML
+_APOLLO_SCRIPT_MARKER = 'window[Symbol.for("ApolloSSRDataTransport")]'
+_PRODUCT_NODE_KEY = '"productBySkuId":'
+_JSON_DECODER = json.JSONDecoder()
+
+def _decode_js_object(text, start, end):
+    """
+    Decodes the JSON object starting at text[start], stopping at its closing brace.
+    If the object contains JS 'undefined' values, retries on a copy of text[start:end]
+    with the same ':undefined' -> ':null' fix the full parser applies.
+    """
+    try:
+        return _JSON_DECODER.raw_decode(text, start)[0]
+    except ValueError:
+        pass
+    try:
+        return _JSON_DECODER.raw_decode(text[start:end].replace(':undefined', ':null'))[0]
+    except ValueError:
+        return None
+
+def _find_bestbuy_product_node(html_content):
+    """
+    Scans the Apollo SSR scripts in the raw HTML for a 'productBySkuId' node
+    that has both 'buyingOptions' and 'fulfillmentOptions'. Only that node is
+    decoded (json's C scanner stops at its closing brace), instead of the whole
+    'rehydrate' blob. Returns the node dict, or None if not found.
+    """
+    marker = html_content.find(_APOLLO_SCRIPT_MARKER)
+    while marker != -1:
+        script_end = html_content.find('</script>', marker)
+        if script_end == -1:
+            script_end = len(html_content)
+        key_index = html_content.find(_PRODUCT_NODE_KEY, marker, script_end)
+        while key_index != -1:
+            value_index = key_index + len(_PRODUCT_NODE_KEY)
+            while html_content[value_index:value_index + 1].isspace():
+                value_index += 1
+            if html_content.startswith('{', value_index):
+                node = _decode_js_object(html_content, value_index, script_end)
+                if isinstance(node, dict) and 'buyingOptions' in node and 'fulfillmentOptions' in node:
+                    return node
+            key_index = html_content.find(_PRODUCT_NODE_KEY, value_index, script_end)
+        marker = html_content.find(_APOLLO_SCRIPT_MARKER, script_end)
+    return None
+
+def _bestbuy_price(buying_options):
+    """Returns the 'New' condition customer price from buyingOptions as a float, or None."""
+    if not isinstance(buying_options, list):
+        return None
+    for option in buying_options:
+        if isinstance(option, dict) and option.get('type') == 'New':
+            product_detail = option.get('product')
+            price_info = product_detail.get('price') if isinstance(product_detail, dict) else None
+            if isinstance(price_info, dict) and 'customerPrice' in price_info:
+                try:
+                    return float(price_info['customerPrice'])
+                except (TypeError, ValueError):
+                    return None
+    return None
+
+def _bestbuy_availability(fulfillment_options):
+    """Builds the availability string from fulfillmentOptions (same wording as parse_bestbuy)."""
+    if not isinstance(fulfillment_options, dict):
+        return "Out of Stock or Check Store/Shipping (fulfillmentOptions not found or not a dict)"
+
+    def any_flag(details, list_key, flag):
+        if not isinstance(details, list):
+            return False
+        for detail in details:
+            if isinstance(detail, dict) and detail.get(list_key):
+                for avail in detail[list_key]:
+                    if isinstance(avail, dict) and avail.get(flag) == True:
+                        return True
+        return False
+
+    availability_parts = []
+    if any_flag(fulfillment_options.get('ispuDetails'), 'ispuAvailability', 'instoreInventoryAvailable'):
+        availability_parts.append("In Stock (Pickup)")
+    if any_flag(fulfillment_options.get('shippingDetails'), 'shippingAvailability', 'shippingEligible'):
+        availability_parts.append("Available for Shipping")
+    return " and ".join(availability_parts) if availability_parts else "Out of Stock or Check Store/Shipping"
+
+def parse_bestbuy_fast(html_content):
+    """
+    Production BestBuy extractor working on the raw HTML (no DOM, no debug I/O).
+    Pulls only name.short, buyingOptions and fulfillmentOptions from the product node.
+    Returns (title, price, availability), or None if the product node wasn't found.
+    """
+    product_data_node = _find_bestbuy_product_node(html_content)
+    if product_data_node is None:
+        return None
+    name_node = product_data_node.get('name')
+    title = name_node.get('short', "N/A") if isinstance(name_node, dict) else "N/A"
+    price = _bestbuy_price(product_data_node.get('buyingOptions'))
+    availability = _bestbuy_availability(product_data_node.get('fulfillmentOptions'))
+    return title, price, availability
+
+
+def parse_page(html_content, site, selectors):
+    """
+    Extracts (title, price, availability, source) from a product page of the
+    given site, or returns None for an unsupported site. `source` names the tier
+    that produced the result. Used for live scrapes and archive replays.
+    """
+    if site not in ("amazon", "bestbuy"):
+        # if site == "newegg": # Commented out Newegg parsing
+        #    return (*parse_newegg(soup, selectors), SOURCE_DOM)
+        return None
+    # Debug mode always runs the full site parsers
+    if STRUCTURED_DATA and not DEBUG:
+        structured = extract_structured(html_content, site)
+        if structured:
+            tracing.trace("Structured data (%s): %r", structured[3], structured[:3])
+            return structured
+        tracing.trace("No structured data, using the %s parser", site)
+    if site == "amazon":
+        soup = make_document(html_content, PARSER_BACKEND, selectors if PARTIAL_PARSE else None)
+        return (*parse_amazon(soup, selectors), SOURCE_DOM)
+    # The fast path reads the product node straight from the raw HTML; the full
+    # DOM + JSON parser is only used in debug mode or when the fast path misses.
+    fast_result = None if DEBUG else parse_bestbuy_fast(html_content)
+    if fast_result and fast_result[0] != "N/A":
+        tracing.trace("BestBuy fast path: %r", fast_result)
+        return (*fast_result, SOURCE_BESTBUY_JSON)
+    tracing.trace("BestBuy fast path missed, parsing the full page")
+    soup = make_soup(html_content, PARSER_BACKEND)
+    return (*parse_bestbuy(soup, selectors), SOURCE_DOM)
 
 def scrape_product(product_info):
     """
     Scrapes product details from the given URL.
+    Traces made while scraping are kept in the product's trace buffer.
     """
+    with tracing.product(product_info["url"], product_info["name"]):
+        try:
+            return _scrape_product(product_info)
+        finally:
+            tracing.save()
+            metrics.save()
+
+def _scrape_product(product_info):
     url = product_info["url"]
-    selectors = product_info["selectors"]
     site = product_info["site"]
-
-    # For Best Buy, use the uploaded local HTML file for testing
-    if site == "bestbuy" and product_info["name"] == "Apple - AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature - White":
-        # Ensure 'Apple AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature White MTJV3LL_A_MTJV3AM_A - Best Buy.html'
-        # is placed in the project's root directory (e.g., C:\Users\brian\price_tracker\)
-        html_content = get_page_content(url, local_html_path='Apple AirPods Pro 2, Wireless Active Noise Cancelling Earbuds with Hearing Aid Feature White MTJV3LL_A_MTJV3AM_A - Best Buy.html')
+    selectors = selectors_for(product_info)
+    print(f"\nScraping {product_info['name']} from {url}...")
+
+    # Products with a local_html_path (relative to the project root) are read from
+    # that saved page instead of being fetched, e.g. for testing
+    if product_info.get("local_html_path"):
+        html_content = get_page_content(url, local_html_path=product_info["local_html_path"])
+        page = None
     else:
-        html_content = get_page_content(url)
+        page = fetch_page(url)
+        html_content = page["content"] if page else None
     
     if not html_content:
         return None
 
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    title, price, availability = "N/A", None, "N/A"
-
-    if site == "amazon":
-        title, price, availability = parse_amazon(soup, selectors)
-    elif site == "bestbuy":
-        title, price, availability = parse_bestbuy(soup, selectors)
-    # elif site == "newegg": # Commented out Newegg parsing
-    #    title, price, availability = parse_newegg(soup, selectors)
+    fetched_at = datetime.now().isoformat()
+    digest = None
+    if ARCHIVE is not None:
+        digest = ARCHIVE.put(html_content)
+        ARCHIVE.record(product_info, digest, fetched_at)
+
+    # On a 304 the page is byte-for-byte what we parsed last time, so reuse that result
+    # if the parsers and selectors are unchanged; with the archive on, so is any page
+    # whose content hash was parsed before
+    key = parser_key(site, selectors)
+    cached = RESPONSE_CACHE.load_parsed(url, key) if page and page["not_modified"] else None
+    if cached:
+        title, price, availability = cached["title"], cached["price"], cached["availability"]
+        source = cached.get("source")
+        tracing.trace("Not modified, reusing the parsed result")
+    elif digest and (archived := ARCHIVE.load_parsed(digest, key)):
+        title, price, availability, source = archived
+        tracing.trace("Page %s already parsed, reusing the archived result", digest)
     else:
-        print(f"Unsupported site: {site}")
-        return None
+        parse_start = time.perf_counter()
+        parsed = parse_page(html_content, site, selectors)
+        if parsed is None:
+            print(f"Unsupported site: {site}")
+            return None
+        title, price, availability, source = parsed
+        metrics.observe_stage("parse", time.perf_counter() - parse_start, site=site, host=get_host(url))
+        metrics.EXTRACTIONS.inc(site=site, source=source)
+
+        if page:
+            RESPONSE_CACHE.store_parsed(url, key, {"title": title, "price": price, "availability": availability, "source": source})
+        if digest:
+            ARCHIVE.store_parsed([(digest, key, parsed)])
+    tracing.trace("Result (%s): title=%r price=%r availability=%r", source, title, price, availability)
 
     return {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": fetched_at,
         "product_name": product_info["name"],
         "price": price,
         "availability": availability,
         "url": url,
+        "source": source,
     }
 
-def main():
-    """Main function to run the scraping process."""
-    create_data_file_if_not_exists()
-    all_scraped_data = []
-
-    for product in PRODUCTS_TO_TRACK:
-        print(f"\nScraping {product['name']} from {product['url']}...")
-        data = scrape_product(product)
-        if data:
-            all_scraped_data.append(data)
-            print(f"Scraped: {data}")
-        else:
-            print(f"Could not scrape data for {product['name']}.")
-        
-        # Add a delay after each product scrape to be less aggressive
-        # You can adjust this value (e.g., 2 for 2 seconds, 5 for 5 seconds)
-        time.sleep(3) # Wait for 3 seconds after each product scrape
-
-    if all_scraped_data:
-        try:
-            # Load existing data
-            existing_df = pd.read_csv(DATA_FILE)
-            # Create a DataFrame from new data
-            new_df = pd.DataFrame(all_scraped_data)
-            # Concatenate and save
-            updated_df = pd.concat([existing_df, new_df], ignore_index=True)
-            updated_df.to_csv(DATA_FILE, index=False)
-            print(f"\nSuccessfully saved {len(all_scraped_data)} new entries to {DATA_FILE}")
-        except Exception as e:
-            print(f"Error saving data to CSV: {e}")
+def main(site=None, shard=None, shards=None, batch_size=500):
+    """
+    Main function to run the scraping process over the catalog (optionally one
+    site, or one shard of `shards`), a batch of products at a time.
+    """
+    store = open_store()
+    # New observations are checked against the price alerts as they are saved
+    open_alerts().watch(store)
+    catalog = open_catalog()
+    saved_total = failed_total = 0
+
+    # Products on different hosts are scraped in parallel; pacing per retailer
+    # is handled by the host rate limiters inside get_page_content.
+    engine = FetchEngine()
+    for products in catalog.iter_batches(site=site, shard=shard, shards=shards, batch_size=batch_size):
+        results = engine.map(scrape_product, products)
+
+        all_scraped_data = []
+        for product, data in zip(products, results):
+            if data:
+                all_scraped_data.append(data)
+                print(f"Scraped: {data}")
+            else:
+                failed_total += 1
+                print(f"Could not scrape data for {product['name']}.")
+
+        if all_scraped_data:
+            try:
+                # Append only the new rows; the existing history is never re-read or rewritten
+                with metrics.timed("store_write"):
+                    saved_total += store.insert_batch(all_scraped_data)
+            except Exception as e:
+                print(f"Error saving data to the price store: {e}")
+
+    if saved_total:
+        print(f"\nSuccessfully saved {saved_total} new entries to {STORE_FILE}")
     else:
         print("\nNo new data was scraped to save.")
+    if failed_total:
+        print(f"{failed_total} product(s) could not be scraped.")
+
+    print("\nRun summary:")
+    print(metrics.summary())
+    for health in host_health():
+        if health["trips"] or health["state"] != "closed":
+            print(f"Host {health['host']}: {health['state']}, tripped {health['trips']} time(s), last error: {health['last_error']}")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape every product in the catalog once.")
+    parser.add_argument("--site", help="only scrape products of this site")
+    parser.add_argument("--shard", type=int, default=0, help="only scrape shard SHARD of --shards (0-based)")
+    parser.add_argument("--shards", type=int, help="number of host-based shards")
+    args = parser.parse_args()
+    main(site=args.site, shard=args.shard, shards=args.shards)
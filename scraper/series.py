@@ -0,0 +1,201 @@
+"""
+Compact in-memory price series for readers (charts, the history API).
+
+Instead of a row (dict or DataFrame row) per stored run, with the product name,
+URL and availability repeated as strings on every one, a SeriesSet keeps:
+
+  - products (by URL) and availability texts interned to small integer ids
+  - one contiguous NumPy column per field (timestamps and last_seen as
+    datetime64[us], prices as float64 with NaN for a missing price,
+    availability ids, observation counts), grouped by product
+  - a group index (offsets into the columns) built in a single pass plus one
+    stable sort, so a product's series is an O(1) slice of the columns
+
+Rows are the store's run-length compressed runs, so the memory per scrape is
+the ~32 bytes of a run divided by the number of observations it covers.
+"""
+from array import array
+
+import numpy as np
+
+
+class Interner:
+    """Maps values (strings or None) to dense integer ids, and back by indexing."""
+
+    def __init__(self):
+        self._ids = {}
+        self.values = []
+
+    def id(self, value):
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self._ids[value] = value_id
+            self.values.append(value)
+        return value_id
+
+    def get(self, value):
+        """The id of a value, or None if it was never interned."""
+        return self._ids.get(value)
+
+    def __getitem__(self, value_id):
+        return self.values[value_id]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class PriceSeries:
+    """
+    One product's runs, as views into its SeriesSet's columns (oldest first).
+    timestamps/last_seen are datetime64[us], prices float64 (NaN = no price),
+    availability holds ids into `availability_labels`.
+    """
+
+    def __init__(self, url, product_name, timestamps, last_seen, prices, availability, observations, availability_labels):
+        self.url = url
+        self.product_name = product_name
+        self.timestamps = timestamps
+        self.last_seen = last_seen
+        self.prices = prices
+        self.availability = availability
+        self.observations = observations
+        self.availability_labels = availability_labels
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def availability_at(self, i):
+        return self.availability_labels[self.availability[i]]
+
+    def steps(self, start=None, priced=True):
+        """
+        Vectorized expand_steps: returns (timestamps, prices) arrays with a point
+        at the start of every run and another at its last_seen when it was seen
+        more than once, so plots stay flat until the next change. Runs that
+        began before `start` (ISO string or datetime64) are clipped to it, and
+        runs that ended before it are left out, as are runs without a price
+        when priced=True.
+        """
+        timestamps, last_seen, prices = self.timestamps, self.last_seen, self.prices
+        keep = ~np.isnan(prices) if priced else np.ones(len(prices), dtype=bool)
+        if start is not None:
+            start = np.datetime64(start, "us")
+            keep &= last_seen >= start
+        timestamps, last_seen, prices = timestamps[keep], last_seen[keep], prices[keep]
+        if start is not None:
+            timestamps = np.maximum(timestamps, start)
+        repeated = last_seen != timestamps
+        # Every run yields its start; repeated runs also yield their last_seen, right after it
+        positions = np.arange(len(timestamps)) + np.concatenate(([0], np.cumsum(repeated)[:-1])).astype(np.int64)
+        total = len(timestamps) + int(repeated.sum())
+        out_timestamps = np.empty(total, dtype="datetime64[us]")
+        out_prices = np.empty(total, dtype=np.float64)
+        out_timestamps[positions] = timestamps
+        out_prices[positions] = prices
+        out_timestamps[positions[repeated] + 1] = last_seen[repeated]
+        out_prices[positions[repeated] + 1] = prices[repeated]
+        return out_timestamps, out_prices
+
+
+class SeriesSet:
+    """
+    The price series of a set of products, built from history rows in one pass.
+    Look products up by URL (or name) in O(1) with get().
+    """
+
+    def __init__(self, urls, names, offsets, timestamps, last_seen, prices, availability, observations, availability_labels):
+        self.urls = urls
+        self.names = names
+        self.offsets = offsets
+        self.timestamps = timestamps
+        self.last_seen = last_seen
+        self.prices = prices
+        self.availability = availability
+        self.observations = observations
+        self.availability_labels = availability_labels
+        self._by_name = {name: product_id for product_id, name in enumerate(names)}
+
+    def __len__(self):
+        return len(self.urls)
+
+    def __iter__(self):
+        for product_id in range(len(self.urls)):
+            yield self.series(product_id)
+
+    @property
+    def nbytes(self):
+        """Memory held by the columns and group index (interned strings not included)."""
+        return sum(column.nbytes for column in (
+            self.offsets, self.timestamps, self.last_seen, self.prices, self.availability, self.observations
+        ))
+
+    def series(self, product_id):
+        begin, end = self.offsets[product_id], self.offsets[product_id + 1]
+        return PriceSeries(
+            self.urls[product_id], self.names[product_id],
+            self.timestamps[begin:end], self.last_seen[begin:end], self.prices[begin:end],
+            self.availability[begin:end], self.observations[begin:end], self.availability_labels,
+        )
+
+    def get(self, url=None, product_name=None):
+        """Returns the PriceSeries of a product (by url or product_name), or None."""
+        product_id = self.urls.get(url) if url is not None else self._by_name.get(product_name)
+        return None if product_id is None else self.series(product_id)
+
+
+def build_series(rows):
+    """
+    Builds a SeriesSet from history rows given as tuples
+    (url, product_name, timestamp, last_seen, price, availability, observations)
+    in storage order. Each product's series is sorted by timestamp (rows with the
+    same timestamp keep their order) and named after its newest row.
+    """
+    products = Interner()
+    availability_labels = Interner()
+    names = []
+    # Timestamp of the row each product's name was taken from
+    named_at = []
+    product_ids = array("I")
+    # 32-bit ids: a long history can hold more than 65,535 distinct availability texts
+    availability = array("I")
+    prices = array("d")
+    observations = array("I")
+    timestamps = []
+    last_seen = []
+    nan = float("nan")
+    # Single pass: intern the strings and append to flat columns
+    for url, product_name, timestamp, seen, price, available, count in rows:
+        product_id = products.id(url)
+        if product_id == len(names):
+            names.append(product_name)
+            named_at.append(timestamp)
+        elif timestamp >= named_at[product_id]:
+            names[product_id] = product_name
+            named_at[product_id] = timestamp
+        product_ids.append(product_id)
+        availability.append(availability_labels.id(available))
+        prices.append(nan if price is None else price)
+        observations.append(count)
+        timestamps.append(timestamp)
+        last_seen.append(seen)
+
+    # Group index: row counts per product give the offsets; a stable sort by
+    # (product, timestamp) lays each product's rows out contiguously, in time order
+    product_ids = np.frombuffer(product_ids, dtype=np.uint32)
+    timestamps = np.array(timestamps, dtype="datetime64[us]")
+    counts = np.bincount(product_ids, minlength=len(products))
+    offsets = np.zeros(len(products) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    order = np.lexsort((timestamps, product_ids))
+    return SeriesSet(
+        urls=products,
+        names=names,
+        offsets=offsets,
+        timestamps=timestamps[order],
+        last_seen=np.array(last_seen, dtype="datetime64[us]")[order],
+        prices=np.frombuffer(prices, dtype=np.float64)[order],
+        availability=np.frombuffer(availability, dtype=np.uint32)[order],
+        observations=np.frombuffer(observations, dtype=np.uint32)[order],
+        availability_labels=availability_labels,
+    )
@@ -0,0 +1,379 @@
+import os
+import sys
+from datetime import date, datetime, timedelta
+from contextlib import closing
+
+# Make the project root importable when this file is run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# OHLC rollup resolutions maintained on every insert, finest first
+# ("1h" = clock hours, "1d" = calendar days, "1w" = weeks starting on Monday)
+ROLLUP_RESOLUTIONS = ("1h", "1d", "1w")
+# Charts use the coarsest resolution that still gives every bucket at most this
+# many pixels of the plot width; below that, the raw history is drawn
+PIXELS_PER_BUCKET = 2
+# Rolling windows (in days) summarised per product: min, max, average and % change.
+# Windows end at the product's latest observation.
+STAT_WINDOWS = (7, 30)
+
+_WINDOW_COLUMNS = "".join(
+    f"    min_{days}d REAL,\n    max_{days}d REAL,\n    avg_{days}d REAL,\n    change_{days}d_pct REAL,\n"
+    for days in STAT_WINDOWS
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS price_rollups (
+    url TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    first_at TEXT NOT NULL,
+    last_at TEXT NOT NULL,
+    PRIMARY KEY (url, resolution, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS price_stats (
+    url TEXT PRIMARY KEY,
+    product_name TEXT NOT NULL,
+    observations INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    availability TEXT,
+    price REAL,
+    price_at TEXT,
+    min_price REAL,
+    min_price_at TEXT,
+    max_price REAL,
+    max_price_at TEXT,
+    previous_price REAL,
+    last_change_at TEXT,
+{_WINDOW_COLUMNS.rstrip().rstrip(",")}
+);
+"""
+
+STAT_COLUMNS = [
+    "url", "product_name", "observations", "first_seen", "last_seen", "availability",
+    "price", "price_at", "min_price", "min_price_at", "max_price", "max_price_at",
+    "previous_price", "last_change_at",
+] + [f"{name}_{days}d{suffix}" for days in STAT_WINDOWS for name, suffix in
+     (("min", ""), ("max", ""), ("avg", ""), ("change", "_pct"))]
+
+_ROLLUP_UPSERT = """
+INSERT INTO price_rollups (url, resolution, bucket, open, high, low, close, total, count, first_at, last_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(url, resolution, bucket) DO UPDATE SET
+    open = CASE WHEN excluded.first_at < first_at THEN excluded.open ELSE open END,
+    close = CASE WHEN excluded.last_at >= last_at THEN excluded.close ELSE close END,
+    high = MAX(high, excluded.high),
+    low = MIN(low, excluded.low),
+    total = total + excluded.total,
+    count = count + excluded.count,
+    first_at = MIN(first_at, excluded.first_at),
+    last_at = MAX(last_at, excluded.last_at)
+"""
+
+
+def bucket_key(timestamp, resolution):
+    """
+    The rollup bucket an ISO timestamp falls into: "2025-01-31T14" for "1h",
+    "2025-01-31" for "1d", and the week's Monday ("2025-01-27") for "1w".
+    """
+    if resolution == "1h":
+        return timestamp[:13]
+    if resolution == "1d":
+        return timestamp[:10]
+    if resolution == "1w":
+        day = date.fromisoformat(timestamp[:10])
+        return (day - timedelta(days=day.weekday())).isoformat()
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+def bucket_start(bucket, resolution):
+    """Inverse of bucket_key: the datetime a bucket label starts at."""
+    if resolution == "1h":
+        return datetime.fromisoformat(f"{bucket}:00")
+    return datetime.fromisoformat(bucket)
+
+
+def choose_resolution(bucket_counts, width):
+    """
+    Picks the coarsest rollup resolution whose bucket count over the plotted
+    range still fills `width` pixels (at most PIXELS_PER_BUCKET pixels per
+    bucket). bucket_counts maps resolution -> buckets in range. Returns None
+    when even the finest resolution is too sparse, i.e. the raw history should be drawn.
+    """
+    for resolution in reversed(ROLLUP_RESOLUTIONS):
+        if bucket_counts.get(resolution, 0) * PIXELS_PER_BUCKET >= width:
+            return resolution
+    return None
+
+
+def _refresh_windows(conn, stats):
+    """Recomputes a product's rolling-window columns from its daily rollups (a few dozen rows at most)."""
+    last_day = datetime.fromisoformat(stats["last_seen"]).date()
+    for days in STAT_WINDOWS:
+        start = (last_day - timedelta(days=days)).isoformat()
+        low, high, average = conn.execute(
+            "SELECT MIN(low), MAX(high), SUM(total) / SUM(count) FROM price_rollups "
+            "WHERE url = ? AND resolution = '1d' AND bucket > ?",
+            (stats["url"], start),
+        ).fetchone()
+        before = conn.execute(
+            "SELECT close FROM price_rollups WHERE url = ? AND resolution = '1d' AND bucket <= ? "
+            "ORDER BY bucket DESC LIMIT 1",
+            (stats["url"], start),
+        ).fetchone()
+        change = None
+        if before and before[0] and stats["price"] is not None:
+            change = (stats["price"] - before[0]) / before[0] * 100
+        stats[f"min_{days}d"], stats[f"max_{days}d"], stats[f"avg_{days}d"] = low, high, average
+        stats[f"change_{days}d_pct"] = change
+
+
+def _write_stats(conn, rows):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO price_stats ({', '.join(STAT_COLUMNS)}) VALUES ({', '.join('?' * len(STAT_COLUMNS))})",
+        [[row[column] for column in STAT_COLUMNS] for row in rows],
+    )
+
+
+def update_stats(conn, records):
+    """
+    Folds a batch of scraped records (timestamp, product_name, price, availability,
+    url, ...) into the rollups and the per-product summary. Runs inside the
+    store's insert transaction; each touched product costs a handful of indexed
+    lookups, independent of its history length.
+    """
+    touched = {}
+    rollups = []
+    for record in records:
+        timestamp, product_name, price, availability, url = record[:5]
+        stats = touched.get(url)
+        if stats is None:
+            row = conn.execute(f"SELECT {', '.join(STAT_COLUMNS)} FROM price_stats WHERE url = ?", (url,)).fetchone()
+            stats = dict(zip(STAT_COLUMNS, row)) if row else {
+                **dict.fromkeys(STAT_COLUMNS), "url": url, "observations": 0,
+                "first_seen": timestamp, "last_seen": timestamp,
+            }
+            touched[url] = stats
+
+        stats["observations"] += 1
+        stats["first_seen"] = min(stats["first_seen"], timestamp)
+        if timestamp >= stats["last_seen"] or stats["product_name"] is None:
+            stats["last_seen"] = max(stats["last_seen"], timestamp)
+            stats["product_name"] = product_name
+            stats["availability"] = availability
+        if price is None:
+            continue
+
+        if stats["min_price"] is None or price < stats["min_price"]:
+            stats["min_price"], stats["min_price_at"] = price, timestamp
+        if stats["max_price"] is None or price > stats["max_price"]:
+            stats["max_price"], stats["max_price_at"] = price, timestamp
+        if stats["price_at"] is None or timestamp >= stats["price_at"]:
+            if stats["price"] is not None and price != stats["price"]:
+                stats["previous_price"], stats["last_change_at"] = stats["price"], timestamp
+            stats["price"], stats["price_at"] = price, timestamp
+        for resolution in ROLLUP_RESOLUTIONS:
+            rollups.append((url, resolution, bucket_key(timestamp, resolution),
+                            price, price, price, price, price, 1, timestamp, timestamp))
+
+    conn.executemany(_ROLLUP_UPSERT, rollups)
+    for stats in touched.values():
+        _refresh_windows(conn, stats)
+    _write_stats(conn, touched.values())
+
+
+def _bucket_starts(timestamps, resolution):
+    """Vectorized bucket_key: floors a datetime Series to its rollup bucket."""
+    import pandas as pd
+
+    if resolution == "1h":
+        return timestamps.dt.floor("h")
+    if resolution == "1d":
+        return timestamps.dt.floor("D")
+    if resolution == "1w":
+        days = timestamps.dt.floor("D")
+        return days - pd.to_timedelta(days.dt.weekday, unit="D")
+    raise ValueError(f"Unknown rollup resolution: {resolution}")
+
+
+def _bucket_labels(starts, resolution):
+    return starts.dt.strftime("%Y-%m-%dT%H" if resolution == "1h" else "%Y-%m-%d")
+
+
+def _bucket_step(resolution):
+    return {"1h": timedelta(hours=1), "1d": timedelta(days=1), "1w": timedelta(weeks=1)}[resolution]
+
+
+def _rollup_frame(history, resolution):
+    """
+    Vectorized OHLC rollups for one resolution. A run-length row covering several
+    buckets contributes its (constant) price to each of them, with its
+    observations shared out by the time spent in each bucket.
+    """
+    import numpy as np
+    import pandas as pd
+
+    starts = _bucket_starts(history["timestamp"], resolution)
+    ends = _bucket_starts(history["last_seen"], resolution)
+    step = pd.Timedelta(_bucket_step(resolution))
+    spans = ((ends - starts) // step).to_numpy(dtype=np.int64) + 1
+    step_ns = np.timedelta64(step.value, "ns")
+
+    # One piece per (row, bucket it covers)
+    rows = np.repeat(np.arange(len(history)), spans)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(spans) - spans, spans)
+    piece = history.iloc[rows].reset_index(drop=True)
+    piece_spans = spans[rows]
+    piece["bucket_start"] = starts.to_numpy()[rows] + offsets * step_ns
+    last_piece = offsets == piece_spans - 1
+    bucket_end = piece["bucket_start"] + step - pd.Timedelta(microseconds=1)
+    piece["first_at"] = piece["timestamp"].where(offsets == 0, piece["bucket_start"])
+    piece["last_at"] = piece["last_seen"].where(last_piece, bucket_end)
+
+    # Share a run's observations out in proportion to the time it spent in each
+    # bucket (exact for regular scrape intervals): the observations taken before
+    # the next bucket starts, minus those taken before this one started
+    observations = piece["observations"].to_numpy()
+    run_start = piece["timestamp"].to_numpy()
+    run_length = (piece["last_seen"].to_numpy() - run_start) / np.timedelta64(1, "ns")
+    elapsed = (piece["bucket_start"].to_numpy() + step_ns - run_start) / np.timedelta64(1, "ns")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        seen = np.ceil((observations - 1) * (elapsed / run_length) - 1e-6)
+    seen = np.where(last_piece, observations, np.clip(seen, 0, observations)).astype(np.int64)
+    piece["count"] = seen - np.where(offsets == 0, 0, np.roll(seen, 1))
+    piece["total"] = piece["price"] * piece["count"]
+
+    piece = piece.sort_values(["url", "bucket_start", "first_at"], kind="stable")
+    grouped = piece.groupby(["url", "bucket_start"], sort=False)
+    rollup = grouped.agg(
+        open=("price", "first"), close=("price", "last"), high=("price", "max"), low=("price", "min"),
+        total=("total", "sum"), count=("count", "sum"), first_at=("first_at", "min"), last_at=("last_at", "max"),
+    ).reset_index()
+    rollup["resolution"] = resolution
+    rollup["bucket"] = _bucket_labels(rollup["bucket_start"], resolution)
+    for column in ("first_at", "last_at"):
+        rollup[column] = rollup[column].map(lambda value: value.isoformat())
+    return rollup
+
+
+def recompute(store):
+    """
+    Rebuilds the rollups and the per-product summary from the full history
+    with vectorized pandas operations (repair after a bug, or after importing
+    history without maintaining stats). Returns the number of products summarised.
+    """
+    import pandas as pd
+
+    with closing(store.connect()) as conn:
+        history = pd.read_sql_query(
+            "SELECT url, product_name, timestamp, COALESCE(last_seen, timestamp) AS last_seen, "
+            "COALESCE(observations, 1) AS observations, price, availability FROM prices ORDER BY url, timestamp, id",
+            conn,
+        )
+    raw_timestamps = history["timestamp"]
+    raw_last_seen = history["last_seen"]
+    history["timestamp"] = pd.to_datetime(raw_timestamps, format="ISO8601")
+    history["last_seen"] = pd.to_datetime(raw_last_seen, format="ISO8601")
+
+    by_url = history.groupby("url", sort=False)
+    summary = pd.DataFrame({
+        "product_name": by_url["product_name"].last(),
+        "availability": by_url["availability"].last(),
+        "observations": by_url["observations"].sum(),
+        "first_seen": raw_timestamps.groupby(history["url"], sort=False).min(),
+        "last_seen": raw_last_seen.groupby(history["url"], sort=False).max(),
+    })
+
+    priced_mask = history["price"].notna()
+    priced = history[priced_mask].assign(raw_timestamp=raw_timestamps[priced_mask], raw_last_seen=raw_last_seen[priced_mask])
+    by_priced_url = priced.groupby("url", sort=False)
+    lowest = priced.loc[by_priced_url["price"].idxmin()].set_index("url")
+    highest = priced.loc[by_priced_url["price"].idxmax()].set_index("url")
+    latest = by_priced_url.tail(1).set_index("url")
+    previous = by_priced_url["price"].shift()
+    changes = priced[previous.notna() & (priced["price"] != previous)].assign(previous_price=previous)
+    last_change = changes.groupby("url", sort=False).tail(1).set_index("url")
+    summary["price"] = latest["price"]
+    summary["price_at"] = latest["raw_last_seen"]
+    summary["min_price"], summary["min_price_at"] = lowest["price"], lowest["raw_timestamp"]
+    summary["max_price"], summary["max_price_at"] = highest["price"], highest["raw_timestamp"]
+    summary["previous_price"], summary["last_change_at"] = last_change["previous_price"], last_change["raw_timestamp"]
+
+    rollups = pd.concat([_rollup_frame(priced, resolution) for resolution in ROLLUP_RESOLUTIONS], ignore_index=True)
+    rollup_columns = ["url", "resolution", "bucket", "open", "high", "low", "close", "total", "count", "first_at", "last_at"]
+    summary = summary.reset_index().astype(object)
+    summary = summary.where(summary.notna(), None)
+
+    with closing(store.connect()) as conn:
+        with conn:
+            conn.execute("DELETE FROM price_rollups")
+            conn.execute("DELETE FROM price_stats")
+            conn.executemany(
+                _ROLLUP_UPSERT,
+                rollups[rollup_columns].astype(object).itertuples(index=False, name=None),
+            )
+            rows = []
+            for row in summary.to_dict("records"):
+                stats = {**dict.fromkeys(STAT_COLUMNS), **row}
+                _refresh_windows(conn, stats)
+                rows.append(stats)
+            _write_stats(conn, rows)
+    print(f"Recomputed stats for {len(summary)} products ({len(rollups)} rollup buckets)")
+    return len(summary)
+
+
+def _rollup_filter(url, resolution, start=None, end=None):
+    """WHERE clause and parameters selecting a product's buckets that overlap [start, end]."""
+    clauses, params = ["url = ?", "resolution = ?"], [url, resolution]
+    if start is not None:
+        clauses.append("bucket >= ?")
+        params.append(bucket_key(start, resolution))
+    if end is not None:
+        clauses.append("bucket <= ?")
+        params.append(bucket_key(end, resolution))
+    return " AND ".join(clauses), params
+
+
+def count_buckets(conn, url, start=None, end=None):
+    """Returns {resolution: number of rollup buckets} for a product, optionally within [start, end]."""
+    counts = {}
+    for resolution in ROLLUP_RESOLUTIONS:
+        where, params = _rollup_filter(url, resolution, start, end)
+        counts[resolution] = conn.execute(f"SELECT COUNT(*) FROM price_rollups WHERE {where}", params).fetchone()[0]
+    return counts
+
+
+def read_rollups(conn, url, resolution, start=None, end=None):
+    """Returns a product's OHLC buckets (dicts with bucket, open, high, low, close, average, count), oldest first."""
+    where, params = _rollup_filter(url, resolution, start, end)
+    cursor = conn.execute(
+        "SELECT bucket, open, high, low, close, total / count AS average, count, first_at, last_at "
+        f"FROM price_rollups WHERE {where} ORDER BY bucket",
+        params,
+    )
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def read_stats(conn, url=None):
+    """Returns the summary rows (dicts), one per product, or the row of a single url (None if unknown)."""
+    if url is not None:
+        row = conn.execute(f"SELECT {', '.join(STAT_COLUMNS)} FROM price_stats WHERE url = ?", (url,)).fetchone()
+        return dict(zip(STAT_COLUMNS, row)) if row else None
+    return [dict(zip(STAT_COLUMNS, row))
+            for row in conn.execute(f"SELECT {', '.join(STAT_COLUMNS)} FROM price_stats ORDER BY product_name")]
+
+
+if __name__ == "__main__":
+    # python scraper/stats.py -> rebuild the rollups and summary stats from the full history
+    from scraper.store import open_store
+
+    recompute(open_store())
@@ -0,0 +1,499 @@
+import os
+import sys
+import csv
+import sqlite3
+import threading
+from contextlib import closing
+
+# Project root (one level up from 'scraper'), so every entry point resolves the same files
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+# Make the project root importable when this file is run as a script
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper import stats as stats_module
+
+# Data directory (override with PRICE_TRACKER_DATA_DIR, e.g. for benchmarks)
+DATA_DIR = os.environ.get("PRICE_TRACKER_DATA_DIR", os.path.join(PROJECT_ROOT, "data"))
+# SQLite database holding the price history
+STORE_FILE = os.path.join(DATA_DIR, "prices.db")
+# Legacy CSV history, migrated into the store the first time it is opened
+LEGACY_CSV_FILE = os.path.join(DATA_DIR, "prices.csv")
+# Change-only mode: a scrape identical to the product's previous one extends that
+# row (last_seen, observations) instead of appending a new row
+CHANGE_ONLY = os.environ.get("PRICE_TRACKER_CHANGE_ONLY", "1") == "1"
+
+COLUMNS = ["timestamp", "product_name", "price", "availability", "url"]
+# History rows also carry their run length (the last time the same observation was
+# seen and how many consecutive scrapes returned it) and the extraction tier that
+# produced them (json_ld, meta, bestbuy_json, dom; empty for older rows)
+HISTORY_COLUMNS = COLUMNS + ["last_seen", "observations", "source"]
+_HISTORY_SELECT = (
+    "timestamp, product_name, price, availability, url, "
+    "COALESCE(last_seen, timestamp) AS last_seen, COALESCE(observations, 1) AS observations, source"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    price REAL,
+    availability TEXT,
+    url TEXT NOT NULL,
+    last_seen TEXT,
+    observations INTEGER NOT NULL DEFAULT 1,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_prices_url_timestamp ON prices (url, timestamp);
+CREATE INDEX IF NOT EXISTS idx_prices_name_timestamp ON prices (product_name, timestamp);
+CREATE TABLE IF NOT EXISTS latest_prices (
+    url TEXT PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    price REAL,
+    availability TEXT
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _clean_price(value):
+    """Converts a price from a scrape or CSV row into a float or None."""
+    if value is None or value == "":
+        return None
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if price != price else price  # NaN -> None
+
+
+def _upgrade_schema(conn):
+    """Adds columns introduced after a prices table was created (run lengths, extraction source)."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(prices)")}
+    if "last_seen" not in existing:
+        conn.execute("ALTER TABLE prices ADD COLUMN last_seen TEXT")
+    if "observations" not in existing:
+        conn.execute("ALTER TABLE prices ADD COLUMN observations INTEGER NOT NULL DEFAULT 1")
+    if "source" not in existing:
+        conn.execute("ALTER TABLE prices ADD COLUMN source TEXT")
+
+
+def expand_steps(rows, start=None):
+    """
+    Expands run-length compressed history rows into a step series: every row
+    whose observation was seen more than once also yields a point at its
+    last_seen time, so plots stay flat until the next change. Rows without
+    last_seen (plain appends) pass through unchanged. Runs that began before
+    `start` are clipped to it.
+    """
+    expanded = []
+    for row in rows:
+        if start is not None and row["timestamp"] < start:
+            row = {**row, "timestamp": start}
+        expanded.append(row)
+        last_seen = row.get("last_seen")
+        if last_seen and last_seen != row["timestamp"]:
+            expanded.append({**row, "timestamp": last_seen})
+    return expanded
+
+
+def _range_filters(url=None, product_name=None, start=None, end=None):
+    """WHERE clause and parameters selecting one product's runs that overlap [start, end]."""
+    clauses, params = [], []
+    if url is not None:
+        clauses.append("url = ?")
+        params.append(url)
+    if product_name is not None:
+        clauses.append("product_name = ?")
+        params.append(product_name)
+    if start is not None:
+        clauses.append("COALESCE(last_seen, timestamp) >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp <= ?")
+        params.append(end)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+class PriceStore:
+    """
+    Append-only price history backed by SQLite.
+    Rows are inserted in batches; the latest row per product is kept in a
+    small side table so "latest prices" doesn't scan the history.
+    WAL mode lets the scraper write while the plotter and dashboard read.
+    """
+
+    def __init__(self, path=None, change_only=None, maintain_stats=True):
+        self.path = path or STORE_FILE
+        self.change_only = CHANGE_ONLY if change_only is None else change_only
+        # Keep the per-product summary and rollups current on every insert (see scraper/stats.py);
+        # bulk loads can turn this off and call recompute_stats() once at the end
+        self.maintain_stats = maintain_stats
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        Registers callback(rows) to be called after every committed insert_batch
+        in this process (change notification for in-process caches).
+        Registering the same callback again has no effect.
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def version(self):
+        """
+        Returns a cheap token that changes whenever any process writes to the store
+        (mtimes and sizes of the database and its WAL file). Compare tokens to
+        detect changes without querying the database.
+        """
+        token = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                stat = os.stat(path)
+                token.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                token.append(None)
+        return tuple(token)
+
+    def connect(self):
+        """Opens a new connection (one per operation keeps the store thread-safe)."""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(SCHEMA)
+                        conn.executescript(stats_module.SCHEMA)
+                        _upgrade_schema(conn)
+                    self._initialized = True
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def insert_batch(self, rows):
+        """
+        Records scraped rows (dicts with timestamp, product_name, price,
+        availability, url and optionally source, the extraction tier) in a
+        single transaction. Returns the number of rows passed in.
+        In change-only mode, rows that repeat the product's previous observation
+        extend it (last_seen, observations) instead of being appended.
+        """
+        rows = list(rows)
+        records = [
+            (row["timestamp"], row["product_name"], _clean_price(row.get("price")), row.get("availability"), row["url"])
+            for row in rows
+        ]
+        if not records:
+            return 0
+        # History rows: the record plus last_seen (= timestamp for a new run) and source
+        history = [record + (record[0], row.get("source")) for record, row in zip(records, rows)]
+        with closing(self.connect()) as conn:
+            with conn:
+                if self.change_only:
+                    self._record_changes(conn, history)
+                else:
+                    conn.executemany(
+                        "INSERT INTO prices (timestamp, product_name, price, availability, url, last_seen, source) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        history,
+                    )
+                if self.maintain_stats:
+                    stats_module.update_stats(conn, records)
+                conn.executemany(
+                    """
+                    INSERT INTO latest_prices (timestamp, product_name, price, availability, url)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        timestamp = excluded.timestamp,
+                        product_name = excluded.product_name,
+                        price = excluded.price,
+                        availability = excluded.availability
+                    WHERE excluded.timestamp >= latest_prices.timestamp
+                    """,
+                    records,
+                )
+        for callback in list(self._listeners):
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"Error in price store listener {callback}: {e}")
+        return len(records)
+
+    @staticmethod
+    def _record_changes(conn, records):
+        """
+        Change-only write: extends the product's newest row when the observation
+        is unchanged, appends a row otherwise. Runs inside insert_batch's transaction.
+        """
+        # Take the write lock before reading, so concurrent writers can't both extend the same run
+        conn.execute("BEGIN IMMEDIATE")
+        for record in records:
+            timestamp, product_name, price, availability, url, _, _ = record
+            previous = conn.execute(
+                "SELECT id, product_name, price, availability, COALESCE(last_seen, timestamp) AS last_seen "
+                "FROM prices WHERE url = ? ORDER BY timestamp DESC, id DESC LIMIT 1",
+                (url,),
+            ).fetchone()
+            if (
+                previous is not None
+                and (previous["product_name"], previous["price"], previous["availability"]) == (product_name, price, availability)
+                and timestamp >= previous["last_seen"]
+            ):
+                conn.execute(
+                    "UPDATE prices SET last_seen = ?, observations = observations + 1 WHERE id = ?",
+                    (timestamp, previous["id"]),
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO prices (timestamp, product_name, price, availability, url, last_seen, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    record,
+                )
+
+    def latest_per_product(self, require_price=False):
+        """
+        Returns the most recent row for every product, as a list of dicts.
+        With require_price=True, products whose latest scrape has no price fall
+        back to their most recent row that does (products that never had one are left out).
+        """
+        with closing(self.connect()) as conn:
+            rows = [dict(row) for row in conn.execute(f"SELECT {', '.join(COLUMNS)} FROM latest_prices ORDER BY product_name")]
+            if not require_price:
+                return rows
+            latest = []
+            for row in rows:
+                if row["price"] is None:
+                    fallback = conn.execute(
+                        f"SELECT {', '.join(COLUMNS)} FROM prices WHERE url = ? AND price IS NOT NULL "
+                        "ORDER BY timestamp DESC LIMIT 1",
+                        (row["url"],),
+                    ).fetchone()
+                    if fallback is None:
+                        continue
+                    # The price comes from the older row, the name from the latest one
+                    row = {**dict(fallback), "product_name": row["product_name"]}
+                latest.append(row)
+            return latest
+
+    def get_range(self, url=None, product_name=None, start=None, end=None, limit=None, offset=0):
+        """
+        Returns the history of one product (by url or product_name) between the
+        ISO timestamps start and end (inclusive, either may be None), oldest first.
+        With neither url nor product_name, returns the whole history.
+        limit/offset page through the result. Rows are run-length compressed
+        (see HISTORY_COLUMNS); a run that started before `start` but was still
+        seen after it is included. Use expand_steps() for a plottable series.
+        """
+        where, params = _range_filters(url, product_name, start, end)
+        page = ""
+        if limit is not None:
+            page = " LIMIT ? OFFSET ?"
+            params.extend([int(limit), int(offset)])
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(f"SELECT {_HISTORY_SELECT} FROM prices {where} ORDER BY timestamp, id{page}", params)
+            return [dict(row) for row in cursor]
+
+    def read_series(self, url=None, product_name=None, start=None, end=None):
+        """
+        Same filters as get_range, but returns a compact SeriesSet (see
+        scraper/series.py): interned products and availability, per-product NumPy
+        columns, O(1) lookup by url or name. Built in a single pass over the rows.
+        """
+        from scraper.series import build_series
+
+        where, params = _range_filters(url, product_name, start, end)
+        with closing(self.connect()) as conn:
+            conn.row_factory = None
+            # No ORDER BY: build_series orders the rows per product, which is
+            # cheaper than SQLite sorting the whole history
+            cursor = conn.execute(
+                "SELECT url, product_name, timestamp, COALESCE(last_seen, timestamp), price, availability, "
+                f"COALESCE(observations, 1) FROM prices {where}",
+                params,
+            )
+            return build_series(cursor)
+
+    def read_frame(self, expand=True, **filters):
+        """
+        Same as get_range, but returns a pandas DataFrame with parsed timestamps.
+        With expand=True (the default), compressed runs are expanded into a step series.
+        """
+        import pandas as pd
+
+        rows = self.get_range(**filters)
+        if expand:
+            rows = expand_steps(rows, start=filters.get("start"))
+        df = pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        df["price"] = pd.to_numeric(df["price"], errors='coerce')
+        df["last_seen"] = pd.to_datetime(df["last_seen"])
+        return df
+
+    def compact(self):
+        """
+        Run-length compresses history written before change-only mode: consecutive
+        identical observations of a product are merged into their first row.
+        Returns the number of rows removed.
+        """
+        updates, deletes = [], []
+        with closing(self.connect()) as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                run = None
+                cursor = conn.execute(
+                    "SELECT id, url, product_name, price, availability, "
+                    "COALESCE(last_seen, timestamp) AS last_seen, COALESCE(observations, 1) AS observations "
+                    "FROM prices ORDER BY url, timestamp, id"
+                )
+                for row in cursor:
+                    observation = (row["url"], row["product_name"], row["price"], row["availability"])
+                    if run is not None and observation == run["observation"]:
+                        run["last_seen"] = max(run["last_seen"], row["last_seen"])
+                        run["observations"] += row["observations"]
+                        run["merged"] = True
+                        deletes.append((row["id"],))
+                        continue
+                    if run is not None and run["merged"]:
+                        updates.append((run["last_seen"], run["observations"], run["id"]))
+                    run = {"id": row["id"], "observation": observation, "last_seen": row["last_seen"],
+                           "observations": row["observations"], "merged": False}
+                if run is not None and run["merged"]:
+                    updates.append((run["last_seen"], run["observations"], run["id"]))
+                conn.executemany("UPDATE prices SET last_seen = ?, observations = ? WHERE id = ?", updates)
+                conn.executemany("DELETE FROM prices WHERE id = ?", deletes)
+        print(f"Compacted {self.path}: merged {len(deletes)} repeated observations into {len(updates)} rows")
+        return len(deletes)
+
+    def summary_stats(self, url=None):
+        """
+        Returns the maintained per-product summary (all-time min/max, last change,
+        rolling windows, observation count): a list of dicts, or one dict for a url.
+        """
+        with closing(self.connect()) as conn:
+            return stats_module.read_stats(conn, url)
+
+    def recompute_stats(self):
+        """Rebuilds the summary and rollups from the full history (vectorized; for repair)."""
+        return stats_module.recompute(self)
+
+    def ensure_stats(self):
+        """
+        Builds the summary stats once for a store whose history predates them,
+        or whose rollups lack a resolution added since.
+        """
+        with closing(self.connect()) as conn:
+            missing = conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM prices) AND NOT EXISTS (SELECT 1 FROM price_stats)"
+            ).fetchone()[0]
+            if not missing and conn.execute("SELECT EXISTS (SELECT 1 FROM prices WHERE price IS NOT NULL)").fetchone()[0]:
+                missing = any(
+                    not conn.execute("SELECT EXISTS (SELECT 1 FROM price_rollups WHERE resolution = ?)", (resolution,)).fetchone()[0]
+                    for resolution in stats_module.ROLLUP_RESOLUTIONS
+                )
+        if missing:
+            self.recompute_stats()
+
+    def read_rollups(self, url, resolution, start=None, end=None):
+        """Returns a product's OHLC buckets at one resolution ("1h", "1d", "1w"), optionally within [start, end]."""
+        with closing(self.connect()) as conn:
+            return stats_module.read_rollups(conn, url, resolution, start=start, end=end)
+
+    def chart_resolution(self, url, width, start=None, end=None):
+        """
+        The coarsest rollup resolution that still fills `width` pixels for a
+        product's history within [start, end], or None to draw the raw rows.
+        """
+        with closing(self.connect()) as conn:
+            return stats_module.choose_resolution(stats_module.count_buckets(conn, url, start=start, end=end), width)
+
+    def source_counts(self, start=None):
+        """
+        Returns {extraction source: number of scrapes} (runs started since `start`
+        if given), counting every observation of a run, for tier hit rates.
+        """
+        where, params = ("WHERE timestamp >= ?", [start]) if start else ("", [])
+        with closing(self.connect()) as conn:
+            return dict(conn.execute(
+                f"SELECT COALESCE(source, 'unknown'), SUM(COALESCE(observations, 1)) FROM prices {where} GROUP BY 1 ORDER BY 2 DESC", params
+            ).fetchall())
+
+    def export_csv(self, csv_path):
+        """Writes the full history to a CSV file (the legacy prices.csv columns plus the run-length columns)."""
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=HISTORY_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.get_range())
+
+    def migrate_csv(self, csv_path=None, batch_size=10000):
+        """
+        One-shot import of the legacy CSV history. Records completion in the
+        store so later calls are no-ops. Returns the number of rows imported.
+        """
+        with closing(self.connect()) as conn:
+            done = conn.execute("SELECT value FROM store_meta WHERE key = 'csv_migrated'").fetchone()
+        if done or not os.path.exists(csv_path):
+            return 0
+
+        imported = 0
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            batch = []
+            for row in csv.DictReader(f):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    imported += self.insert_batch(batch)
+                    batch = []
+            imported += self.insert_batch(batch)
+
+        with closing(self.connect()) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('csv_migrated', ?)", (csv_path,)
+                )
+        print(f"Migrated {imported} rows from {csv_path} into {self.path}")
+        return imported
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path=None, legacy_csv=None):
+    """
+    Returns the shared PriceStore for a database file (STORE_FILE by default),
+    importing the legacy CSV history (and summarising history that predates the stats)
+    the first time the store is opened in this process.
+    """
+    path = path or STORE_FILE
+    legacy_csv = legacy_csv or LEGACY_CSV_FILE
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = PriceStore(path)
+            store.migrate_csv(legacy_csv)
+            store.ensure_stats()
+            _stores[path] = store
+        return store
+
+
+if __name__ == "__main__":
+    # python scraper/store.py [csv_path] -> run the legacy CSV migration explicitly
+    # python scraper/store.py compact    -> run-length compress existing history
+    # python scraper/store.py stats      -> rebuild the summary stats and rollups
+    if sys.argv[1:] == ["compact"]:
+        open_store().compact()
+    elif sys.argv[1:] == ["stats"]:
+        open_store().recompute_stats()
+    else:
+        open_store(legacy_csv=sys.argv[1] if len(sys.argv) > 1 else None)
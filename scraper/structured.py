@@ -0,0 +1,202 @@
+import re
+import json
+import html
+
+# Extraction tiers recorded with every row (the `source` column of the price store)
+SOURCE_JSON_LD = "json_ld"
+SOURCE_META = "meta"
+
+_LD_JSON_MARKER = "application/ld+json"
+_META_TAG_RE = re.compile(r"<meta\s[^>]*>", re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_PRICE_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+# schema.org ItemAvailability values (and the short forms used in meta tags),
+# mapped onto the wording the DOM parsers produce
+AVAILABILITY_LABELS = {
+    "instock": "In Stock",
+    "in stock": "In Stock",
+    "onlineonly": "In Stock",
+    "limitedavailability": "In Stock (Limited)",
+    "instoreonly": "In Store Only",
+    "outofstock": "Out of Stock",
+    "out of stock": "Out of Stock",
+    "oos": "Out of Stock",
+    "soldout": "Out of Stock",
+    "discontinued": "Discontinued",
+    "preorder": "Pre-Order",
+    "presale": "Pre-Order",
+    "backorder": "Backorder",
+}
+
+# Per-site overrides, so a product reads the same whichever tier parsed it
+# (the BestBuy wording is that of scraper._bestbuy_availability)
+_BESTBUY_IN_STOCK = "In Stock (Pickup) and Available for Shipping"
+_BESTBUY_OUT_OF_STOCK = "Out of Stock or Check Store/Shipping"
+SITE_AVAILABILITY_LABELS = {
+    "amazon": {
+        "outofstock": "Currently unavailable.",
+        "out of stock": "Currently unavailable.",
+        "oos": "Currently unavailable.",
+        "soldout": "Currently unavailable.",
+    },
+    "bestbuy": {
+        "instock": _BESTBUY_IN_STOCK,
+        "in stock": _BESTBUY_IN_STOCK,
+        "limitedavailability": _BESTBUY_IN_STOCK,
+        "onlineonly": "Available for Shipping",
+        "instoreonly": "In Stock (Pickup)",
+        "outofstock": _BESTBUY_OUT_OF_STOCK,
+        "out of stock": _BESTBUY_OUT_OF_STOCK,
+        "oos": _BESTBUY_OUT_OF_STOCK,
+        "soldout": _BESTBUY_OUT_OF_STOCK,
+        "discontinued": _BESTBUY_OUT_OF_STOCK,
+        "preorder": _BESTBUY_OUT_OF_STOCK,
+        "presale": _BESTBUY_OUT_OF_STOCK,
+        "backorder": _BESTBUY_OUT_OF_STOCK,
+    },
+}
+
+# Offers in this condition win over others of the same product (e.g. used or refurbished)
+_NEW_CONDITION = "newcondition"
+
+# Meta tag names/properties that carry the product fields, in order of preference
+_META_TITLE = ("og:title", "twitter:title")
+_META_PRICE = ("product:price:amount", "og:price:amount", "product:sale_price:amount")
+_META_AVAILABILITY = ("product:availability", "og:availability")
+
+
+def _to_price(value):
+    """Parses a structured-data price ("1,299.00", 749.99, "$19") into a float, or None."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _PRICE_RE.search(value)
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _schema_key(value):
+    """"https://schema.org/InStock" -> "instock" (None for anything but a non-empty string)."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip().rstrip("/").rsplit("/", 1)[-1].lower()
+
+
+def _to_availability(value, site=None):
+    key = _schema_key(value)
+    if key is None:
+        return None
+    label = SITE_AVAILABILITY_LABELS.get(site, {}).get(key)
+    return label or AVAILABILITY_LABELS.get(key, value.strip())
+
+
+def _iter_json_ld(html_content):
+    """Yields the decoded JSON-LD blocks of a page, found by string search rather than a DOM."""
+    start = html_content.find(_LD_JSON_MARKER)
+    while start != -1:
+        body_start = html_content.find(">", start)
+        body_end = html_content.find("</script>", body_start)
+        if body_start == -1 or body_end == -1:
+            return
+        try:
+            yield json.loads(html_content[body_start + 1:body_end])
+        except ValueError:
+            pass
+        start = html_content.find(_LD_JSON_MARKER, body_end)
+
+
+def _iter_products(node):
+    """Walks a JSON-LD value (object, list or @graph) and yields its Product objects."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_products(item)
+    elif isinstance(node, dict):
+        types = node.get("@type")
+        types = types if isinstance(types, list) else [types]
+        if "Product" in types or "ProductGroup" in types:
+            yield node
+        if "@graph" in node:
+            yield from _iter_products(node["@graph"])
+
+
+def _offer_fields(offers, site=None, condition=None):
+    """
+    Returns (price, availability) from a Product's offers (Offer, AggregateOffer
+    or a list of them): the first priced NewCondition offer, else the first priced
+    offer without a condition, else the first priced one. `condition` is the
+    Product's own itemCondition, which offers inherit.
+    """
+    best, best_rank = (None, None), None
+    for offer in offers if isinstance(offers, list) else [offers]:
+        if not isinstance(offer, dict):
+            continue
+        price = _to_price(offer.get("price"))
+        if price is None:
+            price = _to_price(offer.get("lowPrice"))
+        if price is None and isinstance(offer.get("priceSpecification"), dict):
+            price = _to_price(offer["priceSpecification"].get("price"))
+        if price is None:
+            continue
+        offer_condition = _schema_key(offer.get("itemCondition")) or _schema_key(condition)
+        rank = 0 if offer_condition == _NEW_CONDITION else 1 if offer_condition is None else 2
+        if best_rank is None or rank < best_rank:
+            best, best_rank = (price, _to_availability(offer.get("availability"), site)), rank
+            if rank == 0:
+                break
+    return best
+
+
+def extract_json_ld(html_content, site=None):
+    """Returns (title, price, availability) from the first JSON-LD Product with a priced offer, or None."""
+    for block in _iter_json_ld(html_content):
+        for product in _iter_products(block):
+            price, availability = _offer_fields(product.get("offers"), site, product.get("itemCondition"))
+            if price is not None:
+                title = product.get("name")
+                return (
+                    html.unescape(title).strip() if isinstance(title, str) else "N/A",
+                    price,
+                    availability or "N/A",
+                )
+    return None
+
+
+def extract_meta(html_content, site=None):
+    """Returns (title, price, availability) from og:/product: meta tags in the page head, or None."""
+    head_end = html_content.find("</head>")
+    head = html_content if head_end == -1 else html_content[:head_end]
+    values = {}
+    for tag in _META_TAG_RE.finditer(head):
+        attributes = {name.lower(): double or single for name, double, single in _ATTRIBUTE_RE.findall(tag.group(0))}
+        key = (attributes.get("property") or attributes.get("name") or "").lower()
+        if key and "content" in attributes:
+            values.setdefault(key, html.unescape(attributes["content"]))
+
+    price = next((p for p in (_to_price(values.get(key)) for key in _META_PRICE) if p is not None), None)
+    if price is None:
+        return None
+    title = next((values[key].strip() for key in _META_TITLE if values.get(key)), "N/A")
+    availability = next((_to_availability(values[key], site) for key in _META_AVAILABILITY if values.get(key)), None)
+    return title, price, availability or "N/A"
+
+
+def extract_structured(html_content, site=None):
+    """
+    Structured-data tier: tries JSON-LD, then og:/product: meta tags, using
+    string scans only (no DOM). Returns (title, price, availability, source)
+    or None when the page carries no priced structured data. Availability is
+    worded like `site`'s DOM parser would word it.
+    """
+    result = extract_json_ld(html_content, site)
+    if result:
+        return (*result, SOURCE_JSON_LD)
+    result = extract_meta(html_content, site)
+    if result:
+        return (*result, SOURCE_META)
+    return None
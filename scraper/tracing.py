@@ -0,0 +1,228 @@
+"""
+Debug tracing for the scrape and dashboard hot paths, off by default.
+
+trace() takes a %-style message and its arguments, like logging: while tracing
+is off it returns before the message is formatted, so a trace call costs one
+flag check. When it is on, each trace is formatted once and kept in a bounded
+in-memory ring buffer per product (the last TRACE_BUFFER traces of the product
+being scraped, see product()), optionally echoed to stdout.
+
+Every process keeps its own buffers; save() writes a snapshot to TRACE_DIR
+(throttled, and again at exit) so the dashboard's /traces page can show the
+scraper's traces next to its own.
+
+Enable with PRICE_TRACKER_TRACE=1 (buffer only) or PRICE_TRACKER_TRACE=stdout
+(buffer and print), or call enable().
+"""
+import os
+import sys
+import json
+import glob
+import time
+import atexit
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from scraper.store import DATA_DIR
+
+TRACE_MODE = os.environ.get("PRICE_TRACKER_TRACE", "")
+# Read as tracing.ENABLED at call time, so enable()/disable() take effect everywhere
+ENABLED = TRACE_MODE in ("1", "stdout")
+ECHO = TRACE_MODE == "stdout"
+
+# Traces kept per product, and products with a buffer (the least recently traced is dropped first)
+TRACE_BUFFER = 200
+TRACE_PRODUCTS = 1000
+# Longer messages (e.g. reprs of decoded JSON) are cut to this many characters
+TRACE_MAX_CHARS = 2000
+# Snapshots of each process's buffers, for the dashboard; written at most every
+# TRACE_SAVE_SECONDS, and ignored once older than TRACE_FILE_MAX_AGE
+TRACE_DIR = os.path.join(DATA_DIR, "traces")
+TRACE_SAVE_SECONDS = 5.0
+TRACE_FILE_MAX_AGE = 24 * 3600
+
+# Buffer key of traces made outside a product context (e.g. dashboard requests)
+NO_PRODUCT = ""
+
+# Names this process's snapshot and its traces on the dashboard ("scraper", "main", "app", ...)
+PROCESS_NAME = os.path.splitext(os.path.basename(sys.argv[0] or ""))[0].lstrip("-") or "python"
+
+_current_product = contextvars.ContextVar("trace_product", default=None)
+
+
+class TraceBuffer:
+    """Per-product ring buffers of (unix time, message), bounded in both dimensions."""
+
+    def __init__(self, per_product=TRACE_BUFFER, max_products=TRACE_PRODUCTS):
+        self.per_product = per_product
+        self.max_products = max_products
+        self._products = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def record(self, key, name, message):
+        with self._lock:
+            entry = self._products.get(key)
+            if entry is None:
+                entry = self._products[key] = {"name": name, "entries": deque(maxlen=self.per_product)}
+                if len(self._products) > self.max_products:
+                    self._products.popitem(last=False)
+            else:
+                self._products.move_to_end(key)
+                if name:
+                    entry["name"] = name
+            entry["entries"].append((time.time(), message))
+            self.version += 1
+
+    def snapshot(self):
+        """{key: {"name": ..., "entries": [[time, message], ...]}}, oldest entries first."""
+        with self._lock:
+            return {
+                key: {"name": entry["name"], "entries": [list(item) for item in entry["entries"]]}
+                for key, entry in self._products.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._products.clear()
+            self.version += 1
+
+
+BUFFER = TraceBuffer()
+
+_save_lock = threading.Lock()
+_saved_version = 0
+_saved_at = 0.0
+_atexit_registered = False
+
+
+def enable(echo=False):
+    """Turns tracing on for this process (echo=True also prints every trace)."""
+    global ENABLED, ECHO, _atexit_registered
+    ENABLED, ECHO = True, echo
+    if not _atexit_registered:
+        _atexit_registered = True
+        atexit.register(save, force=True)
+
+
+def disable():
+    global ENABLED, ECHO
+    ENABLED = ECHO = False
+
+
+def trace(message, *args):
+    """
+    Records a trace for the current product. The message is only formatted
+    (message % args) when tracing is on, so pass values as arguments instead of
+    building f-strings, and cut long ones in the format (e.g. "%.200s").
+    """
+    if not ENABLED:
+        return
+    if args:
+        try:
+            message = message % args
+        except (TypeError, ValueError) as e:
+            message = f"{message} {args!r} (format error: {e})"
+    if len(message) > TRACE_MAX_CHARS:
+        message = message[:TRACE_MAX_CHARS] + "..."
+    key, name = _current_product.get() or (NO_PRODUCT, None)
+    BUFFER.record(key, name, message)
+    if ECHO:
+        print(f"TRACE [{name or key or PROCESS_NAME}] {message}")
+
+
+@contextmanager
+def product(url, name=None):
+    """Attributes the traces made inside the block (in this thread or task) to a product."""
+    token = _current_product.set((url, name))
+    try:
+        yield
+    finally:
+        _current_product.reset(token)
+
+
+def _save_path():
+    return os.path.join(TRACE_DIR, f"{PROCESS_NAME}-{os.getpid()}.json")
+
+
+def save(force=False):
+    """
+    Writes this process's buffers to TRACE_DIR for the dashboard, if tracing is
+    on and anything was traced since the last save. Without force, at most once
+    every TRACE_SAVE_SECONDS, so it can be called after every scrape.
+    """
+    global _saved_version, _saved_at
+    if not ENABLED or BUFFER.version == _saved_version:
+        return False
+    if not force and time.monotonic() - _saved_at < TRACE_SAVE_SECONDS:
+        return False
+    with _save_lock:
+        version = BUFFER.version
+        snapshot = {"process": PROCESS_NAME, "pid": os.getpid(), "products": BUFFER.snapshot()}
+        path = _save_path()
+        try:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Could not save traces to {path}: {e}")
+            return False
+        _saved_version, _saved_at = version, time.monotonic()
+    return True
+
+
+def _saved_snapshots():
+    """Snapshots saved by other processes within TRACE_FILE_MAX_AGE."""
+    own_path = _save_path()
+    now = time.time()
+    for path in glob.glob(os.path.join(TRACE_DIR, "*.json")):
+        if path == own_path:
+            continue
+        try:
+            if now - os.path.getmtime(path) > TRACE_FILE_MAX_AGE:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        yield snapshot.get("process", "?"), snapshot.get("products", {})
+
+
+def collect(url=None, limit=TRACE_BUFFER):
+    """
+    The traces of this process and those saved by others, merged per product
+    (or only `url`'s): a list of {"url", "name", "last", "entries"} with the most
+    recently traced product first and up to `limit` entries each, oldest first.
+    """
+    sources = [(PROCESS_NAME, BUFFER.snapshot())]
+    sources.extend(_saved_snapshots())
+    merged = {}
+    for process, products in sources:
+        for key, entry in products.items():
+            if url is not None and key != url:
+                continue
+            target = merged.setdefault(key, {"url": key, "name": None, "entries": []})
+            target["name"] = target["name"] or entry.get("name")
+            target["entries"].extend((when, process, message) for when, message in entry.get("entries", ()))
+
+    result = []
+    for target in merged.values():
+        entries = sorted(target["entries"], key=lambda item: item[0])[-limit:]
+        if not entries:
+            continue
+        target["entries"] = [
+            {"time": datetime.fromtimestamp(when).isoformat(timespec="milliseconds"), "process": process, "message": message}
+            for when, process, message in entries
+        ]
+        target["last"] = target["entries"][-1]["time"]
+        result.append(target)
+    result.sort(key=lambda target: target["last"], reverse=True)
+    return result
+
+
+if ENABLED:
+    enable(echo=ECHO)
@@ -0,0 +1,15 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# The scraper modules read their data paths at import time: point them at a
+# throwaway directory so tests never touch the project's data/
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="price_tracker_tests_")
+os.environ["PRICE_TRACKER_DATA_DIR"] = TEST_DATA_DIR
+atexit.register(shutil.rmtree, TEST_DATA_DIR, ignore_errors=True)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from scraper.alerts import AlertEngine, MemorySink, is_in_stock
+
+URL = "https://shop.example/p/1"
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def sink():
+    return MemorySink()
+
+
+def make_engine(tmp_path, sink, debounce=0):
+    return AlertEngine(str(tmp_path / "alerts.db"), sink=sink, debounce=debounce)
+
+
+def observe(engine, hour, price=None, availability="In Stock", url=URL):
+    """Evaluates one observation `hour` hours after START; returns the fired rule kinds."""
+    row = {
+        "timestamp": (START + timedelta(hours=hour)).isoformat(),
+        "product_name": "Product",
+        "price": price,
+        "availability": availability,
+        "url": url,
+    }
+    return [notification["kind"] for notification in engine.evaluate([row])]
+
+
+def test_below_rule_fires_on_crossings_only(tmp_path, sink):
+    engine = make_engine(tmp_path, sink)
+    engine.add_rules([{"url": URL, "kind": "below", "target": 100}])
+
+    assert observe(engine, 0, 120) == []
+    assert observe(engine, 1, 90) == ["below"]
+    assert observe(engine, 2, 80) == []
+    assert observe(engine, 3, 110) == []
+    assert observe(engine, 4, 100) == ["below"]
+    assert len(sink.notifications) == 2
+    assert sink.notifications[0]["previous_price"] == 120
+
+
+def test_new_rule_fires_if_its_condition_already_holds(tmp_path, sink):
+    engine = make_engine(tmp_path, sink)
+    engine.add_rules([{"url": URL, "kind": "below", "target": 200}])
+    assert observe(engine, 0, 150) == ["below"]
+    assert observe(engine, 1, 140) == []
+
+
+def test_only_the_crossed_targets_fire(tmp_path, sink):
+    engine = make_engine(tmp_path, sink)
+    engine.add_rules({"url": URL, "kind": "below", "target": target} for target in (50, 80, 100, 150))
+    observe(engine, 0, 200)
+
+    observe(engine, 1, 90)
+    assert sorted(notification["target"] for notification in sink.notifications) == [100, 150]
+
+
+def test_debounce_suppresses_repeated_firing(tmp_path, sink):
+    engine = make_engine(tmp_path, sink, debounce=6 * 3600)
+    engine.add_rules([{"url": URL, "kind": "below", "target": 100}])
+    observe(engine, 0, 120)
+
+    assert observe(engine, 1, 90) == ["below"]
+    observe(engine, 2, 120)
+    assert observe(engine, 3, 90) == []
+    observe(engine, 8, 120)
+    assert observe(engine, 9, 90) == ["below"]
+
+
+def test_in_stock_rule_fires_when_availability_turns_in_stock(tmp_path, sink):
+    engine = make_engine(tmp_path, sink)
+    engine.add_rules([{"url": URL, "kind": "in_stock"}])
+
+    assert observe(engine, 0, 100, "Currently unavailable.") == []
+    assert observe(engine, 1, 100, "In Stock") == ["in_stock"]
+    assert observe(engine, 2, 100, "Only 3 left in stock - order soon.") == []
+    # An observation without availability says nothing about stock
+    assert observe(engine, 3, 100, "N/A") == []
+    assert observe(engine, 4, 100, "Out of Stock or Check Store/Shipping") == []
+    assert observe(engine, 5, 100, "In Stock (Pickup) and Available for Shipping") == ["in_stock"]
+
+
+def test_duplicate_and_out_of_order_rows_are_ignored(tmp_path, sink):
+    engine = make_engine(tmp_path, sink)
+    engine.add_rules([{"url": URL, "kind": "below", "target": 100}])
+    observe(engine, 5, 120)
+
+    assert observe(engine, 5, 90) == []
+    assert observe(engine, 4, 90) == []
+    assert observe(engine, 6, 90) == ["below"]
+
+
+def test_invalid_rules_are_skipped(tmp_path, sink):
+    engine = make_engine(tmp_path, sink)
+    added = engine.add_rules([
+        {"url": URL, "kind": "below"},
+        {"url": "", "kind": "in_stock"},
+        {"url": URL, "kind": "sometime"},
+        {"url": URL, "kind": "below", "target": "99.99"},
+    ])
+    assert added == 1
+    assert engine.rules(URL)[0]["target"] == 99.99
+
+
+@pytest.mark.parametrize("availability, expected", [
+    ("In Stock", True),
+    ("Available for Shipping", True),
+    ("Only 2 left in stock.", True),
+    ("Currently unavailable.", False),
+    ("Out of Stock", False),
+    ("N/A", None),
+    (None, None),
+])
+def test_is_in_stock(availability, expected):
+    assert is_in_stock(availability) is expected
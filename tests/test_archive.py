@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from scraper.archive import PageArchive, replay
+from scraper.store import PriceStore
+
+PRODUCT = {"name": "Widget", "url": "https://www.amazon.com/dp/B000000001", "site": "amazon"}
+PRICED_PAGE = (
+    '<html><head><script type="application/ld+json">'
+    + json.dumps({"@type": "Product", "name": "Widget", "offers": {"price": 10, "availability": "https://schema.org/InStock"}})
+    + "</script></head><body></body></html>"
+)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return PageArchive(str(tmp_path / "archive"))
+
+
+def archive_fetch(archive, html, hour):
+    archive.record(PRODUCT, archive.put(html), f"2025-01-01T{hour:02d}:00:00")
+
+
+def test_replay_writes_one_row_per_fetch(archive, tmp_path):
+    archive_fetch(archive, PRICED_PAGE, 0)
+    archive_fetch(archive, PRICED_PAGE, 1)
+    output = str(tmp_path / "replay.db")
+
+    assert replay(archive, output) == 2
+    assert [row["price"] for row in PriceStore(output).get_range(url=PRODUCT["url"])] == [10.0]
+
+
+def test_replay_without_readable_pages_keeps_the_existing_output(archive, tmp_path):
+    output = str(tmp_path / "replay.db")
+    archive_fetch(archive, PRICED_PAGE, 0)
+    replay(archive, output)
+
+    # A fetch whose page body has gone missing from the archive yields no row
+    broken = PageArchive(str(tmp_path / "broken_archive"))
+    archive_fetch(broken, PRICED_PAGE, 1)
+    for blob in (tmp_path / "broken_archive").rglob("*.html.*"):
+        blob.unlink()
+    assert replay(broken, output, force=True) == 0
+    assert len(PriceStore(output).get_range()) == 1
+
+
+def test_replay_refuses_to_replace_an_output_without_force(archive, tmp_path):
+    output = tmp_path / "replay.db"
+    output.write_bytes(b"")
+    archive_fetch(archive, PRICED_PAGE, 0)
+    with pytest.raises(ValueError, match="already exists"):
+        replay(archive, str(output))
@@ -0,0 +1,105 @@
+import pytest
+
+from scraper import fetcher
+from scraper.fetcher import HostHealth, HostUnavailable
+
+
+class Clock:
+    """Stands in for time.monotonic, advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fetcher.time, "monotonic", clock)
+    return clock
+
+
+def make_health(**settings):
+    return HostHealth("shop.example", **{"cooldown": 60.0, "max_cooldown": 300.0, **settings})
+
+
+def test_consecutive_failures_open_the_circuit(clock):
+    health = make_health(consecutive_failures=3)
+    for _ in range(2):
+        health.before_request()
+        health.record_failure("HTTP 503")
+    assert health.state == HostHealth.CLOSED
+
+    health.before_request()
+    health.record_failure("HTTP 503")
+    assert health.state == HostHealth.OPEN
+    with pytest.raises(HostUnavailable) as excinfo:
+        health.before_request()
+    assert excinfo.value.retry_after == pytest.approx(60.0)
+
+
+def test_success_resets_consecutive_failures(clock):
+    health = make_health(consecutive_failures=3, min_requests=100)
+    for _ in range(5):
+        health.record_failure("timeout")
+        health.record_failure("timeout")
+        health.record_success()
+    assert health.state == HostHealth.CLOSED
+
+
+def test_error_rate_opens_the_circuit(clock):
+    health = make_health(consecutive_failures=100, min_requests=4, error_rate=0.5)
+    health.record_success()
+    health.record_failure("HTTP 500")
+    health.record_success()
+    assert health.state == HostHealth.CLOSED
+    health.record_failure("HTTP 500")
+    assert health.state == HostHealth.OPEN
+
+
+def test_block_page_trips_at_once_and_honours_retry_after(clock):
+    health = make_health()
+    health.record_failure("captcha", retry_after=120.0, blocked=True)
+    assert health.state == HostHealth.OPEN
+    assert health.snapshot()["retry_in"] == pytest.approx(120.0)
+
+
+def test_half_open_admits_one_probe_and_closes_on_success(clock):
+    health = make_health(consecutive_failures=1)
+    health.record_failure("HTTP 503")
+    clock.now += 61
+
+    health.before_request()
+    assert health.state == HostHealth.HALF_OPEN
+    with pytest.raises(HostUnavailable):
+        health.before_request()
+
+    health.record_success(latency=0.2)
+    assert health.state == HostHealth.CLOSED
+    health.before_request()
+
+
+def test_failed_probe_doubles_the_cooldown_up_to_the_maximum(clock):
+    health = make_health(consecutive_failures=1, cooldown=100.0, max_cooldown=300.0)
+    health.record_failure("HTTP 503")
+    for expected in (200.0, 300.0, 300.0):
+        clock.now += 1000
+        health.before_request()
+        health.record_failure("HTTP 503")
+        assert health.state == HostHealth.OPEN
+        assert health.snapshot()["retry_in"] == pytest.approx(expected)
+    assert health.trips == 4
+
+
+def test_release_probe_frees_the_half_open_slot(clock):
+    health = make_health(consecutive_failures=1)
+    health.record_failure("HTTP 503")
+    clock.now += 61
+    health.before_request()
+    health.release_probe()
+
+    health.before_request()
+    assert health.state == HostHealth.HALF_OPEN
+
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from visuals.downsample import downsample, lttb_indices, minmax_indices
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=np.float64), 100 + rng.normal(0, 5, n).cumsum()
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_short_series_are_kept_whole(method):
+    x, y = series(50)
+    assert list(downsample(x, y, 100, method=method)) == list(range(50))
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+@pytest.mark.parametrize("n, max_points", [(1000, 100), (1001, 37), (10_000, 500)])
+def test_indices_are_sorted_unique_and_bounded(method, n, max_points):
+    x, y = series(n)
+    indices = downsample(x, y, max_points, method=method)
+    assert len(indices) <= max_points
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] >= 0 and indices[-1] < n
+
+
+def test_lttb_keeps_the_end_points_and_returns_max_points():
+    x, y = series(1000)
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert (indices[0], indices[-1]) == (0, 999)
+
+
+def test_lttb_keeps_a_lone_spike():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.full(1000, 100.0)
+    y[437] = 20.0
+    assert 437 in lttb_indices(x, y, 50)
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    x, y = series(1000, seed=3)
+    indices = minmax_indices(y, 100)
+    assert int(np.argmin(y)) in indices
+    assert int(np.argmax(y)) in indices
+    for bucket in np.array_split(np.arange(1000), 50):
+        assert bucket[np.argmin(y[bucket])] in indices
+        assert bucket[np.argmax(y[bucket])] in indices
+
+
+def test_unknown_method_is_rejected():
+    x, y = series(10)
+    with pytest.raises(ValueError, match="unknown downsampling method"):
+        downsample(x, y, 5, method="average")
@@ -0,0 +1,63 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from scraper import scraper
+from scraper.http_cache import ResponseCache
+
+URL = "https://fetch-test.example/p/1"
+
+
+def response(status_code, text="", headers=None):
+    def raise_for_status():
+        if status_code >= 400:
+            raise scraper.requests.exceptions.HTTPError(f"HTTP {status_code}")
+    return SimpleNamespace(status_code=status_code, text=text, content=text.encode("utf-8"),
+                           headers=headers or {}, raise_for_status=raise_for_status)
+
+
+class FakeSession:
+    def __init__(self, responses, on_request=None):
+        self.responses = list(responses)
+        self.requests = []
+        self.on_request = on_request
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        if self.on_request:
+            self.on_request()
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "http_cache"))
+    cache.store(URL, response(200, "<html>old</html>", {"ETag": '"v1"'}))
+    monkeypatch.setattr(scraper, "RESPONSE_CACHE", cache)
+    monkeypatch.setattr(scraper.time, "sleep", lambda seconds: None)
+    return cache
+
+
+def use_session(monkeypatch, session):
+    monkeypatch.setattr(scraper, "SESSIONS", SimpleNamespace(get=lambda url: session))
+
+
+def test_not_modified_uses_the_cached_body(cache, monkeypatch):
+    session = FakeSession([response(304)])
+    use_session(monkeypatch, session)
+
+    assert scraper.fetch_page(URL) == {"content": "<html>old</html>", "not_modified": True}
+    assert session.requests == [{"If-None-Match": '"v1"'}]
+
+
+def test_not_modified_without_a_cached_body_refetches_in_full(cache, monkeypatch):
+    # The cached body disappears while the conditional request is in flight
+    body_path = cache._paths(URL)[1]
+    session = FakeSession([response(304), response(200, "<html>new</html>", {"ETag": '"v2"'})],
+                          on_request=lambda: os.path.exists(body_path) and os.remove(body_path))
+    use_session(monkeypatch, session)
+
+    assert scraper.fetch_page(URL) == {"content": "<html>new</html>", "not_modified": False}
+    assert session.requests == [{"If-None-Match": '"v1"'}, {}]
+    assert cache.load_body(URL) == "<html>new</html>"
@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from scraper.http_cache import ResponseCache
+
+URL = "https://shop.example/p/1"
+PARSED = {"title": "Widget", "price": 10.0, "availability": "In Stock", "source": "dom"}
+
+
+def cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "http_cache"))
+    cache.store(URL, SimpleNamespace(headers={"ETag": '"v1"'}, text="<html></html>"))
+    return cache
+
+
+def test_conditional_headers_come_from_the_cached_validators(tmp_path):
+    cache = cached(tmp_path)
+    assert cache.conditional_headers(URL) == {"If-None-Match": '"v1"'}
+    assert cache.load_body(URL) == "<html></html>"
+    assert cache.conditional_headers("https://shop.example/p/2") == {}
+
+
+def test_parse_results_are_only_reused_for_the_same_parser_key(tmp_path):
+    cache = cached(tmp_path)
+    cache.store_parsed(URL, "amazon:v2:abc", PARSED)
+
+    assert cache.load_parsed(URL, "amazon:v2:abc")["price"] == 10.0
+    assert cache.load_parsed(URL, "amazon:v2:def") is None
+    assert cache.load_parsed(URL, "amazon:v3:abc") is None
+
+
+def test_a_new_body_forgets_the_parse_result(tmp_path):
+    cache = cached(tmp_path)
+    cache.store_parsed(URL, "amazon:v2:abc", PARSED)
+    cache.store(URL, SimpleNamespace(headers={"ETag": '"v2"'}, text="<html>new</html>"))
+    assert cache.load_parsed(URL, "amazon:v2:abc") is None
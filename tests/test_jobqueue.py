@@ -0,0 +1,118 @@
+from contextlib import closing
+
+import pytest
+
+from scraper import jobqueue
+from scraper.jobqueue import JobQueue
+
+
+class Clock:
+    """Stands in for time.time, advanced by hand."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(jobqueue.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / "queue.db"), visibility_timeout=300, host_lease_seconds=120)
+
+
+def product(n, host="shop.example"):
+    return {"name": f"Product {n}", "url": f"https://{host}/p/{n}", "site": "amazon"}
+
+
+def job_row(queue, job_id):
+    with closing(queue.connect()) as conn:
+        return dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def test_enqueue_skips_products_with_a_pending_job(queue):
+    assert queue.enqueue([product(1), product(2)]) == 2
+    assert queue.enqueue([product(1), product(3)]) == 1
+    assert queue.stats()["jobs"] == {"queued": 3}
+
+
+def test_claimed_job_is_leased_until_acknowledged(queue):
+    queue.enqueue([product(1)])
+    job_id, claimed = queue.claim("worker-a")
+    assert claimed == product(1)
+    assert queue.claim("worker-a") is None
+
+    assert queue.ack(job_id, "worker-a")
+    assert queue.stats()["jobs"] == {}
+
+
+def test_host_lease_keeps_other_workers_off_the_host(queue, clock):
+    queue.enqueue([product(1), product(2), product(3, host="other.example")])
+    job_id, _ = queue.claim("worker-a")
+    host = job_row(queue, job_id)["host"]
+
+    _, claimed = queue.claim("worker-b")
+    assert claimed["url"].startswith("https://other.example/")
+    assert queue.claim("worker-b") is None
+
+    # The host is handed over once its lease runs out
+    clock.now += 121
+    _, claimed = queue.claim("worker-b")
+    assert f"https://{host}/" in claimed["url"]
+
+
+def test_failures_back_off_exponentially_then_give_up(queue, clock):
+    queue.enqueue([product(1)])
+    for attempt in range(1, 4):
+        job_id, _ = queue.claim("worker")
+        assert queue.fail(job_id, "worker", error="HTTP 500", max_attempts=3, retry_delay=10)
+        row = job_row(queue, job_id)
+        if attempt < 3:
+            assert row["state"] == "queued"
+            assert row["available_at"] == pytest.approx(clock.now + 10 * 2 ** (attempt - 1))
+            assert queue.claim("worker") is None
+            clock.now = row["available_at"]
+    assert row["state"] == "failed"
+    assert row["last_error"] == "HTTP 500"
+
+
+def test_expired_lease_is_requeued(queue, clock):
+    queue.enqueue([product(1)])
+    job_id, _ = queue.claim("crashed")
+    clock.now += 301
+
+    claimed_id, _ = queue.claim("survivor")
+    assert claimed_id == job_id
+    assert job_row(queue, job_id)["attempts"] == 2
+    # The crashed worker's late acknowledgement no longer counts
+    assert not queue.ack(job_id, "crashed")
+
+
+def test_expired_lease_fails_after_max_attempts(queue, clock):
+    queue.enqueue([product(1)])
+    for _ in range(2):
+        job_id, _ = queue.claim("crashing", max_attempts=2)
+        clock.now += 301
+
+    assert queue.claim("crashing", max_attempts=2) is None
+    row = job_row(queue, job_id)
+    assert row["state"] == "failed"
+    assert row["last_error"] == "lease expired"
+
+
+def test_defer_does_not_count_an_attempt_and_holds_back_the_host(queue, clock):
+    queue.enqueue([product(1), product(2)])
+    job_id, _ = queue.claim("worker")
+    assert queue.defer(job_id, "worker", 60)
+
+    assert job_row(queue, job_id)["attempts"] == 0
+    assert queue.claim("worker") is None
+    clock.now += 60
+    assert queue.claim("worker") is not None
@@ -0,0 +1,29 @@
+import json
+import os
+
+from scraper import metrics
+
+
+def test_other_processes_series_are_labelled_not_summed(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    registry = metrics.Registry()
+    registry.counter("jobs_total", "Jobs.").inc(2, site="amazon")
+    other = metrics.Registry()
+    other.counter("jobs_total", "Jobs.").inc(5, site="amazon")
+    with open(tmp_path / "worker-123.json", "w", encoding="utf-8") as f:
+        json.dump({"process": "worker", "pid": 123, "metrics": other.snapshot()}, f)
+
+    lines = registry.render_prometheus(metrics.saved_snapshots()).splitlines()
+    assert 'jobs_total{pid="123",process="worker",site="amazon"} 5' in lines
+    assert f'jobs_total{{pid="{os.getpid()}",process="{metrics.PROCESS_NAME}",site="amazon"}} 2' in lines
+    # Without other processes, the series keep their own labels only
+    assert 'jobs_total{site="amazon"} 2' in registry.render_prometheus().splitlines()
+
+
+def test_old_snapshots_are_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    path = tmp_path / "worker-123.json"
+    path.write_text(json.dumps({"process": "worker", "pid": 123, "metrics": {}}))
+    os.utime(path, (0, 0))
+    assert metrics.saved_snapshots() == []
+    assert not path.exists()
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from scraper.store import PriceStore
+from visuals import plotter
+
+FIRST = "https://shop.example/p/1"
+SECOND = "https://shop.example/p/2"
+
+
+def row(hour, price, url, name="Widget, Blue"):
+    return {"timestamp": f"2025-01-01T{hour:02d}:00:00", "product_name": name, "price": price,
+            "availability": "In Stock", "url": url}
+
+
+def test_chart_slugs_are_unique_per_url():
+    slugs = plotter.chart_slugs({FIRST: {"name": "Widget, Blue"}, SECOND: {"name": "Widget Blue"},
+                                 "https://shop.example/p/3": {"name": "Gadget"}})
+    assert slugs[FIRST] != slugs[SECOND]
+    assert all(slug.startswith("Widget_Blue_") for slug in (slugs[FIRST], slugs[SECOND]))
+    assert slugs["https://shop.example/p/3"] == "Gadget"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = PriceStore(str(tmp_path / "prices.db"))
+    monkeypatch.setattr(plotter, "open_store", lambda: store)
+    monkeypatch.setattr(plotter, "CHARTS_DIR", str(tmp_path / "charts"))
+    return store
+
+
+def test_products_sharing_a_name_get_their_own_charts(store):
+    store.insert_batch([row(0, 100, FIRST), row(1, 110, FIRST), row(0, 50, SECOND), row(1, 55, SECOND)])
+    plotter.generate_price_charts()
+
+    slugs = plotter.chart_slugs({FIRST: {"name": "Widget, Blue"}, SECOND: {"name": "Widget, Blue"}})
+    assert all(os.path.exists(plotter.get_chart_path(slug)) for slug in slugs.values())
+    assert len(os.listdir(plotter.CHARTS_DIR)) == 2
+
+
+def test_up_to_date_charts_are_skipped_per_url(store):
+    store.insert_batch([row(0, 100, FIRST), row(0, 50, SECOND)])
+    plotter.generate_price_charts()
+    slugs = plotter.chart_slugs({FIRST: {"name": "Widget, Blue"}, SECOND: {"name": "Widget, Blue"}})
+
+    # A chart older than its product's newest data point is stale
+    os.utime(plotter.get_chart_path(slugs[SECOND]), (0, 0))
+    latest = store.latest_per_product(require_price=True)
+    assert plotter._stale_products(latest, slugs) == [SECOND]
+    assert plotter._stale_products(latest, slugs, force=True) == [FIRST, SECOND]
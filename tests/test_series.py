@@ -0,0 +1,34 @@
+import math
+
+from scraper.series import build_series
+
+URL = "https://shop.example/p/1"
+
+
+def run(hour, price, name="Product", availability="In Stock", url=URL):
+    timestamp = f"2025-01-01T{hour:02d}:00:00"
+    return (url, name, timestamp, timestamp, price, availability, 1)
+
+
+def test_rows_are_grouped_per_product_in_time_order():
+    other = "https://shop.example/p/2"
+    series_set = build_series([run(2, 90.0), run(0, 5.0, url=other), run(1, 100.0), run(3, None)])
+
+    series = series_set.get(url=URL)
+    assert series.prices[:2].tolist() == [100.0, 90.0]
+    assert math.isnan(series.prices[2])
+    assert [series.availability_at(i) for i in range(len(series.prices))] == ["In Stock"] * 3
+    assert series_set.get(url=other).prices.tolist() == [5.0]
+
+
+def test_the_name_comes_from_the_newest_row():
+    # Storage order is not time order: the renamed row was stored first
+    series_set = build_series([run(5, 90.0, name="Renamed"), run(1, 100.0, name="Original")])
+    assert series_set.get(url=URL).product_name == "Renamed"
+    assert series_set.get(product_name="Renamed") is not None
+
+
+def test_more_than_65535_availability_texts():
+    rows = [run(0, 1.0, availability=f"Only {n} left", url=f"https://shop.example/p/{n}") for n in range(70_000)]
+    series_set = build_series(rows)
+    assert series_set.get(url="https://shop.example/p/69999").availability_at(0) == "Only 69999 left"
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from scraper.store import PriceStore, expand_steps
+
+URL = "https://shop.example/p/1"
+START = datetime(2025, 1, 1)
+
+
+def row(hour, price, availability="In Stock", name="Product", url=URL):
+    return {
+        "timestamp": (START + timedelta(hours=hour)).isoformat(),
+        "product_name": name,
+        "price": price,
+        "availability": availability,
+        "url": url,
+    }
+
+
+def runs(store, url=URL):
+    return [(r["timestamp"], r["last_seen"], r["price"], r["observations"]) for r in store.get_range(url=url)]
+
+
+def test_rows_are_read_back_oldest_first(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=False)
+    assert store.insert_batch([row(2, 90), row(0, 100)]) == 2
+    store.insert_batch([row(1, 95)])
+    assert [r["price"] for r in store.get_range(url=URL)] == [100.0, 95.0, 90.0]
+
+
+def test_get_range_filters_by_product_and_time(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=False)
+    other = "https://shop.example/p/2"
+    store.insert_batch([row(hour, 100 + hour) for hour in range(4)] + [row(1, 5, url=other, name="Other")])
+
+    rows = store.get_range(url=URL, start=row(1, 0)["timestamp"], end=row(2, 0)["timestamp"])
+    assert [r["price"] for r in rows] == [101.0, 102.0]
+    assert [r["price"] for r in store.get_range(product_name="Other")] == [5.0]
+    assert len(store.get_range()) == 5
+
+
+def test_unparseable_prices_are_stored_as_missing(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=False)
+    store.insert_batch([row(0, "12.50"), row(1, ""), row(2, "N/A"), row(3, float("nan"))])
+    assert [r["price"] for r in store.get_range(url=URL)] == [12.5, None, None, None]
+
+
+def test_unchanged_observations_extend_the_current_run(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=True)
+    store.insert_batch([row(0, 100), row(1, 100), row(2, 100)])
+    store.insert_batch([row(3, 90), row(4, 90), row(5, 100)])
+
+    assert runs(store) == [
+        (row(0, 0)["timestamp"], row(2, 0)["timestamp"], 100.0, 3),
+        (row(3, 0)["timestamp"], row(4, 0)["timestamp"], 90.0, 2),
+        (row(5, 0)["timestamp"], row(5, 0)["timestamp"], 100.0, 1),
+    ]
+
+
+def test_availability_or_name_changes_start_a_new_run(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=True)
+    store.insert_batch([row(0, 100), row(1, 100, availability="Out of Stock"), row(2, 100, name="Renamed")])
+    assert len(runs(store)) == 3
+
+
+def test_older_observations_do_not_extend_a_run(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=True)
+    store.insert_batch([row(5, 100)])
+    store.insert_batch([row(3, 100)])
+    assert [observations for _, _, _, observations in runs(store)] == [1, 1]
+
+
+def test_append_mode_keeps_every_observation(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=False)
+    store.insert_batch([row(0, 100), row(1, 100), row(2, 100)])
+    assert len(runs(store)) == 3
+
+
+def test_compact_merges_repeated_observations(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=False)
+    store.insert_batch([row(0, 100), row(1, 100), row(2, 90), row(3, 90), row(4, 90)])
+
+    assert store.compact() == 3
+    assert [(price, observations) for _, _, price, observations in runs(store)] == [(100.0, 2), (90.0, 3)]
+
+
+def test_expand_steps_ends_each_run_at_its_last_sighting(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"), change_only=True)
+    store.insert_batch([row(0, 100), row(1, 100), row(2, 100), row(3, 90)])
+
+    steps = expand_steps(store.get_range(url=URL), start=row(1, 0)["timestamp"])
+    assert [(step["timestamp"], step["price"]) for step in steps] == [
+        (row(1, 0)["timestamp"], 100.0),
+        (row(2, 0)["timestamp"], 100.0),
+        (row(3, 0)["timestamp"], 90.0),
+    ]
+
+
+def test_latest_per_product_keeps_the_newest_row(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"))
+    store.insert_batch([row(5, 90)])
+    store.insert_batch([row(3, 100)])
+    latest = store.latest_per_product()
+    assert [(r["url"], r["price"]) for r in latest] == [(URL, 90.0)]
+
+
+def test_latest_per_product_falls_back_to_the_last_price(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"))
+    store.insert_batch([row(0, 100), row(1, None, availability="N/A")])
+    store.insert_batch([row(0, None, url="https://shop.example/p/2", name="Never priced")])
+
+    assert store.latest_per_product()[0]["price"] is None
+    assert [r["price"] for r in store.latest_per_product(require_price=True)] == [100.0]
+
+
+def test_price_fallback_keeps_the_latest_name(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"))
+    store.insert_batch([row(0, 100), row(1, None, availability="N/A", name="Renamed")])
+    latest = store.latest_per_product(require_price=True)[0]
+    assert (latest["price"], latest["product_name"]) == (100.0, "Renamed")
+
+
+def test_listeners_see_every_committed_batch(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.db"))
+    seen = []
+    store.add_listener(seen.append)
+    store.add_listener(seen.append)
+    store.insert_batch([row(0, 100)])
+    store.remove_listener(seen.append)
+    store.insert_batch([row(1, 100)])
+    assert seen == [[row(0, 100)]]
@@ -0,0 +1,100 @@
+import os
+import json
+
+import pytest
+
+from scraper.structured import SOURCE_JSON_LD, SOURCE_META, extract_structured
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fixtures")
+
+
+def json_ld_page(data):
+    return (
+        "<html><head></head><body>"
+        f'<script type="application/ld+json">{json.dumps(data)}</script>'
+        "</body></html>"
+    )
+
+
+def product(offers, **fields):
+    return {"@context": "https://schema.org", "@type": "Product", "name": "Widget &amp; Co", "offers": offers, **fields}
+
+
+def test_json_ld_offer():
+    page = json_ld_page(product({"@type": "Offer", "price": "1,299.00", "availability": "https://schema.org/InStock"}))
+    assert extract_structured(page) == ("Widget & Co", 1299.0, "In Stock", SOURCE_JSON_LD)
+
+
+def test_product_inside_a_graph_with_an_aggregate_offer():
+    page = json_ld_page({"@graph": [
+        {"@type": "BreadcrumbList"},
+        product({"@type": "AggregateOffer", "lowPrice": 19, "highPrice": 29}),
+    ]})
+    assert extract_structured(page) == ("Widget & Co", 19.0, "N/A", SOURCE_JSON_LD)
+
+
+def test_unparseable_blocks_and_unpriced_products_are_skipped():
+    page = (
+        '<script type="application/ld+json">{not json</script>'
+        + json_ld_page(product({"@type": "Offer"}))
+        + json_ld_page(product({"@type": "Offer", "price": 5}, name="Second"))
+    )
+    assert extract_structured(page)[:2] == ("Second", 5.0)
+
+
+@pytest.mark.parametrize("site, availability, expected", [
+    (None, "https://schema.org/InStock", "In Stock"),
+    (None, "https://schema.org/OutOfStock", "Out of Stock"),
+    (None, "SomethingNew", "SomethingNew"),
+    ("amazon", "https://schema.org/InStock", "In Stock"),
+    ("amazon", "http://schema.org/OutOfStock", "Currently unavailable."),
+    ("bestbuy", "https://schema.org/InStock", "In Stock (Pickup) and Available for Shipping"),
+    ("bestbuy", "https://schema.org/InStoreOnly", "In Stock (Pickup)"),
+    ("bestbuy", "https://schema.org/OnlineOnly", "Available for Shipping"),
+    ("bestbuy", "https://schema.org/SoldOut", "Out of Stock or Check Store/Shipping"),
+])
+def test_availability_is_worded_like_the_site_parser(site, availability, expected):
+    page = json_ld_page(product({"price": 10, "availability": availability}))
+    assert extract_structured(page, site)[2] == expected
+
+
+def test_new_condition_offer_is_preferred():
+    offers = [
+        {"price": 80, "itemCondition": "https://schema.org/UsedCondition", "availability": "https://schema.org/InStock"},
+        {"price": 120, "availability": "https://schema.org/InStock"},
+        {"price": 100, "itemCondition": "https://schema.org/NewCondition", "availability": "https://schema.org/OutOfStock"},
+    ]
+    assert extract_structured(json_ld_page(product(offers)))[1:3] == (100.0, "Out of Stock")
+    # Without a new offer, one without a condition beats a used one
+    assert extract_structured(json_ld_page(product(offers[:2])))[1] == 120.0
+    # Offers without a condition inherit the product's
+    refurbished = [{"price": 120, "itemCondition": "RefurbishedCondition"}, {"price": 80}]
+    assert extract_structured(json_ld_page(product(refurbished)))[1] == 80.0
+    assert extract_structured(json_ld_page(product(refurbished, itemCondition="UsedCondition")))[1] == 120.0
+
+
+def test_meta_tags_are_the_fallback():
+    head = (
+        '<meta property="og:title" content="Meta Widget">'
+        "<meta property='product:price:amount' content='49.50'>"
+        '<meta property="product:availability" content="out of stock">'
+    )
+    page = f"<html><head>{head}</head><body><h1>Widget</h1></body></html>"
+    assert extract_structured(page) == ("Meta Widget", 49.5, "Out of Stock", SOURCE_META)
+    assert extract_structured(page, "bestbuy")[2] == "Out of Stock or Check Store/Shipping"
+
+
+def test_meta_tags_in_the_body_are_ignored():
+    page = '<html><head></head><body><meta property="product:price:amount" content="49.50"></body></html>'
+    assert extract_structured(page) is None
+
+
+def test_pages_without_structured_data():
+    assert extract_structured("<html><head><title>Widget</title></head><body>$10</body></html>") is None
+
+
+def test_fixture_page():
+    with open(os.path.join(FIXTURES_DIR, "structured_product.html"), encoding="utf-8") as f:
+        page = f.read()
+    title, price, availability, source = extract_structured(page, "amazon")
+    assert (title, price, availability, source) == ("Dyson Gen5detect Cordless Vacuum Cleaner, Purple", 749.99, "In Stock", SOURCE_JSON_LD)
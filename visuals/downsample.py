@@ -0,0 +1,72 @@
+import numpy as np
+
+# Downsampling methods accepted by downsample()
+METHODS = ("lttb", "minmax")
+
+
+def _bucket_edges(n, buckets):
+    """Splits n points into `buckets` contiguous, near-equal ranges; returns the edges."""
+    return np.linspace(0, n, buckets + 1).astype(np.int64)
+
+
+def minmax_indices(y, max_points):
+    """
+    Returns sorted indices of the min and max point of each bucket (at most
+    max_points indices). Keeps every spike, so price drops never disappear.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 2)
+    edges = _bucket_edges(n, buckets)
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(edges))
+    # Sort by (bucket, value): the first/last entry of each bucket is its min/max
+    order = np.lexsort((y, bucket_ids))
+    starts = edges[:-1]
+    ends = edges[1:] - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: returns sorted indices of max_points points
+    that best preserve the visual shape of the series. The first and last
+    points are always kept; each bucket's triangle areas are computed with numpy.
+    """
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return np.arange(n) if n <= max_points else np.array([0, n - 1])
+    edges = _bucket_edges(n - 2, max_points - 2) + 1
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(x, y, max_points, method="lttb"):
+    """
+    Reduces the series (x, y) to at most max_points points with the given method.
+    Returns the indices of the points to keep, in ascending order.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if method == "lttb":
+        return lttb_indices(x, y, max_points)
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    raise ValueError(f"unknown downsampling method '{method}' (expected one of {', '.join(METHODS)})")
@@ -1,12 +1,26 @@
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
 import re # Import regex module
+import sys
+import time
+import hashlib
+from datetime import datetime
+
+# Make the project root importable when this file is run as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if sys.path[0] != PROJECT_ROOT:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from scraper.store import open_store
+from scraper.stats import bucket_start
+from scraper import metrics
 
-# Path to the data file
-DATA_FILE = os.path.join("data", "prices.csv")
 # Directory to save charts
 CHARTS_DIR = "visuals"
+# Default chart size in pixels (width x height) and resolution; long histories are
+# drawn from the coarsest rollup that still fills the width (see scraper/stats.py)
+CHART_WIDTH = 1200
+CHART_HEIGHT = 600
+CHART_DPI = 100
 
 def _get_safe_filename_base(product_name):
     """
@@ -20,64 +34,172 @@ def _get_safe_filename_base(product_name):
     safe_name = re.sub(r'\s+', '_', temp_name).strip('_')
     return safe_name
 
-def generate_price_charts():
+def chart_slugs(products_by_url):
     """
-    Generates and saves historical price charts for each unique product
-    found in the DATA_FILE.
+    Maps each url of {url: {"name": ...}} to its chart slug: the name's safe
+    file name base, suffixed with a hash of the url for products whose names
+    reduce to the same base, so every slug identifies exactly one product.
+    The dashboard uses the same slugs in its URLs.
     """
-    if not os.path.exists(DATA_FILE):
-        print(f"Error: Data file not found at {DATA_FILE}. Please run scraper.py first.")
-        return
+    bases = {url: _get_safe_filename_base(details["name"]) for url, details in products_by_url.items()}
+    counts = {}
+    for base in bases.values():
+        counts[base] = counts.get(base, 0) + 1
+    return {
+        url: base if counts[base] == 1 else f"{base}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}"
+        for url, base in bases.items()
+    }
+
+def get_chart_path(slug):
+    """Returns the path of the PNG chart for a product's slug (see chart_slugs)."""
+    return os.path.join(CHARTS_DIR, f"{slug}_price_chart.png")
+
+def render_price_chart(timestamps, prices, product_name, output, format="png", low=None, high=None,
+                       width=CHART_WIDTH):
+    """
+    Draws the price history of one product and saves it to output (a path or a
+    file-like object). With low/high (rollup buckets), prices are the bucket
+    closes and the low-high range is drawn as a band. Uses a standalone Agg
+    figure, so it is safe to call from worker processes and threads.
+    """
+    # Imported on first use: matplotlib takes longer to import than the app takes to start.
+    # Render with the headless Agg canvas directly instead of pyplot's global state.
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(width / CHART_DPI, width * CHART_HEIGHT / CHART_WIDTH / CHART_DPI), dpi=CHART_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    if low is not None and high is not None:
+        ax.fill_between(timestamps, low, high, step='post', alpha=0.25, linewidth=0)
+        ax.plot(timestamps, prices, linestyle='-', drawstyle='steps-post')
+    else:
+        ax.plot(timestamps, prices, marker='o', linestyle='-')
+    ax.set_title(f"Historical Price for {product_name}")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Price ($)")
+    ax.grid(True)
+    fig.tight_layout()
 
+    # Format x-axis dates
+    fig.autofmt_xdate()
+
+    fig.savefig(output, format=format)
+
+def load_chart_series(store, product_name, url, start=None, width=CHART_WIDTH):
+    """
+    Loads what a chart of `width` pixels needs: the raw history when it is
+    sparse enough, otherwise the buckets of the coarsest rollup that still fills
+    the width. Returns a dict with timestamps, prices, low, high (None for raw
+    history) and resolution (None for raw history).
+    """
+    resolution = store.chart_resolution(url, width, start=start)
+    if resolution is None:
+        series = store.read_series(url=url, start=start).get(url=url)
+        if series is None:
+            return {"timestamps": [], "prices": [], "low": None, "high": None, "resolution": None}
+        # Step series of the priced runs (scrapes that failed to find a price are left out)
+        timestamps, prices = series.steps(start=start)
+        return {"timestamps": timestamps, "prices": prices, "low": None, "high": None, "resolution": None}
+    buckets = store.read_rollups(url, resolution, start=start)
+    return {
+        "timestamps": [bucket_start(bucket["bucket"], resolution) for bucket in buckets],
+        "prices": [bucket["close"] for bucket in buckets],
+        "low": [bucket["low"] for bucket in buckets],
+        "high": [bucket["high"] for bucket in buckets],
+        "resolution": resolution,
+    }
+
+def _render_product_chart(product_name, url, chart_path):
+    """
+    Loads one product's history from the store and renders its chart to chart_path.
+    Returns (product_name, chart_path, seconds) or (product_name, None, error message).
+    """
+    start = time.perf_counter()
     try:
-        df = pd.read_csv(DATA_FILE)
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        # Ensure 'price' column is numeric, coercing errors to NaN
-        df["price"] = pd.to_numeric(df["price"], errors='coerce')
-        # Drop rows where price is NaN (e.g., if scraping failed for a price)
-        df.dropna(subset=['price'], inplace=True)
+        series = load_chart_series(open_store(), product_name, url)
+        if len(series["prices"]) == 0:
+            return product_name, None, "no valid price data"
+        render_price_chart(series["timestamps"], series["prices"], product_name, chart_path,
+                           low=series["low"], high=series["high"])
+    except Exception as e:
+        return product_name, None, str(e)
+    return product_name, chart_path, time.perf_counter() - start
+
+def _stale_products(latest_entries, slugs, force=False):
+    """
+    Returns the urls of products whose newest data point is newer than their
+    existing chart (or that have no chart yet), given their slugs ({url: slug}).
+    With force=True, returns all products.
+    """
+    newest = {}
+    for row in latest_entries:
+        timestamp = datetime.fromisoformat(row["timestamp"]).timestamp()
+        newest[row["url"]] = max(timestamp, newest.get(row["url"], timestamp))
 
+    stale = []
+    for url, newest_timestamp in newest.items():
+        chart_path = get_chart_path(slugs[url])
+        if not force and os.path.exists(chart_path) and os.path.getmtime(chart_path) >= newest_timestamp:
+            continue
+        stale.append(url)
+    return sorted(stale)
+
+def generate_price_charts(force=False, workers=1):
+    """
+    Generates and saves historical price charts for the products in the price
+    store. Only products with data newer than their chart are re-rendered unless
+    force is True. With workers > 1, charts are rendered in a process pool.
+    """
+    try:
+        store = open_store()
+        # The same products (and latest names) as the dashboard, so the chart slugs match
+        latest_entries = store.latest_per_product(require_price=True)
     except Exception as e:
-        print(f"Error loading or processing data from {DATA_FILE}: {e}")
+        print(f"Error loading or processing data from the price store: {e}")
         return
 
-    if df.empty:
+    if not latest_entries:
         print("No valid price data to plot.")
         return
 
     os.makedirs(CHARTS_DIR, exist_ok=True)
 
-    # Get unique product names
-    product_names = df["product_name"].unique()
-
-    for product_name in product_names:
-        product_df = df[df["product_name"] == product_name].sort_values("timestamp")
-
-        if product_df.empty:
-            print(f"No data for product: {product_name}. Skipping chart generation.")
-            continue
-
-        plt.figure(figsize=(12, 6))
-        plt.plot(product_df["timestamp"], product_df["price"], marker='o', linestyle='-')
-        plt.title(f"Historical Price for {product_name}")
-        plt.xlabel("Date")
-        plt.ylabel("Price ($)")
-        plt.grid(True)
-        plt.tight_layout()
-
-        # Format x-axis dates
-        plt.gcf().autofmt_xdate()
+    # Keyed by url: two products may share a name
+    names = {row["url"]: row["product_name"] for row in latest_entries}
+    slugs = chart_slugs({url: {"name": name} for url, name in names.items()})
+    product_urls = _stale_products(latest_entries, slugs, force=force)
+    skipped = len(names) - len(product_urls)
+    if skipped:
+        print(f"Skipping {skipped} chart(s) that are already up to date.")
+    if not product_urls:
+        return
 
-        # Generate filename using the consistent helper function
-        filename_base = _get_safe_filename_base(product_name)
-        chart_path = os.path.join(CHARTS_DIR, f"{filename_base}_price_chart.png")
+    product_names = [names[url] for url in product_urls]
+    chart_paths = [get_chart_path(slugs[url]) for url in product_urls]
+    if workers and workers > 1:
+        # Imported here: multiprocessing is only needed by the chart CLI, not by the dashboard
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_render_product_chart, product_names, product_urls, chart_paths,
+                                   chunksize=max(1, len(product_urls) // (workers * 4)))
+            results = list(results)
+    else:
+        results = [_render_product_chart(*args) for args in zip(product_names, product_urls, chart_paths)]
 
-        try:
-            plt.savefig(chart_path)
-            print(f"Saved chart for '{product_name}' to {chart_path}")
-        except Exception as e:
-            print(f"Error saving chart for {product_name}: {e}")
-        plt.close() # Close the plot to free memory
+    for product_name, chart_path, detail in results:
+        if chart_path:
+            # Recorded here rather than in the worker, so process-pool renders are counted too
+            metrics.observe_stage("chart_render", detail)
+            print(f"Saved chart for '{product_name}' to {chart_path} ({detail:.2f} seconds)")
+        else:
+            print(f"Error saving chart for {product_name}: {detail}")
 
 if __name__ == "__main__":
-    generate_price_charts()
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate price history charts.")
+    parser.add_argument("--force", action="store_true", help="re-render every chart, even if it is up to date")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of render processes")
+    args = parser.parse_args()
+    generate_price_charts(force=args.force, workers=args.workers)
+    print(metrics.summary())